@@ -0,0 +1,212 @@
+import time
+import numpy as np
+from src.classes.Mesh_constructor import Mesh_constructor
+from src.classes.Matrix_constructor import Matrix_constructor
+from src.classes.Solvers import Solvers
+
+class Adaptive_refinement:
+    """
+    Adaptive refinement of the graded tensor-product mesh. Every level
+    solves the problem, estimates the error of each cell and splits in
+    half the columns and rows that carry most of it, until the estimated
+    relative error is below tol.
+
+    The error indicators come from the jumps of the discrete current
+    across each cell, per direction, which measure the curvature of the
+    flux that the cell-centred values cannot follow:
+        eta_x = dx_j / (dy_i D_ij) * |Q_j+1/2 - Q_j-1/2|  ~  dx² |∂²φ/∂x²|
+    (Q the current through a face), and eta_y likewise; their sum is the
+    cell residual s - Σa φ scaled by h²/D. A vacuum edge cell holds φ = 0 at
+    its centre instead of on the extrapolated boundary, half a cell away,
+    which costs about that half width times the flux gradient there; this
+    is its indicator, so vacuum edges are refined until the offset is
+    negligible. A column is split when its share
+    of eta_x is at least fraction times the largest column or row share,
+    rows likewise with eta_y, and neighbouring cells are kept within a
+    factor max_ratio of each other.
+
+    The problem is assembled in finite-volume form with harmonic face
+    coupling and solved with multigrid preconditioned CG.
+    Usage:
+        amr = Adaptive_refinement(materials, 20, 10, tol=1e-3)
+        mesh, matrix, x = amr.run()
+        for level in amr.history:
+            print(level["cells"], level["error"])
+    """
+
+    def __init__(self, materials, ncells_x, ncells_y, tol=1e-3, max_levels=10,
+                 max_cells=200000, fraction=0.5, max_ratio=2.0, material_map=None,
+                 grading=4.0, solver_tol=1e-10):
+        """
+        Parameters:
+            materials (list or MaterialTable): Materials, as for Mesh_constructor.
+            ncells_x, ncells_y (int): Cells of the first (graded) mesh.
+            tol (float): Target for the estimated relative L2 error of the flux.
+            max_levels (int): Largest number of meshes solved.
+            max_cells (int): No refinement beyond this number of cells.
+            fraction (float): Share of the largest indicator that marks a column/row.
+            max_ratio (float): Largest size ratio between neighbouring cells.
+            material_map (Material_map): Optional 2D layout.
+            grading (float): Grading of the first mesh.
+            solver_tol (float): Relative tolerance of the linear solves.
+        """
+        if not 0.0 < fraction <= 1.0:
+            raise ValueError("fraction must be in (0, 1].")
+        if max_ratio < 2.0:
+            raise ValueError("max_ratio must be at least 2, a split halves a cell.")
+        self.materials = materials
+        self.ncells_x = ncells_x
+        self.ncells_y = ncells_y
+        self.tol = tol
+        self.max_levels = max_levels
+        self.max_cells = max_cells
+        self.fraction = fraction
+        self.max_ratio = max_ratio
+        self.material_map = material_map
+        self.grading = grading
+        self.solver_tol = solver_tol
+        self.history = []
+
+    def initial_mesh(self):
+        mesh = Mesh_constructor(self.ncells_x, self.ncells_y, self.materials,
+                                material_map=self.material_map, spacing="graded",
+                                grading=self.grading, face_coupling="harmonic")
+        mesh.compute_extrapolated_boundaries_y()
+        mesh.compute_extrapolated_boundaries_x()
+        mesh.compute_total_size()
+        mesh.compute_cell_sizes()
+        mesh.create_material_matrices()
+        return mesh
+
+    @staticmethod
+    def assemble(mesh, matrix_format="sparse"):
+        return Matrix_constructor(
+            mesh.ncells_x, mesh.ncells_y,
+            mesh.Dcells, mesh.Sigma_acells, mesh.source_cells,
+            mesh.dx, mesh.dy, mesh.materials, mesh.interfaces_x,
+            matrix_format=matrix_format, bound_type=mesh.bound_type,
+            finite_volume=True, face_coupling=mesh.face_coupling
+        )
+
+    def solve(self, matrix):
+        S, c = matrix.symmetric_system()
+        solver = Solvers(S, c, tol=self.solver_tol, max_iter=500)
+        return solver.cg(preconditioner=matrix.get_multigrid(symmetric=True))
+
+    @staticmethod
+    def error_indicators(matrix, phi):
+        """
+        Indicators (eta_x, eta_y) of every cell, shape (m, n), for the flux
+        phi on the grid (0 on the vacuum cells).
+        """
+        diag, left, right, top, bottom = matrix.system_stencil()
+        m, n = phi.shape
+        dx = np.broadcast_to(np.asarray(matrix.dx, dtype=float), (n,))[np.newaxis, :]
+        dy = np.broadcast_to(np.asarray(matrix.dy, dtype=float), (m,))[:, np.newaxis]
+
+        # currents through the faces, none through the domain boundary
+        Qx = np.zeros((m, n + 1))
+        Qy = np.zeros((m + 1, n))
+        Qx[:, 1:-1] = right[:, :-1] * (phi[:, :-1] - phi[:, 1:])
+        Qy[1:-1, :] = bottom[:-1, :] * (phi[:-1, :] - phi[1:, :])
+
+        eta_x = dx * np.abs(np.diff(Qx, axis=1)) / (dy * matrix.Dcell)
+        eta_y = dy * np.abs(np.diff(Qy, axis=0)) / (dx * matrix.Dcell)
+        vacuum = matrix.vacuum_mask()
+        eta_x[vacuum] = 0.0
+        eta_y[vacuum] = 0.0
+
+        # offset of the φ = 0 condition: half the vacuum cell times the gradient
+        left_vac, right_vac, top_vac, bottom_vac = matrix.check_boundary(0, 0)
+        if n > 1:
+            if left_vac:
+                eta_x[:, 0] = dx[0, 0] * np.abs(phi[:, 1]) / (dx[0, 0] + dx[0, 1])
+            if right_vac:
+                eta_x[:, -1] = dx[0, -1] * np.abs(phi[:, -2]) / (dx[0, -1] + dx[0, -2])
+        if m > 1:
+            if top_vac:
+                eta_y[0, :] = dy[0, 0] * np.abs(phi[1, :]) / (dy[0, 0] + dy[1, 0])
+            if bottom_vac:
+                eta_y[-1, :] = dy[-1, 0] * np.abs(phi[-2, :]) / (dy[-1, 0] + dy[-2, 0])
+        return eta_x, eta_y
+
+    @staticmethod
+    def estimate(matrix, phi, eta_x, eta_y):
+        """
+        Estimated relative L2 error of the flux.
+        """
+        volumes = matrix.cell_volumes()
+        norm = np.sqrt(np.sum(phi ** 2 * volumes))
+        if norm == 0.0:
+            return 0.0
+        return float(np.sqrt(np.sum((eta_x ** 2 + eta_y ** 2) * volumes)) / norm)
+
+    def mark(self, matrix, eta_x, eta_y):
+        """
+        Boolean flags (columns, rows) of the cells to split.
+        """
+        volumes = matrix.cell_volumes()
+        column_share = np.sqrt(np.sum(eta_x ** 2 * volumes, axis=0))
+        row_share = np.sqrt(np.sum(eta_y ** 2 * volumes, axis=1))
+        threshold = self.fraction * max(column_share.max(), row_share.max())
+        columns = self.limit_ratio(column_share >= threshold, matrix.dx, matrix.ncells_x)
+        rows = self.limit_ratio(row_share >= threshold, matrix.dy, matrix.ncells_y)
+        return columns, rows
+
+    def limit_ratio(self, flags, sizes, count):
+        """
+        Add flags until no cell ends up more than max_ratio times its
+        neighbour, so the mesh stays graded.
+        """
+        sizes = np.broadcast_to(np.asarray(sizes, dtype=float), (count,))
+        flags = flags.copy()
+        while True:
+            new = sizes / (1 + flags)
+            ratio = new[1:] / new[:-1]
+            grow = np.zeros(count, dtype=bool)
+            grow[:-1] |= ratio * self.max_ratio < 1.0
+            grow[1:] |= ratio > self.max_ratio
+            grow &= ~flags
+            if not grow.any():
+                return flags
+            flags |= grow
+
+    def run(self):
+        """
+        Refine until the estimate meets tol (or a limit is reached).
+        Returns:
+            tuple: (mesh, matrix_constructor, solution) of the last level,
+            the solution in the global numbering of the matrix.
+        The levels are recorded in self.history as dicts with level,
+        ncells_x, ncells_y, cells, error, iterations (of the CG solve) and
+        time (seconds, for assembly, solve and estimate).
+        """
+        self.history = []
+        mesh = self.initial_mesh()
+        for level in range(self.max_levels):
+            start = time.perf_counter()
+            matrix = self.assemble(mesh)
+            x = self.solve(matrix)
+            phi = matrix.numbering.to_grid(x)
+            eta_x, eta_y = self.error_indicators(matrix, phi)
+            error = self.estimate(matrix, phi, eta_x, eta_y)
+            self.history.append({
+                "level": level,
+                "ncells_x": mesh.ncells_x,
+                "ncells_y": mesh.ncells_y,
+                "cells": mesh.N,
+                "error": error,
+                "iterations": x.iterations,
+                "time": time.perf_counter() - start,
+            })
+            if error <= self.tol or level == self.max_levels - 1:
+                break
+
+            columns, rows = self.mark(matrix, eta_x, eta_y)
+            cells = (mesh.ncells_x + columns.sum()) * (mesh.ncells_y + rows.sum())
+            if cells > self.max_cells:
+                break
+            mesh = mesh.refine(columns, rows)
+
+        self.mesh, self.matrix, self.solution = mesh, matrix, x
+        return mesh, matrix, x
@@ -0,0 +1,82 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.linalg import cholesky_banded, cho_solve_banded
+from scipy.sparse.linalg import splu
+from src.classes.Diffusion_operator import Diffusion_operator
+
+class Banded_cholesky:
+    """
+    Direct solver: Cholesky factorization of a symmetric positive definite
+    matrix in LAPACK banded storage. With the global numbering
+    l = n*(m-(i+1)) + j the five-point stencil has bandwidth ncells_x, so
+    the factor costs O(N·n) memory and O(N·n²) time, and every further
+    solve is two banded triangular solves, O(N·n).
+
+    A non-symmetric A can be factored through row weights w that make
+    diag(w)·A symmetric (Matrix_constructor.symmetrizing_weights); solve(b)
+    then still returns the solution of A x = b. A Numbering renumbers the
+    unknowns before factoring (e.g. "auto" gives bandwidth min(m, n));
+    b and x stay in the row ordering A was assembled in.
+
+    "nested_dissection" reduces fill but not the bandwidth, so with it the
+    permuted matrix is factored as a sparse matrix instead (SuperLU, kept in
+    the given order and pivoting on the diagonal, i.e. the sparse L·D·L^T
+    of the SPD matrix); bandwidth is then the band of the numbering.
+    Usage:
+        chol = Banded_cholesky(A, weights=w, numbering=Numbering(n, m, "auto"))
+        x = chol.solve(b)
+        X = chol.solve(B)        # one column per right-hand side
+    """
+
+    def __init__(self, A, weights=None, numbering=None):
+        if isinstance(A, Diffusion_operator):
+            A = A.tocsr()
+        A = sp.csr_matrix(A, dtype=float)
+        if A.shape[0] != A.shape[1]:
+            raise ValueError("A must be a square matrix")
+        self.weights = None if weights is None else np.asarray(weights, dtype=float)
+        if self.weights is not None:
+            A = (sp.diags(self.weights) @ A).tocsr()
+        self.numbering = numbering
+        if numbering is not None:
+            A = numbering.permute_matrix(A)
+
+        self.lu = None
+        if numbering is not None and numbering.ordering == "nested_dissection":
+            self.bandwidth = numbering.bandwidth()
+            self.factor = None
+            self.lu = splu(A.tocsc(), permc_spec="NATURAL", diag_pivot_thresh=0.0,
+                           options={"SymmetricMode": True})
+            return
+        self.ab = self.banded_upper(A)
+        self.bandwidth = self.ab.shape[0] - 1
+        # raises LinAlgError if A is not positive definite
+        self.factor = cholesky_banded(self.ab, lower=False, overwrite_ab=True)
+        del self.ab
+
+    @staticmethod
+    def banded_upper(A):
+        """
+        Upper banded storage of a symmetric matrix, ab[u + i - j, j] = a_ij
+        for i <= j, with u the upper bandwidth.
+        """
+        U = sp.triu(A, format="coo")
+        U.sum_duplicates()
+        u = int(np.max(U.col - U.row)) if U.nnz else 0
+        ab = np.zeros((u + 1, A.shape[0]))
+        ab[u + U.row - U.col, U.col] = U.data
+        return ab
+
+    def solve(self, b):
+        """
+        Solve A x = b for a vector b, or for every column of a (N, k) array.
+        """
+        b = np.asarray(b, dtype=float)
+        if self.weights is not None:
+            b = self.weights.reshape((-1,) + (1,) * (b.ndim - 1)) * b
+        if self.numbering is None:
+            return cho_solve_banded((self.factor, False), b)
+        if self.lu is not None:
+            return self.numbering.unpermute(self.lu.solve(self.numbering.permute(b)))
+        x = cho_solve_banded((self.factor, False), self.numbering.permute(b))
+        return self.numbering.unpermute(x)
@@ -0,0 +1,190 @@
+import time
+import numpy as np
+from src.classes.Numbering import Numbering
+
+class Convergence_study:
+    """
+    Mesh convergence study with nested iteration: the problem is solved on
+    meshes refined by ratio in both directions (e.g. 25, 50, 100, 200 cells
+    per axis), each level starting from the previous solution interpolated
+    onto the new cells instead of from zero.
+
+    Every quantity of interest Q is extrapolated from the last three levels
+    (Richardson), with the observed order
+        p = log(|Q_1 - Q_2| / |Q_2 - Q_3|) / log(ratio)
+        Q_ext = Q_3 + (Q_3 - Q_2) / (ratio^p - 1)
+    and the relative error estimate |Q_ext - Q_3| / |Q_ext|. The study stops
+    early once every estimate is below tol.
+
+    The levels go through a ProblemModel (create_mesh, create_matrix, solve),
+    so every solver of the model can be used; the model holds the last level
+    when the study ends.
+    Usage:
+        study = Convergence_study(model, 25, 25, levels=5, tol=1e-3)
+        study.run()
+        for level in study.history:
+            print(level["cells"], level["values"], level["extrapolated"], level["time"])
+    """
+
+    def __init__(self, model, ncells_x, ncells_y, levels=5, ratio=2, tol=None,
+                 quantities=None, mesh_options=None, matrix_options=None, solve_options=None):
+        """
+        Parameters:
+            model (ProblemModel): Model with its materials set.
+            ncells_x, ncells_y (int): Cells of the coarsest level.
+            levels (int): Largest number of levels.
+            ratio (int): Refinement ratio between levels, in each direction.
+            tol (float): Stop once every extrapolated error estimate is below
+                it; None runs all the levels.
+            quantities (dict): name -> function(mesh, matrix_constructor, phi)
+                returning a float, phi being the flux on the (m, n) grid.
+                Default: the total absorption rate and the mean flux.
+            mesh_options, matrix_options, solve_options (dict): Keywords of
+                ProblemModel.create_mesh, create_matrix and solve.
+        """
+        if levels < 1:
+            raise ValueError("A convergence study needs at least one level.")
+        if int(ratio) != ratio or ratio < 2:
+            raise ValueError("The refinement ratio must be an integer of at least 2.")
+        self.model = model
+        self.ncells_x = ncells_x
+        self.ncells_y = ncells_y
+        self.levels = levels
+        self.ratio = int(ratio)
+        self.tol = tol
+        if quantities is None:
+            quantities = {"absorption": self.absorption_rate, "mean_flux": self.mean_flux}
+        self.quantities = quantities
+        self.mesh_options = mesh_options or {}
+        self.matrix_options = matrix_options or {}
+        self.solve_options = solve_options or {"method": "cg", "preconditioner": "multigrid"}
+        self.history = []
+
+    @staticmethod
+    def absorption_rate(mesh, matrix, phi):
+        return float(np.sum(mesh.Sigma_acells * phi * matrix.cell_volumes()))
+
+    @staticmethod
+    def mean_flux(mesh, matrix, phi):
+        volumes = matrix.cell_volumes()
+        return float(np.sum(phi * volumes) / np.sum(volumes))
+
+    @staticmethod
+    def cell_centres(mesh):
+        """
+        Cell centres (x, y) in the coordinates of Mesh_constructor.cell_edges,
+        y from the top row of the grid down.
+        """
+        x_edges, y_edges = mesh.cell_edges()
+        return (x_edges[:-1] + x_edges[1:]) / 2, ((y_edges[:-1] + y_edges[1:]) / 2)[::-1]
+
+    @staticmethod
+    def linear_weights(points, x):
+        """
+        Neighbours (lo, hi) in the increasing points and weight t of hi for
+        linear interpolation at x, constant beyond the ends.
+        """
+        if len(points) == 1:
+            zeros = np.zeros(len(x), dtype=int)
+            return zeros, zeros, np.zeros(len(x))
+        hi = np.clip(np.searchsorted(points, x), 1, len(points) - 1)
+        lo = hi - 1
+        span = points[hi] - points[lo]
+        t = np.divide(x - points[lo], span, out=np.zeros(len(x)), where=span > 0)
+        return lo, hi, np.clip(t, 0.0, 1.0)
+
+    @classmethod
+    def prolong(cls, x, coarse, fine):
+        """
+        Bilinear interpolation of a solution on every cell of the coarse
+        mesh (global numbering) onto the cells of the fine mesh.
+        """
+        xc, yc = cls.cell_centres(coarse)
+        xf, yf = cls.cell_centres(fine)
+        phi = Numbering(coarse.ncells_x, coarse.ncells_y).to_grid(x)
+
+        lo, hi, t = cls.linear_weights(xc, xf)
+        phi = phi[:, lo] * (1 - t) + phi[:, hi] * t
+        # rows run from the top, the centres must increase
+        lo, hi, t = cls.linear_weights(yc[::-1], yf[::-1])
+        phi = (phi[::-1][lo] * (1 - t)[:, np.newaxis] + phi[::-1][hi] * t[:, np.newaxis])[::-1]
+        return Numbering(fine.ncells_x, fine.ncells_y).to_vector(phi)
+
+    def extrapolate(self, values):
+        """
+        Richardson extrapolation of the last three values of a quantity.
+        Returns:
+            tuple: (order, extrapolated, error); nan, nan, inf while there
+            are fewer than three levels or the values do not converge. Only
+            three equal values count as converged (error 0): one repeated
+            value shows no order and may just be a plateau.
+        """
+        if len(values) < 3:
+            return np.nan, np.nan, np.inf
+        q1, q2, q3 = values[-3:]
+        if q3 == q2 == q1:
+            return np.nan, q3, 0.0
+        if q3 == q2:
+            return np.nan, q3, np.inf
+        if q2 == q1:
+            return np.nan, np.nan, np.inf
+        order = np.log(abs(q2 - q1) / abs(q3 - q2)) / np.log(self.ratio)
+        if order <= 0:
+            return order, np.nan, np.inf
+        extrapolated = q3 + (q3 - q2) / (self.ratio ** order - 1)
+        error = abs(extrapolated - q3) / abs(extrapolated) if extrapolated != 0 else np.inf
+        return order, extrapolated, error
+
+    def run(self):
+        """
+        Solve the levels in turn, until tol is met or all levels are done.
+        Returns:
+            ndarray: The solution of the last level, on every cell.
+        The levels are recorded in self.history as dicts with level,
+        ncells_x, ncells_y, cells, values, order, extrapolated and error
+        (dicts per quantity), the iterations and convergence flag of the
+        solve, and the wall times in seconds of the mesh, matrix and solve
+        stages plus their total.
+        """
+        self.history = []
+        model = self.model
+        values = {name: [] for name in self.quantities}
+        previous = None
+        x = None
+        for level in range(self.levels):
+            ncells_x = self.ncells_x * self.ratio ** level
+            ncells_y = self.ncells_y * self.ratio ** level
+
+            start = time.perf_counter()
+            model.create_mesh(ncells_x, ncells_y, **self.mesh_options)
+            mesh_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            model.create_matrix(**self.matrix_options)
+            matrix_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            x0 = None if previous is None else self.prolong(x, previous, model.mesh)
+            x = model.solve(x0=x0, **self.solve_options)
+            solve_time = time.perf_counter() - start
+
+            phi = Numbering(ncells_x, ncells_y).to_grid(x)
+            record = {"level": level, "ncells_x": ncells_x, "ncells_y": ncells_y,
+                      "cells": ncells_x * ncells_y, "values": {}, "order": {},
+                      "extrapolated": {}, "error": {}}
+            for name, quantity in self.quantities.items():
+                values[name].append(quantity(model.mesh, model.matrix_constructor, phi))
+                order, extrapolated, error = self.extrapolate(values[name])
+                record["values"][name] = values[name][-1]
+                record["order"][name] = order
+                record["extrapolated"][name] = extrapolated
+                record["error"][name] = error
+            record.update(iterations=x.iterations, converged=x.converged,
+                          mesh_time=mesh_time, matrix_time=matrix_time, solve_time=solve_time,
+                          time=mesh_time + matrix_time + solve_time)
+            self.history.append(record)
+
+            previous = model.mesh
+            if self.tol is not None and max(record["error"].values()) <= self.tol:
+                break
+        return x
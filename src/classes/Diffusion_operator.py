@@ -0,0 +1,374 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.linalg import solve_banded
+
+class Diffusion_operator:
+    """
+    Matrix-free five-point diffusion operator on the (m, n) cell grid.
+    Only the stencil arrays are stored (O(N) memory); A·x is applied with
+    array slicing on the 2D flux field and no matrix is ever materialised.
+
+    Vectors use the same global numbering as Matrix_constructor,
+    l = n*(m-(i+1)) + j, so that x.reshape(m, n)[::-1] is the (i, j) grid.
+    The products and sweeps take an out array and then work through a
+    workspace kept on the operator, without allocating anything.
+    The products also take an (N, k) block of vectors, one per column,
+    applied to all of them in the same array operations.
+    Usage:
+        op = Diffusion_operator(diag, left, right, top, bottom)
+        y = op.dot(x)
+        op.dot(x, out=y)
+        d = op.diagonal()
+    """
+
+    def __init__(self, diag, left, right, top, bottom, dtype=float):
+        """
+        Parameters:
+            diag (ndarray): Diagonal coefficient of every cell, shape (m, n).
+            left, right, top, bottom (ndarray): Positive coupling coefficients
+                towards each neighbour (A entry = -coeff), shape (m, n).
+            dtype: Precision of the stencil and of the sweeps, float32 for
+                the inner solves of Solvers.mixed_precision.
+        """
+        self.diag = np.array(diag, dtype=dtype)
+        self.left = np.array(left, dtype=dtype)
+        self.right = np.array(right, dtype=dtype)
+        self.top = np.array(top, dtype=dtype)
+        self.bottom = np.array(bottom, dtype=dtype)
+
+        self.ncells_y, self.ncells_x = self.diag.shape
+        # Thomas factors of the line solves, see line_factors
+        self._line_factors = {}
+        # scratch arrays of the in-place kernels, see workspace
+        self._workspace = {}
+        N = self.ncells_y * self.ncells_x
+        self.shape = (N, N)
+        self.ndim = 2
+        self.dtype = self.diag.dtype
+
+    def apply_dirichlet(self, mask):
+        """
+        Turn the cells in mask into identity rows and drop every coupling
+        towards them, like Matrix_constructor.apply_vacuum does on A.
+        Parameters:
+            mask (ndarray - boolean): Cells with φ = 0, shape (m, n).
+        """
+        keep = ~mask
+        self._line_factors = {}
+        self.diag[mask] = 1.0
+        for coeff in (self.left, self.right, self.top, self.bottom):
+            coeff[mask] = 0.0
+        self.left[:, 1:] *= keep[:, :-1]
+        self.right[:, :-1] *= keep[:, 1:]
+        self.top[1:, :] *= keep[:-1, :]
+        self.bottom[:-1, :] *= keep[1:, :]
+
+    def scaled_rows(self, w):
+        """
+        New operator diag(w)·A, with w given as a vector in the global numbering.
+        """
+        w = self.to_grid(w)
+        return Diffusion_operator(w * self.diag, w * self.left, w * self.right,
+                                  w * self.top, w * self.bottom, dtype=self.dtype)
+
+    def astype(self, dtype):
+        """
+        Copy of the operator with the stencil in dtype.
+        """
+        return Diffusion_operator(self.diag, self.left, self.right, self.top, self.bottom, dtype=dtype)
+
+    # grid <-> vector, an (N, k) block <-> (m, n, k) grids
+    def to_grid(self, x):
+        x = np.asarray(x)
+        return x.reshape((self.ncells_y, self.ncells_x) + x.shape[1:])[::-1, :]
+
+    def to_vector(self, phi):
+        phi = np.ascontiguousarray(phi[::-1, :])
+        return phi.reshape((-1,) + phi.shape[2:])
+
+    def workspace(self, name, shape):
+        """
+        Scratch array kept between calls, allocated on first use.
+        """
+        work = self._workspace.get(name)
+        if work is None or work.shape != shape:
+            work = self._workspace[name] = np.empty(shape, dtype=self.dtype)
+        return work
+
+    # products
+    def off_diagonal_grid(self, phi, out=None):
+        """
+        (A - D)·phi on the grid, written to out (which must not overlap
+        phi) when given.
+        """
+        y = np.zeros_like(phi) if out is None else out
+        if out is not None:
+            y.fill(0.0)
+        w = self.workspace("product", phi.shape)
+        # the stencil broadcast over the columns of a block
+        block = (np.newaxis,) * (phi.ndim - 2)
+        for coeff, target, source in (
+                (self.left, np.s_[:, 1:], np.s_[:, :-1]), (self.right, np.s_[:, :-1], np.s_[:, 1:]),
+                (self.top, np.s_[1:, :], np.s_[:-1, :]), (self.bottom, np.s_[:-1, :], np.s_[1:, :])):
+            np.multiply(coeff[target + block], phi[source], out=w[target])
+            y[target] -= w[target]
+        return y
+
+    def apply_grid(self, phi, out=None):
+        """
+        A·phi on the grid, written to out (which must not overlap phi)
+        when given.
+        """
+        y = self.off_diagonal_grid(phi, out)
+        w = self.workspace("product", phi.shape)
+        block = (np.newaxis,) * (phi.ndim - 2)
+        np.multiply(self.diag[np.s_[:, :] + block], phi, out=w)
+        y += w
+        return y
+
+    def dot(self, x, out=None):
+        if out is not None:
+            self.apply_grid(self.to_grid(x), self.to_grid(out))
+            return out
+        return self.to_vector(self.apply_grid(self.to_grid(x)))
+
+    def matvec(self, x):
+        return self.dot(np.ravel(x))
+
+    def __matmul__(self, x):
+        return self.dot(x)
+
+    def off_diagonal_dot(self, x, out=None):
+        if out is not None:
+            self.off_diagonal_grid(self.to_grid(x), self.to_grid(out))
+            return out
+        return self.to_vector(self.off_diagonal_grid(self.to_grid(x)))
+
+    def diagonal(self):
+        return self.to_vector(self.diag)
+
+    # sweeps
+    def sor_sweep(self, x, b, omega=1.0, out=None):
+        """
+        One lexicographic SOR sweep in the global numbering (omega=1 gives
+        Gauss-Seidel). Each grid row is a lower bidiagonal solve, rows are
+        visited from i = m-1 up to i = 0.
+        Parameters:
+            out (ndarray): Vector the sweep is written to, may be x itself
+                (then updated in place); a new one when not given.
+        Returns:
+            ndarray: The updated vector.
+        """
+        m, n = self.ncells_y, self.ncells_x
+        if out is None:
+            out = np.array(x, dtype=self.dtype)
+        elif out is not x:
+            np.copyto(out, x)
+        phi = self.to_grid(out)
+        rhs_grid = self.to_grid(b)
+
+        ab = self.workspace("sor_band", (2, n))
+        old = self.workspace("sor_old", (n,))
+        rhs = self.workspace("sor_rhs", (n,))
+        w = self.workspace("sor_product", (n,))
+        for i in range(m - 1, -1, -1):
+            np.copyto(old, phi[i, :])
+            np.multiply(self.diag[i, :], old, out=rhs)
+            rhs *= (1.0 - omega)
+            np.multiply(self.right[i, :-1], old[1:], out=w[:-1])
+            w[-1] = 0.0
+            if i > 0:
+                w += np.multiply(self.top[i, :], phi[i - 1, :], out=old)
+            if i < m - 1:
+                w += np.multiply(self.bottom[i, :], phi[i + 1, :], out=old)
+            w += rhs_grid[i, :]
+            w *= omega
+            rhs += w
+
+            # (D + omega*L_row) phi_i = rhs
+            ab[0, :] = self.diag[i, :]
+            np.multiply(self.left[i, 1:], -omega, out=ab[1, :-1])
+            ab[1, -1] = 0.0
+            phi[i, :] = solve_banded((1, 0), ab, rhs, overwrite_ab=True, overwrite_b=True,
+                                     check_finite=False)
+
+        return out
+
+    def padded_grid(self, x):
+        """
+        Copy of x on the grid with one ghost cell on every side. The ghost
+        values never contribute since boundary couplings are zero.
+        """
+        m, n = self.ncells_y, self.ncells_x
+        P = np.zeros((m + 2, n + 2), dtype=self.dtype)
+        P[1:-1, 1:-1] = self.to_grid(x)
+        return P
+
+    def red_black_sweep(self, P, rhs, omega=1.0, reverse=False):
+        """
+        One red-black (checkerboard) SOR sweep, in place on the padded grid P.
+        Red cells have (i + j) even and only couple to black cells, so each
+        colour is updated at once with strided slices, one sub-lattice
+        (row parity, column parity) at a time.
+        Parameters:
+            P (ndarray): Padded flux grid from padded_grid, shape (m+2, n+2).
+            rhs (ndarray): Right-hand side on the grid, shape (m, n).
+            omega (float): Relaxation factor (1 gives Gauss-Seidel).
+            reverse (bool): Update black before red (the adjoint sweep).
+        """
+        m, n = self.ncells_y, self.ncells_x
+        order = ((0, 0), (1, 1), (0, 1), (1, 0))
+        if reverse:
+            order = order[::-1]
+        for r0, c0 in order:
+            if r0 >= m or c0 >= n:
+                continue
+            cells = (slice(r0, m, 2), slice(c0, n, 2))
+            center = P[1 + r0:m + 1:2, 1 + c0:n + 1:2]
+            s = self.workspace(("red_black", r0, c0), center.shape)
+            w = self.workspace(("red_black_product", r0, c0), center.shape)
+
+            np.copyto(s, rhs[cells])
+            for coeff, neighbour in ((self.left, P[1 + r0:m + 1:2, c0:n:2]),
+                                     (self.right, P[1 + r0:m + 1:2, 2 + c0:n + 2:2]),
+                                     (self.top, P[r0:m:2, 1 + c0:n + 1:2]),
+                                     (self.bottom, P[2 + r0:m + 2:2, 1 + c0:n + 1:2])):
+                s += np.multiply(coeff[cells], neighbour, out=w)
+            s /= self.diag[cells]
+
+            center *= (1.0 - omega)
+            s *= omega
+            center += s
+
+    @staticmethod
+    def thomas_factor(lower, diag, upper):
+        """
+        Elimination factors of a batch of tridiagonal systems, one per
+        column of the (L, k) arrays:
+            lower[l] x[l-1] + diag[l] x[l] + upper[l] x[l+1] = rhs[l]
+        (lower[0] and upper[-1] are not used). The diffusion lines are
+        diagonally dominant, so no pivoting is needed. The factors keep the
+        precision of the diagonals (float32 for a float32 operator).
+        Returns:
+            tuple: (lower, c, inv) for thomas_solve, with c the eliminated
+            upper diagonal and inv the inverse pivots.
+        """
+        dtype = np.result_type(lower, diag, upper, np.float32)
+        lower = np.ascontiguousarray(lower, dtype=dtype)
+        c = np.empty(lower.shape, dtype=dtype)
+        inv = np.empty(lower.shape, dtype=dtype)
+        inv[0] = 1.0 / diag[0]
+        c[0] = upper[0] * inv[0]
+        for l in range(1, lower.shape[0]):
+            inv[l] = 1.0 / (diag[l] - lower[l] * c[l - 1])
+            c[l] = upper[l] * inv[l]
+        return lower, c, inv
+
+    @staticmethod
+    def thomas_solve(factors, rhs):
+        """
+        Solve the factored systems for rhs, shape (L, k), vectorized across
+        the k systems, in the precision of the factors (or of rhs, if higher).
+        """
+        lower, c, inv = factors
+        d = np.array(rhs, dtype=np.result_type(rhs, inv))
+        d[0] *= inv[0]
+        for l in range(1, d.shape[0]):
+            d[l] -= lower[l] * d[l - 1]
+            d[l] *= inv[l]
+        for l in range(d.shape[0] - 2, -1, -1):
+            d[l] -= c[l] * d[l + 1]
+        return d
+
+    @classmethod
+    def thomas(cls, lower, diag, upper, rhs):
+        """
+        Batched Thomas algorithm: thomas_factor then thomas_solve.
+        """
+        return cls.thomas_solve(cls.thomas_factor(lower, diag, upper), rhs)
+
+    def line_factors(self, direction, start):
+        """
+        Thomas factors of the lines of one parity (every other line from
+        start), computed on first use: the lines run along the first axis,
+        so the x lines (grid rows) are stored transposed.
+        """
+        key = (direction, start)
+        if key not in self._line_factors:
+            if direction == "x":
+                lines = slice(start, self.ncells_y, 2)
+                factors = self.thomas_factor(-self.left[lines].T, self.diag[lines].T,
+                                             -self.right[lines].T)
+            else:
+                lines = (slice(None), slice(start, self.ncells_x, 2))
+                factors = self.thomas_factor(-self.top[lines], self.diag[lines], -self.bottom[lines])
+            self._line_factors[key] = factors
+        return self._line_factors[key]
+
+    def line_sweep(self, P, rhs, direction="x", omega=1.0, reverse=False):
+        """
+        One zebra line-SOR sweep, in place on the padded grid P. Every other
+        line of cells (grid rows for direction "x", columns for "y") is
+        solved at once for the couplings along it, the neighbouring lines
+        held fixed, then the remaining lines; one batched Thomas solve per
+        half-sweep, with the factors kept from the first sweep. Line
+        relaxation smooths the error along strongly coupled directions,
+        where point sweeps stall. "alternating" runs an x sweep then a y
+        sweep, which copes with anisotropy in either direction.
+        Parameters:
+            P (ndarray): Padded flux grid from padded_grid, shape (m+2, n+2).
+            rhs (ndarray): Right-hand side on the grid, shape (m, n).
+            direction (str): "x", "y" or "alternating".
+            omega (float): Relaxation factor (1 gives line Gauss-Seidel).
+            reverse (bool): The adjoint sweep, lines (and directions) in reverse order.
+        """
+        if direction == "alternating":
+            for d in (("y", "x") if reverse else ("x", "y")):
+                self.line_sweep(P, rhs, d, omega, reverse)
+            return
+        if direction not in ("x", "y"):
+            raise ValueError(f"Unknown line direction: {direction}")
+
+        m, n = self.ncells_y, self.ncells_x
+        phi = P[1:-1, 1:-1]
+        for start in ((1, 0) if reverse else (0, 1)):
+            if direction == "x":
+                if start >= m:
+                    continue
+                lines = slice(start, m, 2)
+                s = rhs[lines] + self.top[lines] * P[start:m:2, 1:-1] \
+                    + self.bottom[lines] * P[2 + start:m + 2:2, 1:-1]
+                # the systems run along the rows, solve them as columns
+                new = self.thomas_solve(self.line_factors("x", start), s.T).T
+            else:
+                if start >= n:
+                    continue
+                lines = (slice(None), slice(start, n, 2))
+                s = rhs[lines] + self.left[lines] * P[1:-1, start:n:2] \
+                    + self.right[lines] * P[1:-1, 2 + start:n + 2:2]
+                new = self.thomas_solve(self.line_factors("y", start), s)
+            phi[lines] *= (1.0 - omega)
+            phi[lines] += omega * new
+
+    def tocsr(self):
+        """
+        Materialise the operator as a CSR matrix (for checks and small problems).
+        """
+        m, n = self.ncells_y, self.ncells_x
+        N = m * n
+        index = np.arange(N).reshape(m, n)[::-1, :]
+        rows = [index.ravel(),
+                index[:, 1:].ravel(), index[:, :-1].ravel(),
+                index[1:, :].ravel(), index[:-1, :].ravel()]
+        cols = [index.ravel(),
+                index[:, :-1].ravel(), index[:, 1:].ravel(),
+                index[:-1, :].ravel(), index[1:, :].ravel()]
+        vals = [self.diag.ravel(),
+                -self.left[:, 1:].ravel(), -self.right[:, :-1].ravel(),
+                -self.top[1:, :].ravel(), -self.bottom[:-1, :].ravel()]
+        A = sp.csr_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(N, N)
+        )
+        A.eliminate_zeros()
+        return A
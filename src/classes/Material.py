@@ -1,4 +1,11 @@
+import numpy as np
+
 class Material:
+    """
+    One material. Its data lives in a row of a MaterialTable (a table of
+    its own when made here, the table's when it comes from indexing a
+    MaterialTable); every getter and setter reads or writes that row.
+    """
     
     def __init__(self, name, sigma_s, sigma_a, mu_0, sigma_f, s, bounds, bound_type):
         """Initialize a Material instance.
@@ -12,15 +19,94 @@ class Material:
             bounds (tuple - float): Spatial bounds of the material. in 2D (W, H).
             bound_type (tuple - boolean): Type of boundary condition. in 2D (true for vacuum, false for reflective) (x_0, x_1, y_0, y_1).
         """
-        self.name = name
-        self.sigma_s = sigma_s
-        self.sigma_a = sigma_a
-        self.mu_0 = mu_0
-        self.sigma_f = sigma_f
-        self.s = s
-        self.bounds = bounds
-        self.bound_type = bound_type
-        self.compute_sigma_tr()
+        if sigma_s is None or sigma_a is None or mu_0 is None:
+            raise ValueError("sigma_s, sigma_a, and mu_0 must be set to compute sigma_tr.")
+        self.table = MaterialTable([name], [sigma_s], [sigma_a], [mu_0], [sigma_f], [s],
+                                   [bounds], [bound_type])
+        self.index = 0
+
+    @classmethod
+    def view(cls, table, index):
+        """
+        Material reading and writing row index of table.
+        """
+        material = cls.__new__(cls)
+        material.table = table
+        material.index = index
+        return material
+
+    # fields stored in the table
+    @property
+    def name(self):
+        return self.table.names[self.index]
+
+    @name.setter
+    def name(self, value):
+        self.table.names[self.index] = value
+
+    @property
+    def sigma_s(self):
+        return float(self.table.sigma_s[self.index])
+
+    @sigma_s.setter
+    def sigma_s(self, value):
+        self.table.sigma_s[self.index] = value
+
+    @property
+    def sigma_a(self):
+        return float(self.table.sigma_a[self.index])
+
+    @sigma_a.setter
+    def sigma_a(self, value):
+        self.table.sigma_a[self.index] = value
+
+    @property
+    def mu_0(self):
+        return float(self.table.mu_0[self.index])
+
+    @mu_0.setter
+    def mu_0(self, value):
+        self.table.mu_0[self.index] = value
+
+    @property
+    def sigma_f(self):
+        return float(self.table.sigma_f[self.index])
+
+    @sigma_f.setter
+    def sigma_f(self, value):
+        self.table.sigma_f[self.index] = value
+
+    @property
+    def s(self):
+        return float(self.table.s[self.index])
+
+    @s.setter
+    def s(self, value):
+        self.table.s[self.index] = value
+
+    @property
+    def bounds(self):
+        return tuple(float(v) for v in self.table.bounds[self.index])
+
+    @bounds.setter
+    def bounds(self, value):
+        self.table.bounds[self.index] = value
+
+    @property
+    def bound_type(self):
+        return tuple(bool(v) for v in self.table.bound_type[self.index])
+
+    @bound_type.setter
+    def bound_type(self, value):
+        self.table.bound_type[self.index] = value
+
+    @property
+    def sigma_tr(self):
+        return float(self.table.sigma_tr[self.index])
+
+    @sigma_tr.setter
+    def sigma_tr(self, value):
+        self.table.sigma_tr[self.index] = value
 
     # getters
     def get_name(self):
@@ -141,4 +227,89 @@ class Material:
         if not ty_1:
             y_1 += d
 
-        return (x_0, x_1, y_0, y_1)
\ No newline at end of file
+        return (x_0, x_1, y_0, y_1)
+
+
+class MaterialTable:
+    """
+    Structure-of-arrays storage of the materials, left to right: one NumPy
+    array per property (bounds as (K, 2), bound_type as (K, 4) booleans),
+    with the derived quantities computed for all materials at once.
+    Indexing or iterating gives Material views on the rows, so a table can
+    be used wherever a list of materials is expected.
+    Usage:
+        table = MaterialTable.from_materials(materials)
+        D = table.diffusion_coefficient()
+        water = table[0]
+    """
+
+    def __init__(self, names, sigma_s, sigma_a, mu_0, sigma_f, s, bounds, bound_type):
+        self.names = list(names)
+        self.sigma_s = np.array(sigma_s, dtype=float)
+        self.sigma_a = np.array(sigma_a, dtype=float)
+        self.mu_0 = np.array(mu_0, dtype=float)
+        self.sigma_f = np.array(sigma_f, dtype=float)
+        self.s = np.array(s, dtype=float)
+        self.bounds = np.array(bounds, dtype=float).reshape(len(self.names), 2)
+        self.bound_type = np.array(bound_type, dtype=bool).reshape(len(self.names), 4)
+        self.compute_sigma_tr()
+
+    @classmethod
+    def from_materials(cls, materials):
+        """
+        Table holding a copy of the data of materials; the Material
+        objects are left as they are. Index the table (or iterate over it)
+        for Material views whose changes reach it.
+        """
+        if isinstance(materials, MaterialTable):
+            return materials
+        materials = list(materials)
+        table = cls([m.name for m in materials],
+                    [m.sigma_s for m in materials], [m.sigma_a for m in materials],
+                    [m.mu_0 for m in materials], [m.sigma_f for m in materials],
+                    [m.s for m in materials],
+                    [m.bounds for m in materials], [m.bound_type for m in materials])
+        # keep sigma_tr as stored (it is only updated by compute_sigma_tr)
+        table.sigma_tr = np.array([m.sigma_tr for m in materials], dtype=float)
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("material index out of range")
+        return Material.view(self, index)
+
+    def __iter__(self):
+        return (Material.view(self, k) for k in range(len(self)))
+
+    def widths(self):
+        return self.bounds[:, 0]
+
+    def heights(self):
+        return self.bounds[:, 1]
+
+    # derived quantities, one value per material
+    def compute_sigma_tr(self):
+        self.sigma_tr = self.sigma_a + (1 - self.mu_0) * self.sigma_s
+        return self.sigma_tr
+
+    def extrapolated_boundary_parameter(self, where=None):
+        """
+        0.7104 / sigma_tr of the materials selected by the boolean array
+        where (all by default), 0 for the others.
+        """
+        where = np.ones(len(self), dtype=bool) if where is None else np.asarray(where, dtype=bool)
+        if np.any(self.sigma_tr[where] == 0):
+            raise ValueError("Transport cross-section cannot be zero for extrapolated boundary calculation. Check material properties.")
+        d = np.zeros(len(self))
+        d[where] = 0.7104 / self.sigma_tr[where]
+        return d
+
+    def diffusion_coefficient(self):
+        if np.any(self.sigma_tr == 0):
+            raise ValueError("Transport cross-section cannot be zero for diffusion coefficient calculation. Check material properties.")
+        return 1 / (3 * self.sigma_tr)
@@ -0,0 +1,151 @@
+import numpy as np
+import scipy.sparse as sp
+
+class Material_map:
+    """
+    Two-dimensional layout of the materials over a W x H domain: a grid of
+    material indices (rows from the top of the domain, like the mesh
+    arrays), on uniform pixels or on given pixel edges. Indices refer to
+    the rows of a MaterialTable (or positions in a list of materials).
+
+    The map is rasterised onto a mesh by volume fractions: a cell cut by
+    pixel edges gets the area-weighted average of the properties of the
+    pixels it overlaps (the diffusion coefficient takes the harmonic one,
+    the average of 1/D inverted, as resistances in series). The overlap of
+    cells and pixels is a sparse matrix per direction, so the cell values
+    of a property are Wy · value[index] · Wxᵀ.
+    Usage:
+        layout = Material_map.from_regions([(1, 2, 1, 2, 1)], 3.0, 3.0,
+                                           (True, True, False, False))
+        mesh = Mesh_constructor(60, 60, materials, material_map=layout)
+    """
+
+    def __init__(self, index, width, height, bound_type, x_edges=None, y_edges=None):
+        """
+        Parameters:
+            index (ndarray - int): Material index of every pixel, shape (P, Q),
+                row 0 at the top of the domain.
+            width, height (float): Size of the domain.
+            bound_type (tuple - boolean): Boundary condition of the domain
+                (x_0, x_1, y_0, y_1), true for vacuum, as for a Material.
+            x_edges (ndarray): Q+1 increasing pixel edges from 0 to width
+                (uniform pixels by default).
+            y_edges (ndarray): P+1 increasing pixel edges from 0 (bottom) to
+                height (uniform pixels by default).
+        """
+        self.index = np.atleast_2d(np.asarray(index, dtype=np.int64))
+        P, Q = self.index.shape
+        if width <= 0.0 or height <= 0.0:
+            raise ValueError("The material map must have a positive width and height.")
+        if np.any(self.index < 0):
+            raise ValueError("Material indices must be non-negative.")
+        self.width = float(width)
+        self.height = float(height)
+        self.bound_type = tuple(bool(v) for v in bound_type)
+        if len(self.bound_type) != 4:
+            raise ValueError("bound_type must have four entries (x_0, x_1, y_0, y_1).")
+
+        self.x_edges = self.pixel_edges(x_edges, Q, self.width)
+        self.y_edges = self.pixel_edges(y_edges, P, self.height)
+
+    @staticmethod
+    def pixel_edges(edges, count, length):
+        if edges is None:
+            return np.linspace(0.0, length, count + 1)
+        edges = np.asarray(edges, dtype=float)
+        if edges.shape != (count + 1,) or np.any(np.diff(edges) <= 0.0):
+            raise ValueError("Pixel edges must be increasing, one more than the pixels.")
+        if not (np.isclose(edges[0], 0.0) and np.isclose(edges[-1], length)):
+            raise ValueError("Pixel edges must span the whole domain.")
+        return edges
+
+    @classmethod
+    def from_regions(cls, regions, width, height, bound_type, background=0):
+        """
+        Map from rectangles (x_0, x_1, y_0, y_1, material), y measured from
+        the bottom. Later regions are drawn over earlier ones and cells
+        outside every region get the background material. The pixels are
+        the cells of the grid made of all the region edges, so no
+        resolution is lost.
+        """
+        regions = np.asarray(regions, dtype=float).reshape(-1, 5)
+        x0, x1, y0, y1 = regions[:, 0], regions[:, 1], regions[:, 2], regions[:, 3]
+        if np.any(x1 <= x0) or np.any(y1 <= y0):
+            raise ValueError("Regions must have x_0 < x_1 and y_0 < y_1.")
+        if np.any(x0 < 0.0) or np.any(x1 > width) or np.any(y0 < 0.0) or np.any(y1 > height):
+            raise ValueError("Regions must lie inside the domain.")
+
+        x_edges = np.unique(np.concatenate([[0.0, width], x0, x1]))
+        y_edges = np.unique(np.concatenate([[0.0, height], y0, y1]))
+        cols = np.searchsorted(x_edges, np.column_stack([x0, x1]))
+        rows = np.searchsorted(y_edges, np.column_stack([y0, y1]))
+
+        # painted bottom row first, flipped to the top-first layout at the end
+        index = np.full((len(y_edges) - 1, len(x_edges) - 1), background, dtype=np.int64)
+        for (c0, c1), (r0, r1), material in zip(cols, rows, regions[:, 4].astype(np.int64)):
+            index[r0:r1, c0:c1] = material
+        return cls(index[::-1, :], width, height, bound_type, x_edges, y_edges)
+
+    # materials along each edge of the domain
+    def left_materials(self):
+        return np.unique(self.index[:, 0])
+
+    def right_materials(self):
+        return np.unique(self.index[:, -1])
+
+    def top_materials(self):
+        return np.unique(self.index[0, :])
+
+    def bottom_materials(self):
+        return np.unique(self.index[-1, :])
+
+    @staticmethod
+    def overlap(cell_edges, pixel_edges):
+        """
+        Sparse (cells, pixels) matrix of the fraction of every cell covered
+        by every pixel. Pixels at the ends are stretched to the ends of the
+        cells, so the extrapolated margins take the material at the edge.
+        """
+        pixel_edges = pixel_edges.copy()
+        pixel_edges[0] = min(pixel_edges[0], cell_edges[0])
+        pixel_edges[-1] = max(pixel_edges[-1], cell_edges[-1])
+
+        # every piece of the merged edges lies in exactly one cell and one pixel
+        merged = np.union1d(cell_edges, pixel_edges)
+        merged = merged[(merged >= cell_edges[0]) & (merged <= cell_edges[-1])]
+        length = np.diff(merged)
+        middle = merged[:-1] + 0.5 * length
+        cell = np.searchsorted(cell_edges, middle) - 1
+        pixel = np.clip(np.searchsorted(pixel_edges, middle) - 1, 0, len(pixel_edges) - 2)
+
+        fraction = length / np.diff(cell_edges)[cell]
+        return sp.csr_matrix((fraction, (cell, pixel)),
+                             shape=(len(cell_edges) - 1, len(pixel_edges) - 1))
+
+    def homogenise(self, values, cell_x_edges, cell_y_edges, harmonic=False):
+        """
+        Volume-fraction weighted cell values of a per-material property.
+        Parameters:
+            values (ndarray): One value per material.
+            cell_x_edges (ndarray): n+1 increasing mesh edges along x.
+            cell_y_edges (ndarray): m+1 increasing mesh edges along y, from
+                the bottom, in the same coordinates as the map.
+            harmonic (bool): Average 1/value and invert, for a diffusion
+                coefficient: a cell cut by a low-D material then keeps its
+                low D instead of taking the mean of the two.
+        Returns:
+            ndarray: (m, n) cell values, row 0 at the top.
+        """
+        values = np.asarray(values, dtype=float)
+        if self.index.max() >= len(values):
+            raise ValueError("The material map uses more materials than were given.")
+        Wx = self.overlap(np.asarray(cell_x_edges, dtype=float), self.x_edges)
+        Wy = self.overlap(np.asarray(cell_y_edges, dtype=float), self.y_edges)
+
+        if harmonic:
+            values = 1.0 / values
+        pixels = values[self.index[::-1, :]]        # bottom row first
+        cells = (Wx @ (Wy @ pixels).T).T
+        if harmonic:
+            cells = 1.0 / cells
+        return np.ascontiguousarray(cells[::-1, :])
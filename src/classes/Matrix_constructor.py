@@ -1,14 +1,24 @@
 import numpy as np
+import scipy.sparse as sp
 from src.classes.Material import Material as mat
+from src.classes.Diffusion_operator import Diffusion_operator
+from src.classes.Multigrid import Multigrid
+from src.classes.Banded_cholesky import Banded_cholesky
+from src.classes.Numbering import Numbering
 
 class Matrix_constructor:
     def __init__(self, ncells_x, ncells_y,
                  Dcell, Sigma_a_cell, source_cells,
-                 dx, dy, materials, interfaces_x):
+                 dx, dy, materials, interfaces_x, matrix_format="dense",
+                 vectorized=True, eliminate_vacuum=False, bound_type=None,
+                 finite_volume=False, face_coupling="local"):
 
         self.ncells_x = ncells_x
         self.ncells_y = ncells_y
         self.materials = materials
+        # domain boundaries (x_0, x_1, y_0, y_1); read from the outer
+        # materials when not given
+        self.bound_type = bound_type
         self.Dcell = Dcell
         self.Sigma_a_cell = Sigma_a_cell
         self.source_cells = source_cells
@@ -17,41 +27,430 @@ class Matrix_constructor:
         self.dx = dx
         self.dy = dy
 
-        N = self.ncells_y * self.ncells_x
-        self.A = np.zeros((N, N))
+        if matrix_format not in ("dense", "sparse", "matrix_free"):
+            raise ValueError(f"Unknown matrix format: {matrix_format}")
+        if eliminate_vacuum and not vectorized:
+            raise ValueError("Eliminating the vacuum cells needs the vectorized assembly.")
+        # finite_volume: every row is the balance integrated over the cell,
+        # which a non-uniform mesh (dx, dy given per column/row) needs
+        if finite_volume and not vectorized:
+            raise ValueError("The finite-volume form needs the vectorized assembly.")
+        if not finite_volume and (np.ndim(dx) or np.ndim(dy)):
+            raise ValueError("Non-uniform cell sizes need finite_volume=True.")
+        self.finite_volume = finite_volume
+        # face_coupling: "local" uses D_ij for every face of cell (i,j),
+        # "harmonic" the same harmonic-mean D on both sides of a face
+        if face_coupling not in ("local", "harmonic"):
+            raise ValueError(f"Unknown face coupling: {face_coupling}")
+        if face_coupling == "harmonic" and not vectorized:
+            raise ValueError("Harmonic face coupling needs the vectorized assembly.")
+        self.face_coupling = face_coupling
+        self.matrix_format = matrix_format
+        self.vectorized = vectorized
+
+        # unknowns: every cell, or only the cells left once the vacuum edges
+        # (φ = 0) are taken out of the system
+        self.eliminate_vacuum = eliminate_vacuum
+        if eliminate_vacuum:
+            self.active = self.active_cells()
+        else:
+            self.active = (slice(0, ncells_y), slice(0, ncells_x))
+        self.unknowns_y = len(range(ncells_y)[self.active[0]])
+        self.unknowns_x = len(range(ncells_x)[self.active[1]])
+        self.numbering = Numbering(self.unknowns_x, self.unknowns_y)
+
+        N = self.unknowns_y * self.unknowns_x
+        if matrix_format in ("sparse", "matrix_free"):
+            self.A = None
+            if not vectorized:
+                # COO triplets, at most five stencil entries per row
+                self._coo_rows = np.zeros(5 * N, dtype=np.int64)
+                self._coo_cols = np.zeros(5 * N, dtype=np.int64)
+                self._coo_vals = np.zeros(5 * N)
+                self._nnz = 0
+        else:
+            self.A = np.zeros((N, N))
         self.b = np.zeros(N)
 
         self.construct_matrix()
         self.source_term()
-        self.apply_vacuum()
+        if not eliminate_vacuum:
+            self.apply_vacuum()
 
 
-    def source_term(self):
+    def source_term(self, source_cells=None):
         """
         Map source_cells (i,j) directly into b[l]
         using the same global indexing as A.
+        Given other source maps instead, one (m, n) array or a (k, m, n)
+        stack of them, return their right-hand sides (a vector, or an
+        (N, k) block with one column per map) with the vacuum cells
+        applied, and leave self.b as it is.
         """
-        m, n = self.ncells_y, self.ncells_x
-        self.b = np.zeros(m * n)
+        if source_cells is None:
+            self.b = np.zeros(self.unknowns_y * self.unknowns_x)
+            source = self.source_cells
+            if self.finite_volume:
+                source = source * self.cell_volumes()
+            self.b[self.grid_index()] = source[self.active]
+            return
+
+        source = np.asarray(source_cells, dtype=float)
+        if source.shape[-2:] != (self.ncells_y, self.ncells_x) or source.ndim not in (2, 3):
+            raise ValueError(f"Source maps must have shape (k, {self.ncells_y}, {self.ncells_x}).")
+        single = source.ndim == 2
+        if single:
+            source = source[np.newaxis]
+        if self.finite_volume:
+            source = source * self.cell_volumes()
+        # (N, k) block, one column per map
+        B = np.zeros((self.unknowns_y * self.unknowns_x, len(source)))
+        B[self.grid_index()] = np.moveaxis(source, 0, -1)[self.active]
+        if not self.eliminate_vacuum:
+            B[self.grid_index()[self.vacuum_mask()]] = 0.0
+        return B[:, 0] if single else B
+
+    def cell_volumes(self):
+        """
+        Area dx_j * dy_i of every cell, as an (m, n) array.
+        """
+        dx = np.broadcast_to(np.asarray(self.dx, dtype=float), (self.ncells_x,))
+        dy = np.broadcast_to(np.asarray(self.dy, dtype=float), (self.ncells_y,))
+        return np.outer(dy, dx)
 
-        for i in range(m):
-            for j in range(n):
-                l = n * (m - (i + 1)) + j
-                self.b[l] = self.source_cells[i, j]
+    def grid_index(self):
+        """
+        Global index l = n*(m-(i+1)) + j of every unknown cell, as an
+        (m, n) array (only the active cells when the vacuum is eliminated).
+        """
+        return self.numbering.grid_index()
 
     def construct_matrix(self):
+        if self.matrix_format == "matrix_free":
+            self.construct_operator()
+            return
+
+        if self.vectorized:
+            self.construct_matrix_vectorized()
+            return
+
         m, n = self.ncells_y, self.ncells_x
         for i in range(m):
             for j in range(n):
                 self.entries_aij(i, j, self.Dcell, self.Sigma_a_cell)
 
+        if self.matrix_format == "sparse":
+            N = m * n
+            nnz = self._nnz
+            # duplicates are summed when converting COO -> CSR
+            self.A = sp.csr_matrix(
+                (self._coo_vals[:nnz], (self._coo_rows[:nnz], self._coo_cols[:nnz])),
+                shape=(N, N)
+            )
+            del self._coo_rows, self._coo_cols, self._coo_vals
+
+    @staticmethod
+    def stencil_coefficients(Dcell, Sigma_a_cell, dx, dy, boundary, finite_volume=False,
+                             face_coupling="local"):
+        """
+        Five-point stencil of every cell as whole (m, n) arrays, following the
+        same face rules as entries_aij.
+        Parameters:
+            Dcell, Sigma_a_cell (ndarray): Cell-wise material data, shape (m, n).
+            dx, dy (float or ndarray): Cell sizes; one per column / row
+                (row 0 at the top) with finite_volume.
+            boundary (tuple - boolean): (left_vac, right_vac, top_vac, bottom_vac).
+            finite_volume (bool): Use finite_volume_stencil instead.
+            face_coupling (str): "local" or "harmonic" (see face_diffusion).
+        Returns:
+            tuple - ndarray: (diag, left, right, top, bottom). The off-diagonal
+            arrays hold the positive coupling coefficients (A entry = -coeff)
+            and are zero where the neighbour does not exist.
+        """
+        if finite_volume:
+            return Matrix_constructor.finite_volume_stencil(Dcell, Sigma_a_cell, dx, dy, boundary,
+                                                            face_coupling)
+
+        left_vac, right_vac, top_vac, bottom_vac = boundary
+
+        cx = Dcell * dy / dx
+        cy = Dcell * dx / dy
+
+        # face coefficients, boundary faces included
+        face_left = cx.copy()
+        face_right = cx.copy()
+        face_top = cy.copy()
+        face_bottom = cy.copy()
+        if face_coupling == "harmonic":
+            Dx, Dy = Matrix_constructor.face_diffusion(Dcell, dx, dy)
+            face_left[:, 1:] = face_right[:, :-1] = Dx * dy / dx
+            face_top[1:, :] = face_bottom[:-1, :] = Dy * dx / dy
+        # reflective faces carry no current
+        if not left_vac:
+            face_left[:, 0] = 0.0
+        if not right_vac:
+            face_right[:, -1] = 0.0
+        if not top_vac:
+            face_top[0, :] = 0.0
+        if not bottom_vac:
+            face_bottom[-1, :] = 0.0
+
+        # Diagonal: absorption + sum of outflow coefficients
+        diag = Sigma_a_cell + (((face_left + face_right) + face_top) + face_bottom)
+
+        # couplings only exist towards interior neighbours
+        left = face_left.copy()
+        right = face_right.copy()
+        top = face_top.copy()
+        bottom = face_bottom.copy()
+        left[:, 0] = 0.0
+        right[:, -1] = 0.0
+        top[0, :] = 0.0
+        bottom[-1, :] = 0.0
+
+        return diag, left, right, top, bottom
+
+    @staticmethod
+    def face_diffusion(Dcell, dx, dy):
+        """
+        Diffusion coefficient of every interior face, as the harmonic mean
+        of the two cells weighted by their half widths:
+            D_face = (dx_j + dx_j+1) / (dx_j / D_j + dx_j+1 / D_j+1)
+        i.e. the D that makes the current leaving one cell equal to the one
+        entering its neighbour, with the flux continuous on the face.
+        Returns:
+            tuple - ndarray: (Dx, Dy), the faces between columns, shape
+            (m, n-1), and between rows, shape (m-1, n).
+        """
+        m, n = Dcell.shape
+        dx = np.broadcast_to(np.asarray(dx, dtype=float), (n,))[np.newaxis, :]
+        dy = np.broadcast_to(np.asarray(dy, dtype=float), (m,))[:, np.newaxis]
+        Dx = (dx[:, :-1] + dx[:, 1:]) / (dx[:, :-1] / Dcell[:, :-1] + dx[:, 1:] / Dcell[:, 1:])
+        Dy = (dy[:-1, :] + dy[1:, :]) / (dy[:-1, :] / Dcell[:-1, :] + dy[1:, :] / Dcell[1:, :])
+        return Dx, Dy
+
+    @staticmethod
+    def finite_volume_stencil(Dcell, Sigma_a_cell, dx, dy, boundary, face_coupling="local"):
+        """
+        Stencil of the balance integrated over each cell of a tensor-product
+        mesh: a face couples two cells by D_ij * (face length) / (distance
+        between the cell centres), absorption is Sigma_a * dx_j * dy_i, and
+        reflective faces carry no current. Faces towards a vacuum edge keep
+        D_ij * dy / dx like the uniform stencil (those rows become φ = 0).
+        Every row is D_ij times a symmetric stencil plus the absorption, so
+        the symmetrizing weights 1/D_ij still apply. With harmonic coupling
+        the interior faces use face_diffusion instead of D_ij.
+        """
+        left_vac, right_vac, top_vac, bottom_vac = boundary
+        m, n = Dcell.shape
+        dx = np.broadcast_to(np.asarray(dx, dtype=float), (n,))
+        dy = np.broadcast_to(np.asarray(dy, dtype=float), (m,))
+
+        # face length over centre distance, interior faces
+        gx = dy[:, np.newaxis] / (0.5 * (dx[:-1] + dx[1:]))[np.newaxis, :]
+        gy = dx[np.newaxis, :] / (0.5 * (dy[:-1] + dy[1:]))[:, np.newaxis]
+
+        left = np.zeros((m, n))
+        right = np.zeros((m, n))
+        top = np.zeros((m, n))
+        bottom = np.zeros((m, n))
+        if face_coupling == "harmonic":
+            Dx, Dy = Matrix_constructor.face_diffusion(Dcell, dx, dy)
+            left[:, 1:] = right[:, :-1] = Dx * gx
+            top[1:, :] = bottom[:-1, :] = Dy * gy
+        else:
+            left[:, 1:] = Dcell[:, 1:] * gx
+            right[:, :-1] = Dcell[:, :-1] * gx
+            top[1:, :] = Dcell[1:, :] * gy
+            bottom[:-1, :] = Dcell[:-1, :] * gy
+
+        diag = Sigma_a_cell * np.outer(dy, dx) + (((left + right) + top) + bottom)
+        if left_vac:
+            diag[:, 0] += Dcell[:, 0] * dy / dx[0]
+        if right_vac:
+            diag[:, -1] += Dcell[:, -1] * dy / dx[-1]
+        if top_vac:
+            diag[0, :] += Dcell[0, :] * dx / dy[0]
+        if bottom_vac:
+            diag[-1, :] += Dcell[-1, :] * dx / dy[-1]
+
+        return diag, left, right, top, bottom
+
+    def construct_operator(self):
+        """
+        Keep only the stencil arrays, wrapped in a matrix-free Diffusion_operator.
+        """
+        self.boundary = self.check_boundary(0, 0)
+        self.A = Diffusion_operator(*self.system_stencil())
+
+    def system_stencil(self):
+        """
+        Stencil arrays of the unknowns. When the vacuum cells are
+        eliminated these are the active cells only, with the couplings
+        towards the vacuum edges dropped since φ = 0 there.
+        """
+        diag, left, right, top, bottom = self.stencil_coefficients(
+            self.Dcell, self.Sigma_a_cell, self.dx, self.dy, self.check_boundary(0, 0),
+            self.finite_volume, self.face_coupling
+        )
+        if not self.eliminate_vacuum:
+            return diag, left, right, top, bottom
+
+        diag, left, right, top, bottom = (a[self.active].copy() for a in (diag, left, right, top, bottom))
+        left[:, 0] = 0.0
+        right[:, -1] = 0.0
+        top[0, :] = 0.0
+        bottom[-1, :] = 0.0
+        return diag, left, right, top, bottom
+
+    def active_cells(self):
+        """
+        Slices (rows, columns) of the cells that are not on a vacuum edge.
+        """
+        left_vac, right_vac, top_vac, bottom_vac = self.check_boundary(0, 0)
+        return (slice(int(top_vac), self.ncells_y - int(bottom_vac)),
+                slice(int(left_vac), self.ncells_x - int(right_vac)))
+
+    def scatter(self, x):
+        """
+        Solution on every cell of the grid, in the global numbering, from
+        a solution of this system (the vacuum cells get φ = 0). x may also
+        be an (N, k) block of solutions.
+        """
+        if not self.eliminate_vacuum:
+            return x
+        x = np.asarray(x)
+        full = np.zeros((self.ncells_y * self.ncells_x,) + x.shape[1:])
+        full[Numbering.row_index(self.ncells_x, self.ncells_y)[self.active]] = x[self.grid_index()]
+        return full
+
+    def gather(self, x):
+        """
+        Inverse of scatter: the unknowns of this system from values on
+        every cell of the grid (a vector or an (N, k) block).
+        """
+        x = np.asarray(x, dtype=float)
+        if not self.eliminate_vacuum:
+            return x
+        unknowns = np.empty((self.unknowns_y * self.unknowns_x,) + x.shape[1:])
+        unknowns[self.grid_index()] = x[Numbering.row_index(self.ncells_x, self.ncells_y)[self.active]]
+        return unknowns
+
+    def get_operator(self):
+        """
+        Matrix-free Diffusion_operator for this problem, vacuum cells applied,
+        whatever format A was assembled in.
+        """
+        if self.matrix_format == "matrix_free":
+            return self.A
+        operator = Diffusion_operator(*self.system_stencil())
+        if not self.eliminate_vacuum:
+            operator.apply_dirichlet(self.vacuum_mask())
+        return operator
+
+    def get_multigrid(self, symmetric=False, **options):
+        """
+        Multigrid cycle for A (or for the scaled system of symmetric_system
+        when symmetric=True), built on the stencil before the vacuum cells
+        are applied. options are passed on to Multigrid.
+        """
+        operator = Diffusion_operator(*self.stencil_coefficients(
+            self.Dcell, self.Sigma_a_cell, self.dx, self.dy, self.check_boundary(0, 0),
+            self.finite_volume, self.face_coupling
+        ))
+        if symmetric:
+            operator = operator.scaled_rows(operator.to_vector(self.symmetrizing_grid()))
+        return Multigrid(operator, self.vacuum_mask(), self.dx, self.dy,
+                         reduced=self.eliminate_vacuum, **options)
+
+    def get_cholesky(self, ordering="row"):
+        """
+        Banded Cholesky factorization of A, factored through the
+        symmetrizing weights so that solve(b) solves A x = b, with the
+        unknowns renumbered by ordering (see Numbering).
+        """
+        return Banded_cholesky(self.A, weights=self.symmetrizing_weights(),
+                               numbering=Numbering(self.unknowns_x, self.unknowns_y, ordering))
+
+    def symmetrizing_grid(self):
+        """
+        1/D_ij on every cell of the grid, 1 on the vacuum cells. With
+        harmonic face coupling A is already symmetric and the weights are 1.
+        """
+        if self.face_coupling == "harmonic":
+            return np.ones((self.ncells_y, self.ncells_x))
+        return np.where(self.vacuum_mask(), 1.0, 1.0 / self.Dcell)
+
+    def symmetrizing_weights(self):
+        """
+        Row weights w such that diag(w)·A is symmetric positive definite.
+        Every face of cell (i,j) uses the local D_ij, so a row is D_ij times
+        a symmetric stencil; dividing it by D_ij (1 on vacuum rows)
+        restores the symmetry needed by conjugate gradients.
+        """
+        weights = np.zeros(self.unknowns_y * self.unknowns_x)
+        weights[self.grid_index()] = self.symmetrizing_grid()[self.active]
+        return weights
+
+    def symmetric_system(self):
+        """
+        Return (S, c) = (diag(w)·A, w*b), in the same format as A.
+        """
+        w = self.symmetrizing_weights()
+        if self.matrix_format == "matrix_free":
+            S = self.A.scaled_rows(w)
+        elif self.matrix_format == "sparse":
+            S = (sp.diags(w) @ self.A).tocsr()
+        else:
+            S = w[:, np.newaxis] * self.A
+        return S, w * self.b
+
+    def construct_matrix_vectorized(self):
+        """
+        Assemble A from the stencil arrays with whole-array operations.
+        """
+        N = self.unknowns_y * self.unknowns_x
+        self.boundary = self.check_boundary(0, 0)
+        diag, left, right, top, bottom = self.system_stencil()
+        index = self.grid_index()
+
+        rows = [index.ravel(),
+                index[:, 1:].ravel(), index[:, :-1].ravel(),
+                index[1:, :].ravel(), index[:-1, :].ravel()]
+        cols = [index.ravel(),
+                index[:, :-1].ravel(), index[:, 1:].ravel(),
+                index[:-1, :].ravel(), index[1:, :].ravel()]
+        vals = [diag.ravel(),
+                -left[:, 1:].ravel(), -right[:, :-1].ravel(),
+                -top[1:, :].ravel(), -bottom[:-1, :].ravel()]
+
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        vals = np.concatenate(vals)
+
+        if self.matrix_format == "sparse":
+            self.A = sp.csr_matrix((vals, (rows, cols)), shape=(N, N))
+        else:
+            self.A[rows, cols] = vals
+
+    def add_entry(self, row, col, value):
+        """
+        Accumulate value into A[row, col] for either storage format.
+        """
+        if self.matrix_format == "sparse":
+            k = self._nnz
+            self._coo_rows[k] = row
+            self._coo_cols[k] = col
+            self._coo_vals[k] = value
+            self._nnz = k + 1
+        else:
+            self.A[row, col] += value
+
     def entries_aij(self, i, j, Dcell, Sigma_a_cell):
         dx = self.dx
         dy = self.dy
-        n  = self.ncells_x
-        m  = self.ncells_y
 
-        ic = n * (m - (i + 1)) + j  # index in A,b
+        ic = self.numbering.global_index(i, j)  # index in A,b
 
         has_left, has_right, has_top, has_bottom = self.check_neighbors(i, j)
         left_vac, right_vac, top_vac, bottom_vac = self.check_boundary(i, j)
@@ -63,7 +462,7 @@ class Matrix_constructor:
         if has_left:
             D_face = D_ij
             coeff = D_face * dy / dx
-            self.A[ic, ic - 1] -= coeff
+            self.add_entry(ic, self.numbering.global_index(i, j - 1), -coeff)
             sum_aij += coeff
         else:
             # Boundary face at left edge
@@ -72,18 +471,14 @@ class Matrix_constructor:
                 D_face = D_ij
                 coeff = D_face * dy / dx
                 sum_aij += coeff
-            else:
-                # Reflective BC
-                D_face = D_ij
-                coeff = D_face * dy / (2.0 * dx)
-                sum_aij += coeff
+            # a reflective face carries no current
 
         # ---------- RIGHT FACE ----------
         if has_right:
             # Interior face
             D_face = D_ij
             coeff = D_face * dy / dx
-            self.A[ic, ic + 1] -= coeff
+            self.add_entry(ic, self.numbering.global_index(i, j + 1), -coeff)
             sum_aij += coeff
         else:
             # Boundary face at right edge
@@ -91,16 +486,13 @@ class Matrix_constructor:
                 D_face = D_ij
                 coeff = D_face * dy / dx
                 sum_aij += coeff
-            else:
-                D_face = D_ij
-                coeff = D_face * dy / (2.0 * dx)
-                sum_aij += coeff
+            # a reflective face carries no current
 
         # ---------- TOP FACE (i-1) ----------
         if has_top:
             D_face = D_ij
             coeff = D_face * dx / dy
-            self.A[ic, ic + n] -= coeff
+            self.add_entry(ic, self.numbering.global_index(i - 1, j), -coeff)
             sum_aij += coeff
         else:
             # Boundary at top edge
@@ -108,17 +500,14 @@ class Matrix_constructor:
                 D_face = D_ij
                 coeff = D_face * dx / dy
                 sum_aij += coeff
-            else:
-                D_face = D_ij
-                coeff = D_face * dx / (2.0 * dy)
-                sum_aij += coeff
+            # a reflective face carries no current
 
         # ---------- BOTTOM FACE (i+1) ----------
         if has_bottom:
             # Interior face
             D_face = D_ij
             coeff = D_face * dx / dy
-            self.A[ic, ic - n] -= coeff
+            self.add_entry(ic, self.numbering.global_index(i + 1, j), -coeff)
             sum_aij += coeff
         else:
             # Boundary at bottom edge
@@ -126,14 +515,11 @@ class Matrix_constructor:
                 D_face = D_ij
                 coeff = D_face * dx / dy
                 sum_aij += coeff
-            else:
-                D_face = D_ij
-                coeff = D_face * dx / (2.0 * dy)
-                sum_aij += coeff
+            # a reflective face carries no current
 
         # Diagonal: absorption + sum of outflow coefficients
         Sigma_a_cell_ij = Sigma_a_cell[i, j]
-        self.A[ic, ic] = Sigma_a_cell_ij + sum_aij
+        self.add_entry(ic, ic, Sigma_a_cell_ij + sum_aij)
 
 
     def check_neighbors(self, i, j):
@@ -154,7 +540,13 @@ class Matrix_constructor:
           - materials[0]  = left material
           - materials[-1] = right material
         bound_type = (left, right, bottom, top).
+        A bound_type given to the constructor (e.g. from a Material_map)
+        takes precedence.
         """
+        if self.bound_type is not None:
+            left_vac, right_vac, bottom_vac, top_vac = (bool(v) for v in self.bound_type)
+            return left_vac, right_vac, top_vac, bottom_vac
+
         material_left  = self.materials[0]
         material_right = self.materials[-1]
 
@@ -169,41 +561,63 @@ class Matrix_constructor:
         return a_left_vac, a_right_vac, a_top_vac, a_bottom_vac
 
 
-    def apply_vacuum(self):
+    def vacuum_mask(self):
         """
-        Enforce φ = 0 on vacuum boundaries by turning those cells into
-        A[row,:]=0, A[row,row]=1, b[row]=0.
+        Boolean (m, n) array marking the cells on vacuum edges.
         """
         m, n = self.ncells_y, self.ncells_x
-
         left_vac, right_vac, top_vac, bottom_vac = self.check_boundary(0, 0)
 
-        # Left edge
+        mask = np.zeros((m, n), dtype=bool)
         if left_vac:
-            for i in range(m):
-                self.set_flux_zero(i, 0)
-
-        # Right edge
+            mask[:, 0] = True
         if right_vac:
-            for i in range(m):
-                self.set_flux_zero(i, n - 1)
-
-        # Top edge (i = 0)
+            mask[:, -1] = True
         if top_vac:
-            for j in range(n):
-                self.set_flux_zero(0, j)
-
-        # Bottom edge (i = m - 1)
+            mask[0, :] = True
         if bottom_vac:
-            for j in range(n):
-                self.set_flux_zero(m - 1, j)
+            mask[-1, :] = True
+        return mask
+
+    def apply_vacuum(self):
+        """
+        Enforce φ = 0 on vacuum boundaries by turning those cells into
+        A[row,:]=0, A[row,row]=1, b[row]=0.
+        """
+        mask = self.vacuum_mask()
+        idx = self.grid_index()[mask]
+
+        if self.matrix_format == "matrix_free":
+            self.A.apply_dirichlet(mask)
+            self.b[idx] = 0.0
+        elif self.matrix_format == "sparse":
+            self.set_flux_zero_sparse(idx)
+        else:
+            self.A[idx, :] = 0.0
+            self.A[:, idx] = 0.0
+            self.A[idx, idx] = 1.0
+            self.b[idx] = 0.0
 
     def set_flux_zero(self, i, j):
         """
         Apply φ=0 at a single cell (i,j).
         """
-        ic = self.ncells_x * (self.ncells_y - (i + 1)) + j
+        ic = self.numbering.global_index(i, j)
         self.A[ic, :] = 0.0
         self.A[:, ic] = 0.0
         self.A[ic, ic] = 1.0
         self.b[ic] = 0.0
+
+    def set_flux_zero_sparse(self, idx):
+        """
+        Apply φ=0 at all global indices idx in one pass over the CSR matrix.
+        Rows and columns are cleared by scaling with a 0/1 diagonal, so the
+        cost is O(nnz) instead of O(N) per cell.
+        """
+        keep = np.ones(self.ncells_y * self.ncells_x)
+        keep[idx] = 0.0
+
+        K = sp.diags(keep)
+        self.A = (K @ self.A @ K + sp.diags(1.0 - keep)).tocsr()
+        self.A.eliminate_zeros()
+        self.b *= keep
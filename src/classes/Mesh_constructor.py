@@ -1,92 +1,128 @@
-from src.classes.Material import Material as mat
+import copy
+from src.classes.Material import MaterialTable
 import numpy as np
 
 class Mesh_constructor:
-    def __init__(self, ncells_x, ncells_y, materials):
+    def __init__(self, ncells_x, ncells_y, materials, material_map=None,
+                 spacing="uniform", grading=4.0, face_coupling="local"):
+        """
+        materials may be a list of Material or a MaterialTable; the mesh
+        works on the table either way. Without a material_map the materials
+        are stacked left to right, each one filling the full height. With a
+        Material_map the layout, domain size and boundary conditions come
+        from the map, whose indices select rows of the table, and the
+        material bounds are not used.
+
+        spacing="uniform" gives a single dx and dy. spacing="graded" gives
+        one dx per column and one dy per row (row 0 at the top): the cell
+        edges follow every material interface (or map pixel edge), and
+        inside each segment the cells shrink geometrically towards both of
+        its ends, i.e. towards interfaces and boundaries, the middle cell
+        being grading times the end cells whatever the number of cells. Such a
+        mesh is assembled with Matrix_constructor(..., finite_volume=True).
+
+        face_coupling is passed on to Matrix_constructor. With "harmonic"
+        the faces between materials get their own D, so the columns on the
+        interfaces keep their material instead of being averaged.
+        """
+        if spacing not in ("uniform", "graded"):
+            raise ValueError(f"Unknown mesh spacing: {spacing}")
+        if grading < 1.0:
+            raise ValueError("grading must be at least 1.")
+        if face_coupling not in ("local", "harmonic"):
+            raise ValueError(f"Unknown face coupling: {face_coupling}")
+        self.spacing = spacing
+        self.grading = grading
+        self.face_coupling = face_coupling
 
         self.ncells_x = ncells_x
         self.ncells_y = ncells_y
         self.N = ncells_x * ncells_y
         self.materials = materials
+        self.table = MaterialTable.from_materials(materials)
+        self.material_map = material_map
+
+    def map_extrapolated_distance(self, materials, vacuum):
+        """
+        Largest extrapolated distance of the map materials along a vacuum
+        edge of the domain (0 for a reflective edge).
+        """
+        if not vacuum:
+            return 0.0
+        where = np.zeros(len(self.table), dtype=bool)
+        where[materials] = True
+        return float(self.table.extrapolated_boundary_parameter(where=where).max())
 
     def compute_extrapolated_boundaries_y(self):
-        material_heights = [material.get_hight() for material in self.materials]
-        if len(set(material_heights)) > 1:
+        table = self.table
+        if self.material_map is not None:
+            layout = self.material_map
+            self.max_extrapolated_distance_top = self.map_extrapolated_distance(
+                layout.top_materials(), layout.bound_type[3])
+            self.max_extrapolated_distance_bottom = self.map_extrapolated_distance(
+                layout.bottom_materials(), layout.bound_type[2])
+            self.extrapolated_distances_top = [self.max_extrapolated_distance_top]
+            self.extrapolated_distances_bottom = [self.max_extrapolated_distance_bottom]
+            return
+
+        if len(np.unique(table.heights())) > 1:
             raise ValueError("All materials must have the same height.")
 
-        self.extrapolated_distances_top = []  
-        self.extrapolated_distances_bottom = []  
-        max_extrapolated_distance_top = 0
-        max_extrapolated_distance_bottom = 0
-
-        for material in self.materials:
-            bound_type = material.get_bound_type()
-
-            if bound_type[3]:
-                extrapolated_distance = material.extrapolated_boundary_parameter()
-                self.extrapolated_distances_top.append(extrapolated_distance)
-                max_extrapolated_distance_top = max(
-                    max_extrapolated_distance_top, extrapolated_distance
-                )
-            else:
-                self.extrapolated_distances_top.append(0)  
-            
-            if bound_type[2]:
-                extrapolated_distance = material.extrapolated_boundary_parameter()
-                self.extrapolated_distances_bottom.append(extrapolated_distance)
-                max_extrapolated_distance_bottom = max(
-                    max_extrapolated_distance_bottom, extrapolated_distance
-                )
-            else:
-                self.extrapolated_distances_bottom.append(0)
+        top = table.bound_type[:, 3]
+        bottom = table.bound_type[:, 2]
+        distances_top = table.extrapolated_boundary_parameter(where=top)
+        distances_bottom = table.extrapolated_boundary_parameter(where=bottom)
+        self.extrapolated_distances_top = distances_top.tolist()
+        self.extrapolated_distances_bottom = distances_bottom.tolist()
 
         # Consistency along x
-        for i in range(len(self.materials) - 1):
-            current_material = self.materials[i]
-            next_material = self.materials[i + 1]
-
-            if current_material.get_bound_type()[2] != next_material.get_bound_type()[2]:
+        mismatch = np.flatnonzero((bottom[:-1] != bottom[1:]) | (top[:-1] != top[1:]))
+        if mismatch.size:
+            i = int(mismatch[0])
+            if bottom[i] != bottom[i + 1]:
                 raise ValueError(
                     f"Boundary inconsistency detected: Top boundaries of adjacent "
                     f"materials at index {i} and {i+1} must match."
                 )
+            raise ValueError(
+                f"Boundary inconsistency detected: Bottom boundaries of adjacent "
+                f"materials at index {i} and {i+1} must match."
+            )
 
-            if current_material.get_bound_type()[3] != next_material.get_bound_type()[3]:
-                raise ValueError(
-                    f"Boundary inconsistency detected: Bottom boundaries of adjacent "
-                    f"materials at index {i} and {i+1} must match."
-                )
-
-        self.max_extrapolated_distance_top = max_extrapolated_distance_top
-        self.max_extrapolated_distance_bottom = max_extrapolated_distance_bottom
+        self.max_extrapolated_distance_top = max(0, distances_top.max())
+        self.max_extrapolated_distance_bottom = max(0, distances_bottom.max())
 
     def compute_extrapolated_boundaries_x(self):
 
         self.extrapolated_distances_left = 0.0 
         self.extrapolated_distances_right = 0.0  
 
-        material_left = self.materials[0]
-        material_right = self.materials[-1]
-
-        bound_type_right = material_right.get_bound_type()
-        bound_type_left = material_left.get_bound_type()
-
-        if bound_type_left[0]:
-            self.extrapolated_distances_left += material_left.extrapolated_boundary_parameter()
-
-        if bound_type_right[1]:
-            self.extrapolated_distances_right += material_right.extrapolated_boundary_parameter()
+        table = self.table
+        if self.material_map is not None:
+            layout = self.material_map
+            self.bound_type = layout.bound_type
+            self.extrapolated_distances_left = self.map_extrapolated_distance(
+                layout.left_materials(), layout.bound_type[0])
+            self.extrapolated_distances_right = self.map_extrapolated_distance(
+                layout.right_materials(), layout.bound_type[1])
+            return
+
+        # domain boundaries as read by Matrix_constructor.check_boundary
+        self.bound_type = (bool(table.bound_type[0, 0]), bool(table.bound_type[-1, 1]),
+                           bool(table.bound_type[0, 2]), bool(table.bound_type[-1, 3]))
+        if table.bound_type[0, 0]:
+            self.extrapolated_distances_left += table[0].extrapolated_boundary_parameter()
+
+        if table.bound_type[-1, 1]:
+            self.extrapolated_distances_right += table[-1].extrapolated_boundary_parameter()
     
     def compute_total_size(self):
-        total_width = 0.0
-        total_height = 0.0
-
-        for material in self.materials:
-            bounds = material.get_bounds()
-            width = bounds[0] 
-            height = bounds[1] 
-            total_width += width
-            total_height = max(total_height, height)
+        if self.material_map is not None:
+            total_width = self.material_map.width
+            total_height = self.material_map.height
+        else:
+            total_width = float(self.table.widths().sum())
+            total_height = max(0.0, float(self.table.heights().max()))
 
         self.total_width = (
             total_width
@@ -101,10 +137,74 @@ class Mesh_constructor:
 
     def compute_cell_sizes(self):
         self.compute_total_size()
+        if self.spacing == "graded":
+            x_segments, y_segments = self.segment_edges()
+            counts_x, self.dx = self.graded_sizes(x_segments, self.ncells_x, self.grading)
+            counts_y, dy = self.graded_sizes(y_segments, self.ncells_y, self.grading)
+            self.dy = dy[::-1].copy()
+            if self.material_map is None:
+                self.cells_per_material = counts_x.tolist()
+            return self.dx, self.dy
+
         self.dx = self.total_width / self.ncells_x
         self.dy = self.total_height / self.ncells_y
         return self.dx, self.dy
 
+    def segment_edges(self):
+        """
+        Edges a graded mesh must contain, (x_edges, y_edges), in the
+        coordinates of cell_edges: the material interfaces (or the map pixel
+        edges) with the outer segments extended over the extrapolated margins.
+        """
+        if self.material_map is not None:
+            x_edges = self.material_map.x_edges.copy()
+            y_edges = self.material_map.y_edges.copy()
+        else:
+            x_edges = np.concatenate([[0.0], np.cumsum(self.table.widths())])
+            y_edges = np.array([0.0, float(self.table.heights().max())])
+        x_edges[0] -= self.extrapolated_distances_left
+        x_edges[-1] += self.extrapolated_distances_right
+        y_edges[0] -= self.max_extrapolated_distance_bottom
+        y_edges[-1] += self.max_extrapolated_distance_top
+        return x_edges, y_edges
+
+    @staticmethod
+    def graded_sizes(edges, ncells, grading):
+        """
+        Split ncells over the segments between edges in proportion to their
+        lengths (largest remainder, at least one cell each) and grade the
+        cells of every segment geometrically towards both of its ends, the
+        middle cell being grading times the end cells.
+        Returns:
+            tuple: (cells per segment, cell sizes in increasing coordinate).
+        """
+        lengths = np.diff(edges)
+        if np.any(lengths <= 0.0):
+            raise ValueError("Mesh segments must have a positive length.")
+        if ncells < len(lengths):
+            raise ValueError(
+                f"A graded mesh needs at least one cell per segment ({len(lengths)}), got {ncells}."
+            )
+
+        ideal = ncells * lengths / lengths.sum()
+        counts = np.maximum(1, np.floor(ideal).astype(int))
+        while counts.sum() < ncells:
+            counts[np.argmax(ideal - counts)] += 1
+        while counts.sum() > ncells:
+            excess = np.where(counts > 1, counts - ideal, -np.inf)
+            counts[np.argmax(excess)] -= 1
+
+        # cell c of a k-cell segment is r^min(c, k-1-c) times the end cells,
+        # with r such that the middle cell is grading times the end cells
+        sizes = []
+        for length, k in zip(lengths, counts):
+            c = np.arange(k)
+            steps = (k - 1) // 2
+            r = grading ** (1.0 / steps) if steps else 1.0
+            weights = r ** np.minimum(c, k - 1 - c)
+            sizes.append(length * weights / weights.sum())
+        return counts, np.concatenate(sizes)
+
     def _compute_cells_per_material(self):
         """
         Compute how many x-cells each material occupies, in a way that:
@@ -115,104 +215,158 @@ class Mesh_constructor:
         n = self.ncells_x
 
         # Physical widths of each material (exclude extrapolated distances)
-        widths = [mat.get_bounds()[0] for mat in self.materials]
-        total_width_materials = sum(widths)
+        widths = self.table.widths()
+        total_width_materials = widths.sum()
 
         if total_width_materials <= 0.0:
             raise ValueError("Total material width must be positive.")
 
         # Ideal (non-integer) cell count per material based only on material widths
-        ideal_cells = [n * (w / total_width_materials) for w in widths]
+        ideal_cells = n * (widths / total_width_materials)
 
         # Base integer cells and remainders
-        base_cells = [int(np.floor(c)) for c in ideal_cells]
-        cells_used = sum(base_cells)
-        leftover = n - cells_used
+        base_cells = np.floor(ideal_cells).astype(int)
+        leftover = n - base_cells.sum()
 
         # Distribute leftover cells according to largest remainders
-        remainders = [ideal_cells[k] - base_cells[k] for k in range(len(widths))]
+        remainders = ideal_cells - base_cells
         order = np.argsort(remainders)[::-1] 
+        base_cells[order[:max(0, leftover)]] += 1
 
-        for idx in order[:max(0, leftover)]:
-            base_cells[idx] += 1
-
-
-        if sum(base_cells) != n:
-            diff = n - sum(base_cells)
-            base_cells[-1] += diff
+        if base_cells.sum() != n:
+            base_cells[-1] += n - base_cells.sum()
 
-        self.cells_per_material = base_cells
+        self.cells_per_material = base_cells.tolist()
 
     def create_material_matrices(self):
-        self.Dcells = np.zeros((self.ncells_y, self.ncells_x))
-        self.Sigma_acells = np.zeros((self.ncells_y, self.ncells_x))
-        self.source_cells = np.zeros((self.ncells_y, self.ncells_x))
-
         self.compute_cell_sizes()
+        self._fill_material_matrices()
 
-        self._compute_cells_per_material()   
-
-        current_x = 0
-        n, m = self.ncells_x, self.ncells_y
-
-        for k, material in enumerate(self.materials):
-            material_cells_x = self.cells_per_material[k]
-            end_x = current_x + material_cells_x
+    def _fill_material_matrices(self):
+        if self.material_map is not None:
+            self._rasterise_material_map()
+            return
 
-            D_val = material.diffusion_coefficient()
-            Sigma_val = material.get_sigma_a()
-            s_val = material.get_s()
+        if self.spacing == "uniform":
+            self._compute_cells_per_material()   
 
-            for i in range(m):
-                for j in range(current_x, end_x):
-                    self.Dcells[i, j] = D_val
-                    self.Sigma_acells[i, j] = Sigma_val
-                    self.source_cells[i, j] = s_val
-
-            current_x = end_x
+        # every material fills a full-height range of columns
+        column_material = np.repeat(np.arange(len(self.table)), self.cells_per_material)
+        shape = (self.ncells_y, self.ncells_x)
+        self.Dcells = np.broadcast_to(self.table.diffusion_coefficient()[column_material], shape).copy()
+        self.Sigma_acells = np.broadcast_to(self.table.sigma_a[column_material], shape).copy()
+        self.source_cells = np.broadcast_to(self.table.s[column_material], shape).copy()
 
         # mark interface indices
         self.mark_interfaces()
 
-        # average interface columns directly in the world mesh
-        self._apply_interface_cell_averaging()
+        # average interface columns directly in the world mesh; graded
+        # cells end on the interfaces, so there is nothing to average, and
+        # harmonic face coupling handles the jump in D itself
+        if self.spacing == "uniform" and self.face_coupling == "local":
+            self._apply_interface_cell_averaging()
 
 
-    def mark_interfaces(self):
+    def refine(self, columns=(), rows=()):
         """
-        Mark x-indices where there is an interface between two different materials.
+        New graded mesh with the given columns and rows split in half, the
+        material matrices filled in. Cell edges are only added, so the mesh
+        still follows every interface.
+        Parameters:
+            columns, rows: Indices (or boolean flags) of the cells to split,
+                rows counted from the top like the mesh arrays.
+        """
+        if self.spacing != "graded":
+            raise ValueError("Only graded meshes can be refined.")
+        split_x = np.zeros(self.ncells_x, dtype=bool)
+        split_y = np.zeros(self.ncells_y, dtype=bool)
+        split_x[columns] = True
+        split_y[rows] = True
+
+        mesh = copy.copy(self)
+        mesh.dx = np.repeat(self.dx / (1 + split_x), 1 + split_x)
+        mesh.dy = np.repeat(self.dy / (1 + split_y), 1 + split_y)
+        mesh.ncells_x = len(mesh.dx)
+        mesh.ncells_y = len(mesh.dy)
+        mesh.N = mesh.ncells_x * mesh.ncells_y
+        if self.material_map is None:
+            column_material = np.repeat(np.arange(len(self.table)), self.cells_per_material)
+            counts = np.bincount(column_material, weights=1 + split_x, minlength=len(self.table))
+            mesh.cells_per_material = counts.astype(int).tolist()
+        mesh._fill_material_matrices()
+        return mesh
+
+    def cell_edges(self):
+        """
+        Mesh edges (x_edges, y_edges) in the coordinates of the materials:
+        x from the left edge, y from the bottom edge of the physical domain,
+        so the extrapolated margins lie below 0 and beyond W, H.
         """
+        if self.spacing == "graded":
+            x_edges = np.concatenate([[0.0], np.cumsum(self.dx)])
+            y_edges = np.concatenate([[0.0], np.cumsum(self.dy[::-1])])
+            return (x_edges - self.extrapolated_distances_left,
+                    y_edges - self.max_extrapolated_distance_bottom)
+        x_edges = -self.extrapolated_distances_left + self.dx * np.arange(self.ncells_x + 1)
+        y_edges = -self.max_extrapolated_distance_bottom + self.dy * np.arange(self.ncells_y + 1)
+        return x_edges, y_edges
+
+    def _rasterise_material_map(self):
+        """
+        Cell values from the material map by volume fractions; cells cut by
+        region edges take the area-weighted average (harmonic for D), so no
+        interface columns need averaging.
+        """
+        x_edges, y_edges = self.cell_edges()
+        table = self.table
+        layout = self.material_map
+        self.Dcells = layout.homogenise(table.diffusion_coefficient(), x_edges, y_edges,
+                                        harmonic=True)
+        self.Sigma_acells = layout.homogenise(table.sigma_a, x_edges, y_edges)
+        self.source_cells = layout.homogenise(table.s, x_edges, y_edges)
         self.interfaces_x = []
-        current_x = 0
-        n = self.ncells_x
 
-        # Iterate over all but the last material to mark interior interfaces
-        for k in range(len(self.materials) - 1):
-            material_cells_x = self.cells_per_material[k]
-            next_x = current_x + material_cells_x
+    def source_map(self, s):
+        """
+        Source on every cell for other source values of the materials,
+        rasterised like source_cells, so that several source configurations
+        can be solved on the same mesh (see ProblemModel.solve_sources).
+        Parameters:
+            s (array-like): Source of every material, in table order.
+        Returns:
+            ndarray: (ncells_y, ncells_x) array.
+        """
+        s = np.asarray(s, dtype=float)
+        if s.shape != (len(self.table),):
+            raise ValueError(f"Expected {len(self.table)} material sources, got shape {s.shape}.")
+        if self.material_map is not None:
+            x_edges, y_edges = self.cell_edges()
+            return self.material_map.homogenise(s, x_edges, y_edges)
+        column_material = np.repeat(np.arange(len(self.table)), self.cells_per_material)
+        cells = np.broadcast_to(s[column_material], (self.ncells_y, self.ncells_x)).copy()
+        if self.spacing == "uniform" and self.face_coupling == "local":
+            self._apply_interface_cell_averaging(cells)
+        return cells
 
-            if 0 < next_x < n:
-                self.interfaces_x.append(next_x)
+    def mark_interfaces(self):
+        """
+        Mark x-indices where there is an interface between two different materials.
+        """
+        n = self.ncells_x
 
-            current_x = next_x
+        # interior interfaces follow every material but the last
+        ends = np.cumsum(self.cells_per_material[:-1])
+        self.interfaces_x = [int(x) for x in ends if 0 < x < n]
     
-    def _apply_interface_cell_averaging(self):
-        m, n = self.ncells_y, self.ncells_x
+    def _apply_interface_cell_averaging(self, *cell_arrays):
+        n = self.ncells_x
+        cell_arrays = cell_arrays or (self.Dcells, self.Sigma_acells, self.source_cells)
 
+        # interfaces in order: a one-column material averages with the
+        # already averaged column on its left, as before
         for j_if in getattr(self, "interfaces_x", []):
             if not (0 < j_if < n): 
                 continue
 
-            for i in range(m):
-                # left and right values as currently filled
-                D_left   = self.Dcells[i, j_if - 1]
-                D_right  = self.Dcells[i, j_if]
-                Sa_left  = self.Sigma_acells[i, j_if - 1]
-                Sa_right = self.Sigma_acells[i, j_if]
-                s_left   = self.source_cells[i, j_if - 1]
-                s_right  = self.source_cells[i, j_if]
-
-                # average for the interface column
-                self.Dcells[i, j_if]       = 0.5 * (D_left + D_right)
-                self.Sigma_acells[i, j_if] = 0.5 * (Sa_left + Sa_right)
-                self.source_cells[i, j_if] = 0.5 * (s_left + s_right)
+            for cells in cell_arrays:
+                cells[:, j_if] = 0.5 * (cells[:, j_if - 1] + cells[:, j_if])
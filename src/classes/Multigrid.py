@@ -0,0 +1,266 @@
+import copy
+import numpy as np
+from scipy.sparse.linalg import splu
+from src.classes.Diffusion_operator import Diffusion_operator
+
+class Multigrid:
+    """
+    Geometric multigrid for the five-point diffusion stencil on the
+    structured Mesh_constructor grid.
+
+    The hierarchy covers the cells that are not fixed by vacuum boundaries.
+    A coarse cell merges 2x2 fine cells (2x1 or 1x2 where the stencil is
+    strongly anisotropic, and a single left-over row or column when a size
+    is odd), and its stencil is rebuilt from the fine one:
+      - couplings across a coarse face are the sum of the fine couplings
+        crossing it, scaled by the ratio of fine to coarse centre distances;
+      - absorption acts as a zeroth-order term and is summed over the
+        merged cells;
+      - couplings towards the vacuum cells are summed along the edge and
+        rescaled to the distance from the coarse centre to the vacuum cell.
+    Smoothing is red-black Gauss-Seidel, or zebra line Gauss-Seidel along
+    x, y or both in turn ("adi"); line smoothers handle the strong
+    direction themselves, so they coarsen in both directions. The residual
+    is restricted by summing over the merged cells and the correction is
+    prolongated by copying it back to them. The coarsest level is solved
+    with a sparse LU.
+
+    V and W cycles are symmetric for a symmetric stencil (post-smoothing
+    runs the colours in reverse order), so they can precondition CG.
+    Usage:
+        mg = Multigrid(operator, mask, dx, dy, cycle="V")
+        z = mg.apply(r)
+    """
+
+    SMOOTHERS = ("red_black", "line_x", "line_y", "adi")
+
+    def __init__(self, operator, mask, dx, dy, cycle="V",
+                 pre_smooth=2, post_smooth=2, coarsest_size=64, reduced=False,
+                 smoother="red_black"):
+        """
+        Parameters:
+            operator (Diffusion_operator): Stencil before the vacuum cells are
+                applied, i.e. still coupled to them.
+            mask (ndarray - boolean): Vacuum cells, whole edge rows/columns only.
+            dx, dy (float or ndarray): Cell sizes, scalars or one per column/row.
+            cycle (str): "V", "W" or "F".
+            pre_smooth, post_smooth (int): Red-black sweeps around each correction.
+            coarsest_size (int): Levels with at most this many cells are solved directly.
+            reduced (bool): apply() takes vectors over the non-vacuum cells only,
+                as assembled by Matrix_constructor with eliminate_vacuum.
+            smoother (str): "red_black", "line_x", "line_y" or "adi".
+        """
+        if cycle not in ("V", "W", "F"):
+            raise ValueError(f"Unknown multigrid cycle: {cycle}")
+        if smoother not in self.SMOOTHERS:
+            raise ValueError(f"Unknown multigrid smoother: {smoother}")
+        self.smoother = smoother
+        self.dtype = np.dtype(float)
+        self.cycle_type = cycle
+        self.pre_smooth = pre_smooth
+        self.post_smooth = post_smooth
+        self.reduced = reduced
+
+        m, n = operator.ncells_y, operator.ncells_x
+        self.ncells_y, self.ncells_x = m, n
+        mask = np.asarray(mask, dtype=bool)
+        left_vac, right_vac = mask[:, 0].all(), mask[:, -1].all()
+        top_vac, bottom_vac = mask[0, :].all(), mask[-1, :].all()
+        edges = np.zeros((m, n), dtype=bool)
+        edges[:, 0] |= left_vac
+        edges[:, -1] |= right_vac
+        edges[0, :] |= top_vac
+        edges[-1, :] |= bottom_vac
+        if not np.array_equal(edges, mask):
+            raise ValueError("Multigrid needs the vacuum cells to fill whole edges of the grid.")
+
+        wx = np.broadcast_to(np.asarray(dx, dtype=float), (n,))
+        wy = np.broadcast_to(np.asarray(dy, dtype=float), (m,))
+        i0, i1 = int(top_vac), m - int(bottom_vac)
+        j0, j1 = int(left_vac), n - int(right_vac)
+        self.active = (slice(i0, i1), slice(j0, j1))
+
+        self.operators = []
+        self.row_starts = []
+        self.col_starts = []
+        if i1 <= i0 or j1 <= j0:
+            return
+
+        # distance from the edge of the active cells to the vacuum cell centres
+        self.offsets = (wx[0] / 2 if left_vac else 0.0, wx[-1] / 2 if right_vac else 0.0,
+                        wy[0] / 2 if top_vac else 0.0, wy[-1] / 2 if bottom_vac else 0.0)
+
+        diag, left, right, top, bottom = (a[self.active].copy() for a in (
+            operator.diag, operator.left, operator.right, operator.top, operator.bottom))
+        zeroth = diag - (((left + right) + top) + bottom)
+        vacuum = (left[:, 0].copy(), right[:, -1].copy(), top[0, :].copy(), bottom[-1, :].copy())
+        left[:, 0] = 0.0
+        right[:, -1] = 0.0
+        top[0, :] = 0.0
+        bottom[-1, :] = 0.0
+
+        level = Diffusion_operator(diag, left, right, top, bottom)
+        wx, wy = wx[j0:j1], wy[i0:i1]
+        self.operators.append(level)
+        while level.ncells_y * level.ncells_x > coarsest_size:
+            fy, fx = self.coarsening_factors(level)
+            rows = np.arange(0, level.ncells_y, fy)
+            cols = np.arange(0, level.ncells_x, fx)
+            level, zeroth, vacuum, wx, wy = self.coarsen(level, zeroth, vacuum, wx, wy, rows, cols)
+            self.row_starts.append(rows)
+            self.col_starts.append(cols)
+            self.operators.append(level)
+
+        self.coarse_solver = splu(self.operators[-1].tocsr().tocsc())
+
+    def astype(self, dtype):
+        """
+        Copy of the cycle with every level (and the coarse LU) in dtype,
+        e.g. float32 for the inner solves of Solvers.mixed_precision.
+        """
+        mg = copy.copy(self)
+        mg.dtype = np.dtype(dtype)
+        mg.operators = [op.astype(dtype) for op in self.operators]
+        if mg.operators:
+            mg.coarse_solver = splu(mg.operators[-1].tocsr().tocsc())
+        return mg
+
+    def coarsening_factors(self, op):
+        """
+        Merge cells in both directions, or only along the strongly coupled
+        one when the couplings differ by more than a factor 2: point
+        smoothers only damp the error along the strong direction. Lines
+        along the strong direction smooth it, so no semicoarsening then.
+        """
+        fy = 2 if op.ncells_y > 1 else 1
+        fx = 2 if op.ncells_x > 1 else 1
+        strength_x = np.mean(op.left + op.right)
+        strength_y = np.mean(op.top + op.bottom)
+        if strength_x > 2.0 * strength_y and fx == 2 and self.smoother not in ("line_x", "adi"):
+            fy = 1
+        elif strength_y > 2.0 * strength_x and fy == 2 and self.smoother not in ("line_y", "adi"):
+            fx = 1
+        return fy, fx
+
+    def smooth(self, op, P, rhs, reverse=False):
+        """
+        One smoothing sweep on level operator op, in place on P.
+        """
+        if self.smoother == "red_black":
+            op.red_black_sweep(P, rhs, reverse=reverse)
+        else:
+            direction = {"line_x": "x", "line_y": "y", "adi": "alternating"}[self.smoother]
+            op.line_sweep(P, rhs, direction, reverse=reverse)
+
+    def coarsen(self, op, zeroth, vacuum, wx, wy, rows, cols):
+        """
+        Coarse stencil for the cells merged from the index groups starting
+        at rows and cols.
+        Returns:
+            tuple: (operator, zeroth, vacuum, wx, wy) of the coarse level.
+        """
+        def merged(a):
+            return np.add.reduceat(np.add.reduceat(a, rows, axis=0), cols, axis=1)
+
+        Wx = np.add.reduceat(wx, cols)
+        Wy = np.add.reduceat(wy, rows)
+        mc, nc = len(rows), len(cols)
+        zeroth = merged(zeroth)
+
+        left = np.zeros((mc, nc))
+        right = np.zeros((mc, nc))
+        top = np.zeros((mc, nc))
+        bottom = np.zeros((mc, nc))
+        if nc > 1:
+            s = cols[1:]
+            ratio = (wx[s - 1] + wx[s]) / (Wx[:-1] + Wx[1:])
+            right[:, :-1] = np.add.reduceat(op.right[:, s - 1], rows, axis=0) * ratio
+            left[:, 1:] = np.add.reduceat(op.left[:, s], rows, axis=0) * ratio
+        if mc > 1:
+            s = rows[1:]
+            ratio = ((wy[s - 1] + wy[s]) / (Wy[:-1] + Wy[1:]))[:, np.newaxis]
+            bottom[:-1, :] = np.add.reduceat(op.bottom[s - 1, :], cols, axis=1) * ratio
+            top[1:, :] = np.add.reduceat(op.top[s, :], cols, axis=1) * ratio
+
+        off_left, off_right, off_top, off_bottom = self.offsets
+        v_left, v_right, v_top, v_bottom = vacuum
+        vacuum = (
+            np.add.reduceat(v_left, rows) * (wx[0] / 2 + off_left) / (Wx[0] / 2 + off_left),
+            np.add.reduceat(v_right, rows) * (wx[-1] / 2 + off_right) / (Wx[-1] / 2 + off_right),
+            np.add.reduceat(v_top, cols) * (wy[0] / 2 + off_top) / (Wy[0] / 2 + off_top),
+            np.add.reduceat(v_bottom, cols) * (wy[-1] / 2 + off_bottom) / (Wy[-1] / 2 + off_bottom),
+        )
+
+        diag = zeroth + (((left + right) + top) + bottom)
+        diag[:, 0] += vacuum[0]
+        diag[:, -1] += vacuum[1]
+        diag[0, :] += vacuum[2]
+        diag[-1, :] += vacuum[3]
+        return Diffusion_operator(diag, left, right, top, bottom), zeroth, vacuum, Wx, Wy
+
+    # transfers between level k and level k+1
+    def restrict(self, r, k):
+        return np.add.reduceat(np.add.reduceat(r, self.row_starts[k], axis=0),
+                               self.col_starts[k], axis=1)
+
+    def prolong(self, e, k):
+        op = self.operators[k]
+        rows = np.diff(np.append(self.row_starts[k], op.ncells_y))
+        cols = np.diff(np.append(self.col_starts[k], op.ncells_x))
+        return np.repeat(np.repeat(e, rows, axis=0), cols, axis=1)
+
+    def cycle(self, k, P, rhs, cycle_type=None):
+        """
+        One multigrid cycle on level k, in place on the padded grid P.
+        """
+        cycle_type = self.cycle_type if cycle_type is None else cycle_type
+        op = self.operators[k]
+        if k == len(self.operators) - 1:
+            P[1:-1, 1:-1] = op.to_grid(self.coarse_solver.solve(op.to_vector(rhs)))
+            return
+
+        for _ in range(self.pre_smooth):
+            self.smooth(op, P, rhs)
+
+        r = rhs - op.apply_grid(P[1:-1, 1:-1])
+        rc = self.restrict(r, k)
+        Pc = np.zeros((rc.shape[0] + 2, rc.shape[1] + 2), dtype=self.dtype)
+        if cycle_type == "W":
+            self.cycle(k + 1, Pc, rc, "W")
+            self.cycle(k + 1, Pc, rc, "W")
+        elif cycle_type == "F":
+            self.cycle(k + 1, Pc, rc, "F")
+            self.cycle(k + 1, Pc, rc, "V")
+        else:
+            self.cycle(k + 1, Pc, rc, "V")
+        P[1:-1, 1:-1] += self.prolong(Pc[1:-1, 1:-1], k)
+
+        for _ in range(self.post_smooth):
+            self.smooth(op, P, rhs, reverse=True)
+
+    def solve_grid(self, rhs):
+        """
+        One cycle from a zero initial guess for rhs on the non-vacuum cells.
+        """
+        P = np.zeros((rhs.shape[0] + 2, rhs.shape[1] + 2), dtype=self.dtype)
+        self.cycle(0, P, rhs)
+        return P[1:-1, 1:-1]
+
+    def apply(self, r):
+        """
+        Approximate A^-1 r with one cycle from a zero initial guess, with r
+        and the result in the global numbering. Vacuum rows are identity rows.
+        An (N, k) block of residuals gets one cycle per column.
+        """
+        if not self.operators:
+            return np.array(r, dtype=self.dtype)
+        if np.ndim(r) == 2:
+            return np.stack([self.apply(column) for column in np.transpose(r)], axis=1)
+        if self.reduced:
+            op = self.operators[0]
+            return op.to_vector(self.solve_grid(op.to_grid(np.asarray(r, dtype=self.dtype))))
+
+        m, n = self.ncells_y, self.ncells_x
+        z = np.array(r, dtype=self.dtype).reshape(m, n)[::-1, :]
+        z[self.active] = self.solve_grid(z[self.active].copy())
+        return np.ascontiguousarray(z[::-1, :]).ravel()
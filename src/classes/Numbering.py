@@ -0,0 +1,160 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+from src.classes.Diffusion_operator import Diffusion_operator
+
+class Numbering:
+    """
+    Position of every (i, j) cell in the vectors x, b and in the rows and
+    columns of A.
+
+    A is always assembled in the "row" ordering, l = n*(m-(i+1)) + j (rows
+    from the bottom of the domain up, j fastest). The other orderings are
+    permutations of it, applied to an assembled system with permute_system,
+    with the solution mapped back with unpermute:
+        "row"               bandwidth ncells_x
+        "column"            column by column, bandwidth ncells_y
+        "auto"              "row" or "column", whichever band is narrower
+        "rcm"               reverse Cuthill-McKee on the stencil graph
+        "nested_dissection" recursive bisection of the grid by separator
+                            lines, which reduces fill in sparse LU/Cholesky
+                            (but not the bandwidth); Banded_cholesky
+                            factors it as a sparse matrix
+    Usage:
+        numbering = Numbering(ncells_x, ncells_y, ordering="auto")
+        A_p, b_p = numbering.permute_system(A, b)
+        x = numbering.unpermute(x_p)
+        phi = Numbering(ncells_x, ncells_y).to_grid(x)
+    """
+
+    ORDERINGS = ("row", "column", "auto", "rcm", "nested_dissection")
+
+    def __init__(self, ncells_x, ncells_y, ordering="row"):
+        if ordering not in self.ORDERINGS:
+            raise ValueError(f"Unknown ordering: {ordering}")
+        self.ncells_x = ncells_x
+        self.ncells_y = ncells_y
+        self.ordering = ordering
+
+        m, n = ncells_y, ncells_x
+        N = m * n
+        row = self.row_index(ncells_x, ncells_y)
+        if ordering == "auto":
+            ordering = "row" if n <= m else "column"
+        self.is_row = ordering == "row"
+
+        # perm[k] is the row-ordering index of the k-th unknown
+        if ordering == "row":
+            self.perm = np.arange(N)
+        elif ordering == "column":
+            self.perm = row[::-1, :].T.ravel()
+        elif ordering == "rcm":
+            self.perm = reverse_cuthill_mckee(self.stencil_graph(row), symmetric_mode=True)
+        else:
+            self.perm = self.nested_dissection(row)
+        self.perm = np.asarray(self.perm, dtype=np.int64)
+
+        self.inverse = np.empty(N, dtype=np.int64)
+        self.inverse[self.perm] = np.arange(N)
+        self.index = self.inverse[row]
+
+    @staticmethod
+    def row_index(ncells_x, ncells_y):
+        """
+        Row-ordering index l = n*(m-(i+1)) + j of every cell, as an (m, n) array.
+        """
+        m, n = ncells_y, ncells_x
+        i = np.arange(m).reshape(-1, 1)
+        j = np.arange(n).reshape(1, -1)
+        return n * (m - (i + 1)) + j
+
+    @staticmethod
+    def stencil_graph(index):
+        """
+        Adjacency of the five-point stencil between the cells of index.
+        """
+        rows = np.concatenate([index[:, :-1].ravel(), index[:, 1:].ravel(),
+                               index[:-1, :].ravel(), index[1:, :].ravel()])
+        cols = np.concatenate([index[:, 1:].ravel(), index[:, :-1].ravel(),
+                               index[1:, :].ravel(), index[:-1, :].ravel()])
+        N = index.size
+        return sp.csr_matrix((np.ones(rows.size), (rows, cols)), shape=(N, N))
+
+    def nested_dissection(self, block):
+        """
+        Order a block of cells as: first half, second half, then the
+        separator line between them, splitting across the longer side.
+        """
+        h, w = block.shape
+        if h * w <= 4:
+            return block[::-1, :].ravel()
+        if w >= h:
+            c = w // 2
+            parts = (block[:, :c], block[:, c + 1:])
+            separator = block[::-1, c]
+        else:
+            c = h // 2
+            parts = (block[c + 1:, :], block[:c, :])
+            separator = block[c, :]
+        return np.concatenate([self.nested_dissection(parts[0]),
+                               self.nested_dissection(parts[1]),
+                               separator])
+
+    # grid <-> vector
+    def global_index(self, i, j):
+        return int(self.index[i, j])
+
+    def grid_index(self):
+        """
+        Index of every cell in this ordering, as an (m, n) array.
+        """
+        return self.index
+
+    def to_grid(self, x):
+        return np.asarray(x)[self.index]
+
+    def to_vector(self, phi):
+        x = np.empty(self.ncells_x * self.ncells_y)
+        x[self.index] = phi
+        return x
+
+    def bandwidth(self):
+        """
+        Largest index distance between two coupled cells.
+        """
+        band = 0
+        if self.ncells_x > 1:
+            band = max(band, np.abs(np.diff(self.index, axis=1)).max())
+        if self.ncells_y > 1:
+            band = max(band, np.abs(np.diff(self.index, axis=0)).max())
+        return int(band)
+
+    # row ordering <-> this ordering
+    def permute(self, x):
+        """
+        Vector (or (N, k) block) in the row ordering -> this ordering.
+        """
+        return np.asarray(x)[self.perm]
+
+    def unpermute(self, x):
+        """
+        Vector (or (N, k) block) in this ordering -> the row ordering.
+        """
+        return np.asarray(x)[self.inverse]
+
+    def permute_matrix(self, A):
+        """
+        P A P^T for A assembled in the row ordering. A Diffusion_operator
+        has no ordering of its own and is converted to CSR first.
+        """
+        if self.is_row:
+            return A
+        if isinstance(A, Diffusion_operator):
+            A = A.tocsr()
+        if sp.issparse(A):
+            A = sp.csr_matrix(A)
+            return A[self.perm][:, self.perm]
+        return np.asarray(A)[np.ix_(self.perm, self.perm)]
+
+    def permute_system(self, A, b):
+        return self.permute_matrix(A), self.permute(b)
@@ -1,6 +1,7 @@
 import time
 import numpy as np
 import matplotlib.pyplot as plt
+from src.classes.Numbering import Numbering
 
 class Plotter:
     """
@@ -51,10 +52,20 @@ class Plotter:
             cbar.set_label("Flux")
 
         # Secondary axes in physical coordinates
-        idx_to_xcm = lambda j: (j + 0.5) * dx
-        xcm_to_idx = lambda x: x / dx - 0.5
-        idx_to_ycm = lambda i: (i + 0.5) * dy
-        ycm_to_idx = lambda y: y / dy - 0.5
+        if np.ndim(dx) or np.ndim(dy):
+            # non-uniform mesh: cell centres, dy given from the top row down
+            x_centres = np.cumsum(np.broadcast_to(dx, (m,))) - 0.5 * np.broadcast_to(dx, (m,))
+            dy_up = np.broadcast_to(dy, (n,))[::-1]
+            y_centres = np.cumsum(dy_up) - 0.5 * dy_up
+            idx_to_xcm = lambda j: np.interp(j, np.arange(m), x_centres)
+            xcm_to_idx = lambda x: np.interp(x, x_centres, np.arange(m))
+            idx_to_ycm = lambda i: np.interp(i, np.arange(n), y_centres)
+            ycm_to_idx = lambda y: np.interp(y, y_centres, np.arange(n))
+        else:
+            idx_to_xcm = lambda j: (j + 0.5) * dx
+            xcm_to_idx = lambda x: x / dx - 0.5
+            idx_to_ycm = lambda i: (i + 0.5) * dy
+            ycm_to_idx = lambda y: y / dy - 0.5
 
         secax_x = ax.secondary_xaxis('top', functions=(idx_to_xcm, xcm_to_idx))
         secax_y = ax.secondary_yaxis('right', functions=(idx_to_ycm, ycm_to_idx))
@@ -77,14 +88,17 @@ class Plotter:
         plt.show()
 
 
-    def vector_to_matrix(self, vector, n, m):
+    def vector_to_matrix(self, vector, n, m, numbering=None):
         """
-        Converts a 1D solution vector into a 2D matrix (row-major).
+        Converts a 1D solution vector into a 2D matrix, bottom row of the
+        domain first (as drawn with origin='lower').
 
         Parameters:
             vector (ndarray): The 1D solution vector.
             n (int): Number of rows in the resulting matrix.
             m (int): Number of columns in the resulting matrix.
+            numbering (Numbering): Ordering of the vector, the row ordering
+                used to assemble A by default.
 
         Returns:
             ndarray: The reshaped 2D matrix of shape (n, m).
@@ -94,9 +108,6 @@ class Plotter:
             raise ValueError(
                 f"Vector size ({vector.size}) does not match n*m = {n*m}."
             )
-        solution_matrix = np.zeros((n, m))
-        for i in range(n):
-            start = i * m
-            end = start + m
-            solution_matrix[i, :] = vector[start:end]
-        return solution_matrix
\ No newline at end of file
+        if numbering is None:
+            numbering = Numbering(m, n)
+        return numbering.to_grid(vector)[::-1, :].astype(float)
\ No newline at end of file
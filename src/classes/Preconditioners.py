@@ -0,0 +1,200 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve_triangular
+from src.classes.Diffusion_operator import Diffusion_operator
+
+class Jacobi_preconditioner:
+    """
+    Diagonal (Jacobi) preconditioner, M = D.
+    Works with dense, sparse and matrix-free A, and r may be an (N, k)
+    block of residuals.
+    """
+
+    def __init__(self, A):
+        d = A.diagonal()
+        if np.any(d == 0):
+            raise np.linalg.LinAlgError("Zero on diagonal — Jacobi preconditioner not applicable")
+        self.d_inv = 1.0 / d
+
+    def apply(self, r):
+        return self.d_inv.reshape((-1,) + (1,) * (np.ndim(r) - 1)) * r
+
+
+class Triangular_preconditioner:
+    """
+    Preconditioner in factored form M = scale^-1 (P + L) P^-1 (P + U), with
+    L, U the strict lower/upper parts of A and P a diagonal of pivots.
+    Applying M^-1 is one forward and one backward triangular solve.
+
+    On a Diffusion_operator the solves run along anti-diagonals of the
+    grid (wavefronts), each one vectorized; on dense/sparse A they use
+    sparse triangular solves on CSR factors built once. Both take an
+    (N, k) block of residuals, solved for every column at once.
+    """
+
+    def __init__(self, A, pivots, scale=1.0):
+        self.A = A
+        self.scale = scale
+        if isinstance(A, Diffusion_operator):
+            self.setup_grid(A, A.to_grid(pivots))
+        else:
+            self.setup_csr(sp.csr_matrix(A), pivots)
+
+    # CSR path
+    def setup_csr(self, A, pivots):
+        self.grid = False
+        P_inv = sp.diags(1.0 / pivots)
+        N = A.shape[0]
+        # unit-diagonal factors: (I + P^-1 L) and (I + P^-1 U)
+        self.lower = (sp.eye(N) + P_inv @ sp.tril(A, -1)).tocsr()
+        self.upper = (sp.eye(N) + P_inv @ sp.triu(A, 1)).tocsr()
+        self.lower.sort_indices()
+        self.upper.sort_indices()
+        self.p_inv = 1.0 / pivots
+
+    def apply_csr(self, r):
+        p_inv = self.p_inv.reshape((-1,) + (1,) * (np.ndim(r) - 1))
+        y = spsolve_triangular(self.lower, p_inv * r, lower=True,
+                               unit_diagonal=True, overwrite_b=True)
+        # the factors are kept: overwrite_A would let scipy clear their diagonal
+        return spsolve_triangular(self.upper, y, lower=False,
+                                  unit_diagonal=True, overwrite_b=True)
+
+    # grid path
+    def setup_grid(self, op, pivots):
+        """
+        Store the stencil on a ghost-padded grid, flattened, and the cells
+        of every anti-diagonal of the global numbering. A cell only depends
+        on its left and bottom neighbours in the forward solve (and on its
+        right and top neighbours in the backward one), which all lie on the
+        previous (next) anti-diagonal.
+        """
+        self.grid = True
+        m, n = op.ncells_y, op.ncells_x
+        self.m, self.n = m, n
+        self.stride = n + 2
+
+        def padded(a, ghost=0.0):
+            P = np.full((m + 2, n + 2), ghost)
+            P[1:-1, 1:-1] = a
+            return P.ravel()
+
+        self.left = padded(op.left)
+        self.right = padded(op.right)
+        self.top = padded(op.top)
+        self.bottom = padded(op.bottom)
+        self.pivots = padded(pivots, ghost=1.0)
+
+        # anti-diagonals k = (m - 1 - i) + j, visited in increasing k
+        self.fronts = []
+        for k in range(m + n - 1):
+            r = np.arange(max(0, k - n + 1), min(m - 1, k) + 1)
+            i = m - 1 - r
+            j = k - r
+            self.fronts.append((i + 1) * self.stride + (j + 1))
+
+    def apply_grid(self, r):
+        m, n, s = self.m, self.n, self.stride
+        columns = np.shape(r)[1:]
+        rhs = np.zeros((m + 2, n + 2) + columns)
+        rhs[1:-1, 1:-1] = self.A.to_grid(r)
+        rhs = rhs.reshape((-1,) + columns)
+        # the stencil broadcast over the columns of a block
+        shape = (-1,) + (1,) * len(columns)
+        left, right, top, bottom, pivots = (a.reshape(shape) for a in (
+            self.left, self.right, self.top, self.bottom, self.pivots))
+
+        # (P + L) y = r
+        y = np.zeros_like(rhs)
+        for idx in self.fronts:
+            y[idx] = (rhs[idx]
+                      + left[idx] * y[idx - 1]
+                      + bottom[idx] * y[idx + s]) / pivots[idx]
+
+        # (P + U) z = P y
+        z = np.zeros_like(rhs)
+        for idx in reversed(self.fronts):
+            z[idx] = y[idx] + (right[idx] * z[idx + 1]
+                               + top[idx] * z[idx - s]) / pivots[idx]
+
+        return self.A.to_vector(z.reshape((m + 2, n + 2) + columns)[1:-1, 1:-1])
+
+    def apply(self, r):
+        if self.grid:
+            z = self.apply_grid(r)
+        else:
+            z = self.apply_csr(r)
+        if self.scale != 1.0:
+            z *= self.scale
+        return z
+
+
+class SSOR_preconditioner(Triangular_preconditioner):
+    """
+    Symmetric SOR preconditioner,
+        M = omega/(2 - omega) (D/omega + L) (D/omega)^-1 (D/omega + U).
+    """
+
+    def __init__(self, A, omega=1.0):
+        if not 0.0 < omega < 2.0:
+            raise ValueError("SSOR relaxation factor must be in (0, 2).")
+        d = A.diagonal()
+        if np.any(d == 0):
+            raise np.linalg.LinAlgError("Zero on diagonal — SSOR preconditioner not applicable")
+        self.omega = omega
+        super().__init__(A, d / omega, scale=(2.0 - omega) / omega)
+
+
+class Incomplete_cholesky_preconditioner(Triangular_preconditioner):
+    """
+    Zero fill-in incomplete Cholesky, IC(0), in the form
+    M = (P + L) P^-1 (P + U) with pivots
+        p_i = a_ii - sum_{j<i} a_ij a_ji / p_j
+    over the nonzeros of A. For the five-point stencil this is exactly
+    IC(0), since every dropped fill-in lies outside the stencil pattern.
+    """
+
+    def __init__(self, A):
+        if isinstance(A, Diffusion_operator):
+            pivots = self.grid_pivots(A)
+        else:
+            pivots = self.csr_pivots(sp.csr_matrix(A))
+        if np.any(pivots <= 0):
+            raise np.linalg.LinAlgError("Incomplete Cholesky breakdown: non-positive pivot.")
+        super().__init__(A, pivots)
+
+    @staticmethod
+    def csr_pivots(A):
+        d = A.diagonal()
+        # a_ij * a_ji for j < i, stored at (i, j)
+        products = sp.tril(A, -1).multiply(sp.triu(A, 1).T).tocsr()
+        products.sort_indices()
+        # sequential recurrence over a handful of entries per row: plain
+        # Python lists are much cheaper here than per-row NumPy slices
+        indptr = products.indptr.tolist()
+        indices = products.indices.tolist()
+        data = products.data.tolist()
+        d = d.tolist()
+        for i in range(A.shape[0]):
+            for k in range(indptr[i], indptr[i + 1]):
+                d[i] -= data[k] / d[indices[k]]
+        return np.array(d)
+
+    @staticmethod
+    def grid_pivots(op):
+        m, n = op.ncells_y, op.ncells_x
+        p = np.ones((m + 2, n + 2))
+        # a_ij * a_ji towards the left and bottom neighbours
+        w_left = np.zeros((m, n))
+        w_left[:, 1:] = op.left[:, 1:] * op.right[:, :-1]
+        w_bottom = np.zeros((m, n))
+        w_bottom[:-1, :] = op.bottom[:-1, :] * op.top[1:, :]
+
+        for k in range(m + n - 1):
+            r = np.arange(max(0, k - n + 1), min(m - 1, k) + 1)
+            i = m - 1 - r
+            j = k - r
+            p[i + 1, j + 1] = (op.diag[i, j]
+                               - w_left[i, j] / p[i + 1, j]
+                               - w_bottom[i, j] / p[i + 2, j + 1])
+        return op.to_vector(p[1:-1, 1:-1])
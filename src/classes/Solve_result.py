@@ -0,0 +1,292 @@
+import time
+import numpy as np
+
+class Solve_result(np.ndarray):
+    """
+    Solution vector returned by the solvers, with the record of the solve.
+    It is the ndarray of the solution, so it can be used as before, and
+    carries (the arrays derived from it do not):
+        method (str): Name of the solver.
+        converged (bool): Whether the stopping criterion was met.
+        reason (str): Why the iteration stopped: "tolerance" (criterion
+            met), "max_iter", "diverged", "stagnated" (no more progress,
+            see Solvers.mixed_precision) or "direct".
+        criterion (str): The stopping criterion, see Solve_monitor.
+        iterations (int): Number of iterations done.
+        changes (list): Relative change ||x_k+1 - x_k|| / ||x_k|| of every
+            tested iteration (empty when the criterion does not need it).
+        residuals (list): (iteration, ||b - A x|| / ||b||) pairs, recorded
+            every residual_interval iterations and at the end.
+        setup_time, iteration_time (float): Wall time in seconds spent
+            before the first iteration (splittings, preconditioners,
+            eigenvalue estimates) and in the iterations.
+    Usage:
+        x = Solvers(A, b).sor()
+        if not x.converged:
+            print(x.reason, x.iterations, x.residuals[-1])
+    """
+
+    INFO = ("method", "converged", "reason", "criterion", "iterations", "changes", "residuals",
+            "setup_time", "iteration_time")
+
+    def __new__(cls, x, **info):
+        x = np.asarray(x)
+        # float32 for the inner solves of a mixed-precision solve, float otherwise
+        result = (x if np.issubdtype(x.dtype, np.floating) else x.astype(float)).view(cls)
+        for name in cls.INFO:
+            setattr(result, name, info.get(name))
+        return result
+
+    def __array_finalize__(self, obj):
+        # views and arithmetic (x[:5], 2*x, x - ref) are other vectors than
+        # the solution: they carry no record, see with_solution
+        for name in self.INFO:
+            setattr(self, name, None)
+
+    def info(self):
+        """
+        The record of the solve as a dict.
+        """
+        return {name: getattr(self, name) for name in self.INFO}
+
+    def with_solution(self, x):
+        """
+        Same record for another vector, e.g. the solution mapped back to
+        every cell of the grid.
+        """
+        return Solve_result(x, **self.info())
+
+    def residual(self):
+        """
+        Last recorded relative residual, None if there is none.
+        """
+        return self.residuals[-1][1] if self.residuals else None
+
+    def total_time(self):
+        return self.setup_time + self.iteration_time
+
+
+class Solve_monitor:
+    """
+    Bookkeeping and stopping test of one iterative solve for Solve_result:
+    times the setup and the iterations, tests the stopping criterion every
+    check_interval iterations and keeps what it measured, plus the
+    relative residual every residual_interval iterations. A residual costs
+    one product with A unless the sweep already has it (the residual of
+    the previous iterate, see check). The difference of the iterates and
+    the residual go to buffers allocated once, so a monitored iteration
+    allocates nothing either.
+    Criteria:
+        "change"    ||x_new - x_old|| / ||x_old|| < tol (free, but only
+                    says the iteration stalls, not that x is accurate)
+        "residual"  ||b - A x|| / ||b|| < tol
+        "absolute"  ||b - A x|| < tol
+    With columns=True, b is an (N, k) block of right-hand sides: the
+    residual norms are taken per column and the worst column decides.
+    Usage:
+        monitor = Solve_monitor("jacobi", A_dot, b, criterion="residual", check_interval=5)
+        ...setup...
+        monitor.start()
+        for _ in range(max_iter):
+            ...
+            if monitor.check(x_new, x, tol):
+                return monitor.result(x_new)
+        return monitor.result(x)
+    """
+
+    CRITERIA = ("change", "residual", "absolute")
+
+    def __init__(self, method, A_dot, b, residual_interval=10, to_vector=None, criterion="change",
+                 check_interval=1, columns=False):
+        """
+        Parameters:
+            A_dot (callable): A_dot(x, out) writes A·x to out.
+            b (ndarray): Right-hand side, shaped like the iterates.
+            to_vector (callable): Maps an iterate to the solution vector,
+                for the solves iterating on the cell grid.
+            criterion (str): "change", "residual" or "absolute".
+            check_interval (int): Iterations between two stopping tests.
+            columns (bool): b is a block of right-hand sides, one per column.
+        """
+        if criterion not in self.CRITERIA:
+            raise ValueError(f"Unknown stopping criterion: {criterion}")
+        if int(check_interval) < 1:
+            raise ValueError("The check interval must be at least 1.")
+        self.method = method
+        self.A_dot = A_dot
+        self.to_vector = to_vector
+        self.b = b
+        self.columns = columns
+        if columns:
+            b_norm = np.linalg.norm(b, axis=0)
+            self.b_norm = np.where(b_norm == 0, 1.0, b_norm)
+        else:
+            self.b_norm = np.linalg.norm(b) or 1.0
+        self.residual_interval = residual_interval
+        self.criterion = criterion
+        self.check_interval = int(check_interval)
+        self.iterations = 0
+        self.changes = []
+        self.residuals = []
+        self.reason = "max_iter"
+        # the stop was decided on the residual of x_old, which is the solution
+        self.lagged = False
+        # ||x_new - x_old|| of the last measured iteration, for the omega="auto" updates
+        self.update_norm = None
+        self._difference = None
+        self._residual = None
+        self.started = time.perf_counter()
+        self.setup_time = 0.0
+
+    def start(self):
+        """
+        End of the setup, the iterations begin.
+        """
+        now = time.perf_counter()
+        self.setup_time = now - self.started
+        self.started = now
+
+    def due(self):
+        """
+        Whether the coming iteration is tested.
+        """
+        return (self.iterations + 1) % self.check_interval == 0
+
+    def wants_residual(self):
+        """
+        Whether the coming iteration tests or records a residual, i.e.
+        whether a sweep that can give the residual of its input on the way
+        should pass it to check.
+        """
+        return (self.criterion != "change" and self.due()) or \
+            bool(self.residual_interval and (self.iterations + 1) % self.residual_interval == 0)
+
+    def needs_previous(self, measure=False):
+        """
+        Whether the coming iteration uses x_old, so that a solve updating
+        x in place must keep a copy of it.
+        """
+        return measure or (self.criterion == "change" and self.due())
+
+    def residual_norm(self, x):
+        """
+        ||b - A x||, one product with A (the norm of every column with
+        columns=True).
+        """
+        if self._residual is None:
+            self._residual = np.empty(np.shape(x), dtype=np.result_type(x))
+        r = self._residual
+        self.A_dot(x, r)
+        np.subtract(self.b, r, out=r)
+        if self.columns:
+            return np.linalg.norm(r, axis=0)
+        return float(np.linalg.norm(r))
+
+    def relative_residual(self, x):
+        return float(np.max(self.residual_norm(x) / self.b_norm))
+
+    def met(self, tol, change=None, residual=None):
+        """
+        Test the criterion on the relative change or on the residual norm
+        ||b - A x|| (whichever it needs), and note it as the reason to stop.
+        """
+        value = change if self.criterion == "change" else residual
+        if self.criterion == "residual":
+            value = value / self.b_norm
+        if np.max(value) < tol:
+            self.reason = "tolerance"
+            return True
+        return False
+
+    def record(self, x, change=None, residual=None):
+        """
+        Count an iteration ending at x, with its relative change and, when
+        already known, its relative residual.
+        Returns:
+            bool: True if the iterate is not finite (the solve diverged).
+        """
+        self.iterations += 1
+        if change is not None:
+            self.changes.append(float(change))
+        if residual is not None:
+            self.residuals.append((self.iterations, float(residual)))
+        elif self.residual_interval and self.iterations % self.residual_interval == 0:
+            self.residuals.append((self.iterations, self.relative_residual(x)))
+        last = change if change is not None else residual
+        if last is not None and not np.isfinite(last):
+            self.reason = "diverged"
+            return True
+        return False
+
+    def check(self, x_new, x_old, tol, residual=None, measure=False):
+        """
+        Record an iteration and, every check_interval iterations, test the
+        criterion against tol.
+        Parameters:
+            residual (ndarray): b - A x_old when the sweep computed it on
+                the way (Jacobi, multigrid): a residual test then costs a
+                norm only, and when it passes x_old is the solution
+                (self.lagged, the iteration is not counted).
+            measure (bool): Compute the change (and update_norm) even when
+                the iteration is not tested.
+        Returns:
+            bool: True when the iteration must stop.
+        """
+        due = self.due()
+        change = None
+        if measure or (due and self.criterion == "change"):
+            if self._difference is None:
+                self._difference = np.empty(np.shape(x_new), dtype=np.result_type(x_new))
+            np.subtract(x_new, x_old, out=self._difference)
+            change = self.update_norm = np.linalg.norm(self._difference)
+            denom = np.linalg.norm(x_old)
+            if denom != 0:
+                change /= denom
+
+        norm = None
+        lagged = False
+        if residual is not None and ((due and self.criterion != "change") or
+                                     (self.residual_interval and
+                                      (self.iterations + 1) % self.residual_interval == 0)):
+            norm = float(np.linalg.norm(residual))
+            lagged = True
+        elif due and self.criterion != "change":
+            norm = self.residual_norm(x_new)
+
+        self.iterations += 1
+        if change is not None:
+            self.changes.append(float(change))
+        if norm is not None:
+            self.residuals.append((self.iterations - lagged, norm / self.b_norm))
+        elif self.residual_interval and self.iterations % self.residual_interval == 0:
+            self.residuals.append((self.iterations, self.relative_residual(x_new)))
+        if not np.isfinite(change if change is not None else 0.0) or \
+                not np.isfinite(norm if norm is not None else 0.0):
+            self.reason = "diverged"
+            return True
+
+        if not due or not self.met(tol, change=change, residual=norm):
+            return False
+        if lagged and self.criterion != "change":
+            self.lagged = True
+            self.iterations -= 1
+            if change is not None:
+                self.changes.pop()
+        return True
+
+    def result(self, x, reason=None):
+        """
+        Solve_result for the final x; the final residual is always recorded.
+        """
+        if reason is not None:
+            self.reason = reason
+        iteration_time = time.perf_counter() - self.started
+        if self.reason != "diverged" and (not self.residuals or self.residuals[-1][0] != self.iterations):
+            self.residuals.append((self.iterations, self.relative_residual(x)))
+        if self.to_vector is not None:
+            x = self.to_vector(x)
+        return Solve_result(x, method=self.method, converged=self.reason in ("tolerance", "direct"),
+                            reason=self.reason, criterion=self.criterion, iterations=self.iterations,
+                            changes=self.changes,
+                            residuals=self.residuals, setup_time=self.setup_time,
+                            iteration_time=iteration_time)
@@ -1,100 +1,904 @@
 import numpy as np
+import scipy.sparse as sp
+from src.classes.Diffusion_operator import Diffusion_operator
+from src.classes.Banded_cholesky import Banded_cholesky
+from src.classes.Multigrid import Multigrid
+from src.classes.Solve_result import Solve_result, Solve_monitor
+from src.classes.Preconditioners import (
+    Jacobi_preconditioner, SSOR_preconditioner, Incomplete_cholesky_preconditioner
+)
 
 class Solvers:
     """
-    Simple container for stationary iterative linear solvers: Jacobi, Gauss-Seidel, and SOR.
+    Simple container for linear solvers: stationary iterations (Jacobi,
+    Gauss-Seidel, SOR, red-black SOR, line SOR/ADI, multigrid) and preconditioned
+    conjugate gradients, plus a banded Cholesky direct solve.
+    A may be a dense array, a scipy.sparse matrix (kept in CSR format) or a
+    matrix-free Diffusion_operator.
+    Every solver returns a Solve_result: the solution vector carrying the
+    iteration count, the relative change and residual histories, the setup
+    and iteration times, whether it converged and why it stopped. The
+    residual costs one product with A, so it is only computed every
+    residual_interval iterations (0 for the final one only).
+    criterion picks the stopping test, see Solve_monitor: "change" (the
+    relative change of the iterates, the default of the stationary
+    methods), "residual" (||b - A x|| / ||b||, the default of CG) or
+    "absolute" (||b - A x||). It is done every check_interval iterations;
+    Jacobi and multigrid get the residual from their sweep, the other
+    methods pay one product with A per residual test.
+    The iterations of jacobi, gauss_seidel, sor, red_black_sor and cg
+    without a preconditioner run on buffers allocated before the first one
+    (two for the iterate, plus the monitor's), with out= arithmetic and
+    products written in place, so that on a dense A or a
+    Diffusion_operator they allocate nothing in steady state. A sparse A
+    goes through the public M.dot, which returns a new vector per product
+    (and the forward substitution one per level). The line solves of
+    line_sor/adi, the multigrid cycles, the preconditioners of cg and the
+    histories of accelerated() still allocate work arrays every iteration,
+    and so does the new splitting of omega="auto" on CSR and dense A.
+    b may also be an (N, k) block of right-hand sides for the same A,
+    solved together by block_cg.
     Usage:
-        s = Solvers(A, b, x0=None, tol=1e-10, max_iter=1000)
+        s = Solvers(A, b, x0=None, tol=1e-10, max_iter=1000, residual_interval=10,
+                    criterion=None, check_interval=1)
         x = s.jacobi()
         x = s.gauss_seidel()
         x = s.sor(omega=1.25)
+        x = s.sor(omega="auto")     # factor used in s.omega
+        x = s.line_sor(direction="x")
+        x = s.adi()
+        x = s.accelerated("gauss_seidel", acceleration="anderson", depth=5)
+        x = s.multigrid(mg)
+        x = s.cg(preconditioner="ichol")
+        X = Solvers(A, B).block_cg(preconditioner="ichol")   # B of shape (N, k)
+        x = s.cholesky()
+        x = s.mixed_precision("sor", omega=1.8)    # float32 sweeps, float64 accuracy
+        x.converged, x.reason, x.iterations, x.residual()
     """
 
-    def __init__(self, A, b, x0=None, tol=1e-10, max_iter=1000):
-        self.A = np.asarray(A, dtype=float)
-        self.b = np.asarray(b, dtype=float)
+    # iterations between two updates of omega="auto" from the convergence rate
+    ADAPT_INTERVAL = 10
+
+    def __init__(self, A, b, x0=None, tol=1e-10, max_iter=1000, residual_interval=10, criterion=None,
+                 check_interval=1, dtype=float):
+        self.dtype = np.dtype(dtype)
+        if sp.issparse(A):
+            self.A = sp.csr_matrix(A, dtype=self.dtype)
+        elif isinstance(A, Diffusion_operator):
+            self.A = A if A.dtype == self.dtype else A.astype(self.dtype)
+        else:
+            self.A = np.asarray(A, dtype=self.dtype)
+        self.b = np.asarray(b, dtype=self.dtype)
 
         if self.A.ndim != 2 or self.A.shape[0] != self.A.shape[1]:
             raise ValueError("A must be a square matrix")
         if self.b.ndim == 1:
             if self.b.shape[0] != self.A.shape[0]:
                 raise ValueError("b must have compatible dimensions with A")
+        elif self.b.ndim == 2 and self.b.shape[0] == self.A.shape[0] and self.b.shape[1] > 1:
+            # a block of right-hand sides, one per column
+            self.b = np.ascontiguousarray(self.b)
         else:
             self.b = self.b.ravel()
             if self.b.shape[0] != self.A.shape[0]:
                 raise ValueError("b must have compatible dimensions with A")
         if x0 is None:
-            x0 = np.zeros_like(self.b, dtype=float)
+            x0 = np.zeros_like(self.b)
             
-        self.x0 = np.asarray(x0, dtype=float)
+        self.x0 = np.asarray(x0, dtype=self.dtype)
         self.tol = tol
         self.max_iter = int(max_iter)
+        self.residual_interval = int(residual_interval)
+        if criterion is not None and criterion not in Solve_monitor.CRITERIA:
+            raise ValueError(f"Unknown stopping criterion: {criterion}")
+        if int(check_interval) < 1:
+            raise ValueError("The check interval must be at least 1.")
+        # None: each method's own, see monitor
+        self.criterion = criterion
+        self.check_interval = int(check_interval)
+        # relaxation factor of the last SOR solve and the values it took
+        self.omega = None
+        self.omega_history = []
+        # rows of the forward substitution grouped by level, see forward_substitution
+        self._substitution_levels = None
 
-    @staticmethod
-    def err_rel(x_new, x_old):
-        err = np.linalg.norm(x_new - x_old)
-        denom = np.linalg.norm(x_old)
-        if denom != 0:
-            err /= denom
-        return err
+    def monitor(self, method, grid=False, criterion="change"):
+        """
+        Solve_monitor of a solve with this A and b. grid=True for the solves
+        iterating on the cell array of a Diffusion_operator; criterion is
+        the method's default, used unless one was given to the constructor.
+        """
+        criterion = self.criterion or criterion
+        if grid:
+            return Solve_monitor(method, self.A.apply_grid, self.A.to_grid(self.b),
+                                 self.residual_interval, to_vector=self.A.to_vector,
+                                 criterion=criterion, check_interval=self.check_interval)
+        return Solve_monitor(method, self.product(), self.b, self.residual_interval,
+                             criterion=criterion, check_interval=self.check_interval,
+                             columns=self.b.ndim == 2)
+
+    def product(self, M=None):
+        """
+        Function (x, out) writing M·x to out, M = A when not given (dense,
+        sparse or Diffusion_operator). x and out may be (N, k) blocks,
+        multiplied in one pass over M. Dense and matrix-free products
+        allocate nothing; a sparse product is computed by M.dot and copied
+        into out.
+        """
+        M = self.A if M is None else M
+        if isinstance(M, Diffusion_operator):
+            return M.dot
+        if not sp.issparse(M):
+            return lambda x, out: np.dot(M, x, out=out)
+
+        M = sp.csr_matrix(M, dtype=self.dtype)
+
+        def sparse_dot(x, out):
+            out[...] = M.dot(x)
+            return out
+        return sparse_dot
+
+    def is_sparse(self):
+        return sp.issparse(self.A)
+
+    def is_matrix_free(self):
+        return isinstance(self.A, Diffusion_operator)
 
     def jacobi(self, x0=None, tol=None, max_iter=None):
         A = self.A
         b = self.b
-        x = self.x0 if x0 is None else np.asarray(x0, dtype=float)
+        x = np.array(self.x0 if x0 is None else x0, dtype=self.dtype)
         tol = self.tol if tol is None else tol
         max_iter = self.max_iter if max_iter is None else int(max_iter)
 
-        d = np.diag(A)
+        monitor = self.monitor("jacobi")
+        d = A.diagonal()
         if np.any(d == 0):
             raise np.linalg.LinAlgError("Zero on diagonal — Jacobi not applicable")
         D_inv = 1.0 / d
-        D = np.diag(d)
-        R = A - D 
+        R_dot = self._off_diagonal_dot(d)
+        x_new = np.empty_like(x)
+        r = np.empty_like(x)
 
+        monitor.start()
         for _ in range(max_iter):
-            x_new = D_inv * (b - R.dot(x))
-            if self.err_rel(x_new, x) < tol:
-                return x_new
-            x = x_new
-        return x
+            # x_new = D^-1 (b - R x)
+            R_dot(x, x_new)
+            np.subtract(b, x_new, out=x_new)
+            residual = None
+            if monitor.wants_residual():
+                # b - A x = (b - R x) - D x, the residual of x on the way
+                residual = np.subtract(x_new, np.multiply(d, x, out=r), out=r)
+            x_new *= D_inv
+            if monitor.check(x_new, x, tol, residual=residual):
+                return monitor.result(x if monitor.lagged else x_new)
+            x, x_new = x_new, x
+        return monitor.result(x)
+
+    def _off_diagonal_dot(self, d):
+        """
+        Product (x, out) -> R·x with R = A - D, D the diagonal d of A. A
+        dense A is not copied: R·x = A·x - d*x.
+        """
+        if self.is_matrix_free():
+            return self.A.off_diagonal_dot
+        elif self.is_sparse():
+            return self.product((self.A - sp.diags(d)).tocsr())
+        A_dot = self.product()
+        work = np.empty_like(d)
+
+        def R_dot(x, out):
+            A_dot(x, out)
+            out -= np.multiply(d, x, out=work)
+            return out
+        return R_dot
+
+    def jacobi_spectral_radius(self, iterations=50):
+        """
+        Estimate of the spectral radius of the Jacobi iteration matrix
+        B = -D^-1 R by power iteration. B has no negative entries for the
+        diffusion matrices, so its dominant eigenvector is positive and a
+        constant start vector is close to it; the estimate approaches the
+        radius from below.
+        """
+        d = self.A.diagonal()
+        if np.any(d == 0):
+            raise np.linalg.LinAlgError("Zero on diagonal — Jacobi not applicable")
+        R_dot = self._off_diagonal_dot(d)
+        x = np.ones(d.shape[0], dtype=self.dtype) / np.sqrt(d.shape[0])
+        y = np.empty_like(x)
+        rho = 0.0
+        for _ in range(iterations):
+            R_dot(x, y)
+            y /= -d
+            rho = np.linalg.norm(y)
+            if rho == 0.0:
+                break
+            np.divide(y, rho, out=x)
+        return float(rho)
+
+    @staticmethod
+    def optimal_omega(rho):
+        """
+        Optimal SOR factor 2 / (1 + sqrt(1 - rho²)) for the Jacobi radius rho
+        (exact for consistently ordered matrices, which the five-point
+        stencil is in the row and red-black orderings).
+        """
+        rho = min(rho, 1.0 - 1e-12)
+        return 2.0 / (1.0 + np.sqrt(1.0 - rho ** 2))
+
+    def initial_omega(self, omega):
+        """
+        Start (omega, rho) of a SOR solve: the given factor and no radius,
+        or for omega="auto" the optimal factor of the estimated Jacobi
+        radius rho, which adapt_omega then improves.
+        """
+        rho = None
+        if isinstance(omega, str):
+            if omega != "auto":
+                raise ValueError(f"Unknown relaxation factor: {omega}")
+            rho = self.jacobi_spectral_radius()
+            omega = self.optimal_omega(rho)
+        self.omega = omega
+        self.omega_history = [omega]
+        return omega, rho
+
+    def adapt_omega(self, omega, rho, updates):
+        """
+        Raise the Jacobi radius estimate from the observed SOR convergence
+        (Hageman & Young). Below the optimum the update norms shrink by the
+        SOR radius lambda, which gives the Jacobi radius
+            mu = (lambda + omega - 1) / (omega * sqrt(lambda));
+        at or above it lambda = omega - 1 and nothing can be learnt. The
+        rate is averaged over ADAPT_INTERVAL iterations and only used once
+        two consecutive averages agree, i.e. the transient has died out.
+        Parameters:
+            updates (list): Norms of every update so far.
+        Returns:
+            tuple: (omega, rho), the new factor when the estimate grew.
+        """
+        k = self.ADAPT_INTERVAL
+        if rho is None or len(updates) <= 2 * k or len(updates) % k or min(updates[-1 - 2 * k:]) == 0.0:
+            return omega, rho
+        previous = (updates[-1 - k] / updates[-1 - 2 * k]) ** (1.0 / k)
+        rate = (updates[-1] / updates[-1 - k]) ** (1.0 / k)
+        if not max(omega - 1.0, 0.0) ** 0.75 < rate < 1.0 or abs(rate - previous) > 0.1 * (1.0 - rate):
+            return omega, rho
+        mu = (rate + omega - 1.0) / (omega * np.sqrt(rate))
+        if mu <= rho:
+            return omega, rho
+        omega = self.optimal_omega(mu)
+        self.omega = omega
+        self.omega_history.append(omega)
+        return omega, mu
 
     def gauss_seidel(self, x0=None, tol=None, max_iter=None):
+        x = self.x0 if x0 is None else np.asarray(x0, dtype=self.dtype)
+        tol = self.tol if tol is None else tol
+        max_iter = self.max_iter if max_iter is None else int(max_iter)
+
+        if self.is_matrix_free():
+            return self._matrix_free_sor(1.0, x, tol, max_iter, "gauss_seidel")
+
+        return self._sweep_sor(1.0, x, tol, max_iter, "gauss_seidel")
+
+    def sor(self, omega=1.25, x0=None, tol=1e-6, max_iter=1e12):
+        """
+        SOR iteration. omega="auto" starts from the optimal factor for the
+        Jacobi spectral radius estimated by power iteration and raises it
+        from the observed convergence rate while iterating; the factor used
+        last is left in self.omega.
+        """
+        x = self.x0 if x0 is None else np.asarray(x0, dtype=self.dtype)
+        tol = self.tol if tol is None else tol
+        max_iter = self.max_iter if max_iter is None else int(max_iter)
+
+        if self.is_matrix_free():
+            return self._matrix_free_sor(omega, x, tol, max_iter, "sor")
+
+        return self._sweep_sor(omega, x, tol, max_iter, "sor")
+
+    def sor_splitting(self, omega):
+        """
+        Precompute the pieces of the SOR iteration
+            (D + omega*L) x_new = ((1 - omega)*D - omega*U) x + omega*b
+        with every row scaled by 1/d, so that the sweep is a unit lower
+        triangular solve. Only the nonzeros of A are kept, which for the
+        five-point stencil makes one sweep O(N).
+        Returns:
+            tuple: (M, N, c) with M unit lower triangular CSR, N CSR and
+            c = omega * b / d, so that M x_new = N x + c.
+        """
+        A = sp.csr_matrix(self.A)
+        d = A.diagonal()
+        if np.any(d == 0):
+            raise np.linalg.LinAlgError("Zero on diagonal — SOR not applicable")
+        D_inv = sp.diags(1.0 / d)
+
+        L = sp.tril(A, -1)
+        U = sp.triu(A, 1)
+        M = (sp.eye(A.shape[0]) + omega * (D_inv @ L)).tocsr()
+        N = ((1 - omega) * sp.eye(A.shape[0]) - omega * (D_inv @ U)).tocsr()
+        M.sort_indices()
+        c = omega * self.b / d
+        return M.astype(self.dtype, copy=False), N.astype(self.dtype, copy=False), c.astype(self.dtype, copy=False)
+
+    def forward_substitution(self, M):
+        """
+        Function (x) solving M y = x in place for a unit lower triangular
+        CSR M. The rows are grouped into levels (wavefronts) that only
+        depend on the levels before them, the anti-diagonals of the grid
+        for the five-point stencil in row order; each level is then one
+        sparse product on its rows, with the rows of L of every level
+        sliced out here. Rows of a level read x before it is overwritten,
+        so solving in place is safe. The levels only depend on the pattern
+        of A and are found once per Solvers.
+        """
+        M = sp.csr_matrix(M)
+        L = sp.tril(M, -1, format="csr")
+        n = M.shape[0]
+        if self._substitution_levels is None:
+            # level of every row, one more than the deepest row it depends
+            # on; a sequential recurrence, plain lists like csr_pivots
+            indptr = L.indptr.tolist()
+            indices = L.indices.tolist()
+            level = [0] * n
+            for i in range(n):
+                for k in range(indptr[i], indptr[i + 1]):
+                    level[i] = max(level[i], level[indices[k]] + 1)
+            level = np.array(level, dtype=np.int64)
+            self._substitution_levels = (np.argsort(level, kind="stable"),
+                                         np.cumsum(np.bincount(level))[:-1])
+        order, ends = self._substitution_levels
+        # the rows of L level by level, each level a run of rows of L_order
+        L_order = L[order]
+        levels = []
+        for start, end in zip(np.concatenate([[0], ends]), np.concatenate([ends, [n]])):
+            if L_order.indptr[start] == L_order.indptr[end]:
+                continue
+            levels.append((order[start:end], L_order[start:end], np.empty(end - start, dtype=M.dtype)))
+
+        def solve(x):
+            for rows, L_level, values in levels:
+                np.take(x, rows, out=values, mode="clip")
+                np.subtract(values, L_level.dot(x), out=values)
+                np.put(x, rows, values)
+            return x
+        return solve
+
+    def _sweep_sor(self, omega, x, tol, max_iter, method="sor"):
+        monitor = self.monitor(method)
+        omega, rho = self.initial_omega(omega)
+        M, N, c = self.sor_splitting(omega)
+        N_dot = self.product(N)
+        M_solve = self.forward_substitution(M)
+        x = np.array(x, dtype=self.dtype)
+        x_new = np.empty_like(x)
+        updates = []
+        monitor.start()
+        for _ in range(max_iter):
+            N_dot(x, x_new)
+            x_new += c
+            M_solve(x_new)
+            if monitor.check(x_new, x, tol, measure=rho is not None):
+                return monitor.result(x_new)
+            if rho is not None:
+                updates.append(monitor.update_norm)
+                new_omega, rho = self.adapt_omega(omega, rho, updates)
+                if new_omega != omega:
+                    omega = new_omega
+                    M, N, c = self.sor_splitting(omega)
+                    N_dot = self.product(N)
+                    M_solve = self.forward_substitution(M)
+            x, x_new = x_new, x
+        return monitor.result(x)
+
+    def red_black_sor(self, omega=1.25, x0=None, tol=None, max_iter=None):
+        """
+        SOR with red-black (checkerboard) ordering on the 2D grid. Every
+        half-sweep is vectorized with NumPy slicing, so the cost per
+        iteration is close to Jacobi while keeping Gauss-Seidel/SOR rates.
+        Needs the grid stencil, i.e. A given as a Diffusion_operator.
+        omega="auto" works as in sor.
+        """
+        if not self.is_matrix_free():
+            raise ValueError("Red-black SOR needs the grid stencil: pass a Diffusion_operator as A.")
         A = self.A
-        b = self.b
-        x = self.x0 if x0 is None else np.asarray(x0, dtype=float)
+        x = self.x0 if x0 is None else np.asarray(x0, dtype=self.dtype)
         tol = self.tol if tol is None else tol
         max_iter = self.max_iter if max_iter is None else int(max_iter)
 
-        L = np.tril(A)  # includes diagonal
-        U = A - L
+        monitor = self.monitor("red_black_sor", grid=True)
+        omega, rho = self.initial_omega(omega)
+        P = A.padded_grid(x)
+        phi = P[1:-1, 1:-1]
+        rhs = A.to_grid(self.b)
+        phi_old = np.empty_like(phi)
+        updates = []
+        monitor.start()
+        for _ in range(max_iter):
+            if monitor.needs_previous(rho is not None):
+                np.copyto(phi_old, phi)
+            A.red_black_sweep(P, rhs, omega)
+            if monitor.check(phi, phi_old, tol, measure=rho is not None):
+                break
+            if rho is not None:
+                updates.append(monitor.update_norm)
+                omega, rho = self.adapt_omega(omega, rho, updates)
+        return monitor.result(phi)
+
+    def line_sor(self, omega=1.0, direction="x", x0=None, tol=None, max_iter=None):
+        """
+        Zebra line SOR on the 2D grid: all the lines of cells along
+        direction ("x" rows, "y" columns) of one parity are solved at once
+        with a Thomas algorithm batched across them (see
+        Diffusion_operator.line_sweep). Converges where point sweeps stall
+        on stretched cells, e.g. dx much smaller than dy calls for x lines.
+        Needs the grid stencil, i.e. A given as a Diffusion_operator.
+        """
+        if not self.is_matrix_free():
+            raise ValueError("Line SOR needs the grid stencil: pass a Diffusion_operator as A.")
+        A = self.A
+        x = self.x0 if x0 is None else np.asarray(x0, dtype=self.dtype)
+        tol = self.tol if tol is None else tol
+        max_iter = self.max_iter if max_iter is None else int(max_iter)
 
+        monitor = self.monitor("adi" if direction == "alternating" else "line_sor", grid=True)
+        P = A.padded_grid(x)
+        phi = P[1:-1, 1:-1]
+        rhs = A.to_grid(self.b)
+        phi_old = np.empty_like(phi)
+        monitor.start()
         for _ in range(max_iter):
-            rhs = b - U.dot(x)
-            # solve L x_new = rhs
-            x_new = np.linalg.solve(L, rhs)
-            if self.err_rel(x_new, x) < tol:
+            if monitor.needs_previous():
+                np.copyto(phi_old, phi)
+            A.line_sweep(P, rhs, direction, omega)
+            if monitor.check(phi, phi_old, tol):
+                break
+        return monitor.result(phi)
+
+    def adi(self, omega=1.0, x0=None, tol=None, max_iter=None):
+        """
+        Alternating-direction line relaxation: every iteration is an x-line
+        sweep followed by a y-line sweep, robust whichever direction is
+        strongly coupled.
+        """
+        return self.line_sor(omega=omega, direction="alternating", x0=x0, tol=tol, max_iter=max_iter)
+
+    def sweep(self, method="jacobi", omega=1.0, direction="x"):
+        """
+        One iteration of a stationary method as a function x -> x_new, the
+        fixed-point map that accelerated() wraps. method is "jacobi",
+        "gauss_seidel", "sor", "red_black_sor", "line_sor" or "adi" (the
+        last three need A as a Diffusion_operator), with the same sweeps as
+        the plain iterations. The factor used (the optimal one of the
+        estimated Jacobi radius for omega="auto") is left in self.omega.
+        """
+        A = self.A
+        b = self.b
+        if method == "gauss_seidel":
+            omega = 1.0
+        if method != "jacobi":
+            omega, _ = self.initial_omega(omega)
+
+        if method == "jacobi":
+            d = A.diagonal()
+            if np.any(d == 0):
+                raise np.linalg.LinAlgError("Zero on diagonal — Jacobi not applicable")
+            R_dot = self._off_diagonal_dot(d)
+
+            def jacobi_sweep(x):
+                x_new = R_dot(x, np.empty_like(b))
+                np.subtract(b, x_new, out=x_new)
+                x_new /= d
                 return x_new
-            x = x_new
-        return x
+            return jacobi_sweep
+        if method in ("gauss_seidel", "sor"):
+            if self.is_matrix_free():
+                return lambda x: A.sor_sweep(x, b, omega)
+            M, N, c = self.sor_splitting(omega)
+            M_solve = self.forward_substitution(M)
+            return lambda x: M_solve(N.dot(x) + c)
+        if method not in ("red_black_sor", "line_sor", "adi"):
+            raise ValueError(f"Unknown stationary method: {method}")
+        if not self.is_matrix_free():
+            raise ValueError(f"{method} needs the grid stencil: pass a Diffusion_operator as A.")
 
-    def sor(self, omega=1.25, x0=None, tol=1e-6, max_iter=1e12):
+        rhs = A.to_grid(b)
+
+        def grid_sweep(x):
+            P = A.padded_grid(x)
+            if method == "red_black_sor":
+                A.red_black_sweep(P, rhs, omega)
+            else:
+                A.line_sweep(P, rhs, "alternating" if method == "adi" else direction, omega)
+            return A.to_vector(P[1:-1, 1:-1])
+        return grid_sweep
+
+    def iteration_bounds(self, sweep, method, omega=1.0, iterations=50):
+        """
+        Interval (lower, upper) holding the eigenvalues of the iteration
+        matrix G of sweep, for the Chebyshev semi-iteration. The radius is
+        estimated by power iteration on x -> G x = sweep(x) - sweep(0).
+        Jacobi has a symmetric spectrum [-rho, rho] on the stencil; the
+        red-black and zebra line Gauss-Seidel sweeps (omega = 1) have the
+        squares of the (line) Jacobi eigenvalues, [0, rho]. Lexicographic
+        Gauss-Seidel has the same spectrum but large Jordan blocks at 0,
+        which Chebyshev polynomials amplify, and SOR (omega != 1) and ADI
+        have complex eigenvalues: these are not supported.
+        """
+        if not (method == "jacobi" or (method in ("red_black_sor", "line_sor") and omega == 1.0)):
+            raise ValueError(f"Chebyshev acceleration needs jacobi, or red_black_sor or line_sor "
+                             f"with omega=1, not {method} with omega={omega}; use anderson.")
+        shift = sweep(np.zeros_like(self.b))
+        x = np.ones_like(self.b) / np.sqrt(self.b.shape[0])
+        rho = 0.0
+        for _ in range(iterations):
+            y = sweep(x) - shift
+            rho = np.linalg.norm(y)
+            if rho == 0.0:
+                break
+            x = y / rho
+        rho = min(float(rho), 1.0 - 1e-12)
+        return (-rho if method == "jacobi" else 0.0), rho
+
+    def accelerated(self, method="jacobi", acceleration="chebyshev", omega=1.0, direction="x",
+                    depth=5, bounds=None, x0=None, tol=None, max_iter=None):
+        """
+        Stationary iteration x_new = sweep(x) (see sweep) accelerated by
+        the previous iterates, with the sweep itself unchanged:
+          - "chebyshev": Chebyshev semi-iteration for the eigenvalue
+            interval [a, b] of the iteration matrix (given as bounds, or
+            estimated by iteration_bounds),
+                x_k+1 = w_k+1 (gamma sweep(x_k) + (1 - gamma) x_k - x_k-1) + x_k-1
+            with gamma = 2 / (2 - a - b), sigma = (b - a) / (2 - a - b) and
+            w_1 = 1, w_2 = 1 / (1 - sigma²/2), w_k+1 = 1 / (1 - sigma² w_k / 4);
+          - "anderson": Anderson mixing of the last depth iterates, the
+            step that best cancels the residuals f = sweep(x) - x in the
+            least squares sense.
+        Stops like the plain iterations, on the relative change of x.
+        """
+        x = np.array(self.x0 if x0 is None else x0, dtype=self.dtype)
+        tol = self.tol if tol is None else tol
+        max_iter = self.max_iter if max_iter is None else int(max_iter)
+        monitor = self.monitor(f"{acceleration}_{method}")
+        sweep = self.sweep(method, omega, direction)
+
+        if acceleration == "chebyshev":
+            lower, upper = self.iteration_bounds(sweep, method, omega) if bounds is None else bounds
+            gamma = 2.0 / (2.0 - lower - upper)
+            sigma = (upper - lower) / (2.0 - lower - upper)
+            x_old = x
+            work = np.empty_like(x)
+            w = 1.0
+            monitor.start()
+            for k in range(max_iter):
+                if k == 1:
+                    w = 1.0 / (1.0 - sigma ** 2 / 2.0)
+                elif k > 1:
+                    w = 1.0 / (1.0 - sigma ** 2 * w / 4.0)
+                # x_new = w (gamma sweep(x) + (1 - gamma) x - x_old) + x_old, in place
+                x_new = sweep(x)
+                x_new *= gamma
+                x_new += np.multiply(x, 1.0 - gamma, out=work)
+                x_new -= x_old
+                x_new *= w
+                x_new += x_old
+                if monitor.check(x_new, x, tol):
+                    return monitor.result(x_new)
+                x_old, x = x, x_new
+            return monitor.result(x)
+
+        if acceleration != "anderson":
+            raise ValueError(f"Unknown acceleration: {acceleration}")
+        if depth < 1:
+            raise ValueError("Anderson mixing needs a history depth of at least 1.")
+        monitor.start()
+        g = sweep(x)
+        f = g - x
+        dG, dF = [], []
+        for _ in range(max_iter):
+            if dF:
+                gamma = np.linalg.lstsq(np.column_stack(dF), f, rcond=None)[0]
+                x_new = g - np.column_stack(dG) @ gamma
+            else:
+                x_new = g
+            if monitor.check(x_new, x, tol):
+                return monitor.result(x_new)
+            g_new = sweep(x_new)
+            f_new = g_new - x_new
+            dG.append(g_new - g)
+            dF.append(f_new - f)
+            if len(dF) > depth:
+                dG.pop(0)
+                dF.pop(0)
+            x, g, f = x_new, g_new, f_new
+        return monitor.result(x)
+
+    def multigrid(self, multigrid, x0=None, tol=None, max_iter=None):
+        """
+        Multigrid iteration x_new = x + B (b - A x), where B is one cycle of
+        multigrid, a Multigrid built for this A (see
+        Matrix_constructor.get_multigrid).
+        """
+        A = self.A
+        x = self.x0 if x0 is None else np.asarray(x0, dtype=self.dtype)
+        tol = self.tol if tol is None else tol
+        max_iter = self.max_iter if max_iter is None else int(max_iter)
+
+        monitor = self.monitor("multigrid")
+        A_dot = self.product()
+        x = np.array(x, dtype=self.dtype)
+        x_new = np.empty_like(x)
+        r = np.empty_like(x)
+        monitor.start()
+        for _ in range(max_iter):
+            A_dot(x, r)
+            np.subtract(self.b, r, out=r)
+            np.add(x, multigrid.apply(r), out=x_new)
+            if monitor.check(x_new, x, tol, residual=r):
+                return monitor.result(x if monitor.lagged else x_new)
+            x, x_new = x_new, x
+        return monitor.result(x)
+
+    def cholesky(self, factorization=None):
+        """
+        Direct solve with a banded Cholesky factorization of A, which must
+        then be symmetric positive definite. A factorization computed
+        before (e.g. Matrix_constructor.get_cholesky) can be passed to
+        reuse it for a new b.
+        """
+        monitor = self.monitor("cholesky")
+        if factorization is None:
+            factorization = Banded_cholesky(self.A)
+        monitor.start()
+        return monitor.result(factorization.solve(self.b), reason="direct")
+
+    def mixed_precision(self, method="sor", inner_tol=1e-4, tol=None, max_refinements=30, **options):
+        """
+        Mixed-precision iterative refinement: the correction equation
+        A d = r is solved with method in float32, on a float32 copy of A
+        (and of the Multigrid, when one is given), while the residual
+        r = b - A x and the correction x += d are computed in float64,
+        until ||r|| / ||b|| < tol. The float32 sweeps move half the bytes of
+        the float64 ones, and every refinement step gains the digits of one
+        inner solve, so x reaches full double precision all the same.
+        Parameters:
+            method (str): Inner solver, a method of Solvers such as "sor",
+                "cg" or "multigrid".
+            inner_tol (float): Tolerance of the inner solves (in their own
+                criterion), well above the float32 round-off of about 1e-7.
+            max_refinements (int): Limit on the float64 correction steps.
+            options: Passed on to the inner solver, e.g. omega,
+                preconditioner or multigrid.
+        Returns:
+            Solve_result: iterations counts the refinement steps, stopped
+            on "stagnated" when one no longer reduces the residual; the
+            results of the inner solves are kept in self.inner_results.
+        """
+        tol = self.tol if tol is None else tol
+        criterion = "absolute" if self.criterion == "absolute" else "residual"
+        monitor = Solve_monitor(f"mixed_{method}", self.product(), self.b, residual_interval=0,
+                                criterion=criterion)
+        single = np.float32
+        for name in ("multigrid", "preconditioner"):
+            if isinstance(options.get(name), Multigrid):
+                options[name] = options[name].astype(single)
+        inner = Solvers(self.A, self.b, tol=inner_tol, max_iter=self.max_iter, residual_interval=0,
+                        criterion=self.criterion, check_interval=self.check_interval, dtype=single)
+        solve = getattr(inner, method)
+        A_dot = self.product()
+        x = np.array(self.x0, dtype=float)
+        r = np.empty_like(x)
+        self.inner_results = []
+
+        monitor.start()
+        np.subtract(self.b, A_dot(x, r), out=r)
+        r_norm = np.linalg.norm(r)
+        if monitor.met(tol, residual=r_norm):
+            return monitor.result(x)
+        for _ in range(max_refinements):
+            # the residual scaled to unit norm, away from the float32 underflow
+            np.divide(r, r_norm, out=inner.b, casting="same_kind")
+            d = solve(tol=inner_tol, **options)
+            self.inner_results.append(d)
+            x += r_norm * d
+            np.subtract(self.b, A_dot(x, r), out=r)
+            new_norm = np.linalg.norm(r)
+            if monitor.record(x, residual=new_norm / monitor.b_norm):
+                break
+            if monitor.met(tol, residual=new_norm):
+                return monitor.result(x)
+            if new_norm >= r_norm:
+                return monitor.result(x, reason="stagnated")
+            r_norm = new_norm
+        return monitor.result(x)
+
+    def get_preconditioner(self, preconditioner, omega=1.0):
+        """
+        Build a preconditioner for A from its name ("jacobi", "ssor",
+        "ichol") or return the given object, which must provide apply(r).
+        """
+        if preconditioner is None or hasattr(preconditioner, "apply"):
+            return preconditioner
+        if preconditioner == "jacobi":
+            return Jacobi_preconditioner(self.A)
+        elif preconditioner == "ssor":
+            return SSOR_preconditioner(self.A, omega=omega)
+        elif preconditioner == "ichol":
+            return Incomplete_cholesky_preconditioner(self.A)
+        else:
+            raise ValueError(f"Unknown preconditioner: {preconditioner}")
+
+    def cg(self, preconditioner=None, x0=None, tol=None, max_iter=None, omega=1.0):
+        """
+        Preconditioned conjugate gradients for symmetric positive definite A.
+        Stops when the relative residual ||b - A x|| / ||b|| drops below tol
+        (unless another criterion was given), measured on the residual
+        updated by the recurrence, which costs no product with A.
+        Parameters:
+            preconditioner: None, "jacobi", "ssor", "ichol" or an object with
+                apply(r), e.g. a Multigrid.
+            omega (float): Relaxation factor of the SSOR preconditioner.
+        """
         A = self.A
         b = self.b
-        x = self.x0 if x0 is None else np.asarray(x0, dtype=float)
+        x = np.array(self.x0 if x0 is None else x0, dtype=self.dtype)
         tol = self.tol if tol is None else tol
         max_iter = self.max_iter if max_iter is None else int(max_iter)
+        if preconditioner is None:
+            name = "cg"
+        elif isinstance(preconditioner, str):
+            name = f"cg_{preconditioner}"
+        else:
+            name = f"cg_{type(preconditioner).__name__.lower()}"
+        monitor = self.monitor(name, criterion="residual")
+        M = self.get_preconditioner(preconditioner, omega=omega)
+
+        b_norm = np.linalg.norm(b)
+        if b_norm == 0:
+            b_norm = 1.0
 
-        D = np.diagflat(np.diag(A))
-        L = np.tril(A, -1)  
-        U = np.triu(A, 1)  
+        A_dot = self.product()
+        r = np.empty_like(x)
+        Ap = np.empty_like(x)
+        step = np.empty_like(x)
 
-        M = D + omega * L
+        monitor.start()
+        np.subtract(b, A_dot(x, r), out=r)
+        if monitor.criterion != "change" and monitor.met(tol, residual=np.linalg.norm(r)):
+            return monitor.result(x)
+        z = r if M is None else M.apply(r)
+        p = np.array(z, dtype=self.dtype)
+        rz = np.dot(r, z)
         for _ in range(max_iter):
-            rhs = ((1 - omega) * D - omega * U).dot(x) + omega * b
-            x_new = np.linalg.solve(M, rhs)
-            if self.err_rel(x_new, x) < tol:
-                return x_new
-            x = x_new
-        return x
+            A_dot(p, Ap)
+            alpha = rz / np.dot(p, Ap)
+            np.multiply(p, alpha, out=step)
+            due = monitor.due()
+            measure = due or monitor.wants_residual()
+            if measure:
+                x_norm = np.linalg.norm(x)
+            x += step
+            r -= np.multiply(Ap, alpha, out=Ap)
+            if measure:
+                # the recursive residual is free, the true one is recomputed at the end
+                r_norm = np.linalg.norm(r)
+                change = np.linalg.norm(step) / x_norm if x_norm != 0 else np.linalg.norm(step)
+                if monitor.record(x, change=change, residual=r_norm / b_norm):
+                    break
+                if due and monitor.met(tol, change=change, residual=r_norm):
+                    return monitor.result(x)
+            else:
+                monitor.record(x)
+            z = r if M is None else M.apply(r)
+            rz_new = np.dot(r, z)
+            p *= rz_new / rz
+            p += z
+            rz = rz_new
+        return monitor.result(x)
 
+    def block_cg(self, preconditioner=None, x0=None, tol=None, max_iter=None, omega=1.0):
+        """
+        Conjugate gradients for the (N, k) block b of right-hand sides, e.g.
+        k source configurations of one geometry. The k recurrences run side
+        by side with their own step lengths, but every iteration applies A
+        to the k search directions in one block product (one pass over the
+        CSR matrix or the stencil, a matrix-matrix product for dense A) and
+        the preconditioner to the k residuals together. The criterion is
+        tested on every column and the solve stops when the worst one meets
+        it; the recorded residual is that of the worst column.
+        Parameters:
+            preconditioner, omega: As for cg.
+        Returns:
+            Solve_result: The solutions, shaped like b.
+        """
+        B = self.b.reshape(self.b.shape[0], -1)
+        X = np.array(self.x0 if x0 is None else x0, dtype=self.dtype).reshape(B.shape)
+        tol = self.tol if tol is None else tol
+        max_iter = self.max_iter if max_iter is None else int(max_iter)
+        if preconditioner is None:
+            name = "block_cg"
+        elif isinstance(preconditioner, str):
+            name = f"block_cg_{preconditioner}"
+        else:
+            name = f"block_cg_{type(preconditioner).__name__.lower()}"
+        A_dot = self.product()
+        monitor = Solve_monitor(name, A_dot, B, self.residual_interval,
+                                criterion=self.criterion or "residual",
+                                check_interval=self.check_interval, columns=True)
+        M = self.get_preconditioner(preconditioner, omega=omega)
+
+        R = np.empty_like(X)
+        AP = np.empty_like(X)
+        step = np.empty_like(X)
+        alpha = np.zeros(B.shape[1], dtype=self.dtype)
+        beta = np.zeros_like(alpha)
+
+        def column_dot(U, V):
+            return np.einsum("ij,ij->j", U, V)
+
+        def column_norm(U):
+            return np.sqrt(column_dot(U, U))
+
+        def finish():
+            result = monitor.result(X)
+            return result.with_solution(result.reshape(self.b.shape))
+
+        monitor.start()
+        np.subtract(B, A_dot(X, R), out=R)
+        if monitor.criterion != "change" and monitor.met(tol, residual=column_norm(R)):
+            return finish()
+        Z = R if M is None else M.apply(R)
+        P = np.array(Z, dtype=self.dtype)
+        rz = column_dot(R, Z)
+        for _ in range(max_iter):
+            A_dot(P, AP)
+            pAp = column_dot(P, AP)
+            # a column solved exactly has nothing left to do
+            alpha.fill(0.0)
+            np.divide(rz, pAp, out=alpha, where=pAp != 0)
+            np.multiply(P, alpha, out=step)
+            due = monitor.due()
+            measure = due or monitor.wants_residual()
+            # the changes are only worked out for the criterion that needs them
+            change = None
+            if due and monitor.criterion == "change":
+                x_norm = column_norm(X)
+                step_norm = column_norm(step)
+                change = np.max(np.divide(step_norm, x_norm, out=step_norm, where=x_norm != 0))
+            X += step
+            R -= np.multiply(AP, alpha, out=AP)
+            if measure:
+                r_norm = column_norm(R)
+                if monitor.record(X, change=change, residual=np.max(r_norm / monitor.b_norm)):
+                    break
+                if due and monitor.met(tol, change=change, residual=r_norm):
+                    return finish()
+            else:
+                monitor.record(X)
+            Z = R if M is None else M.apply(R)
+            rz_new = column_dot(R, Z)
+            beta.fill(0.0)
+            np.divide(rz_new, rz, out=beta, where=rz != 0)
+            P *= beta
+            P += Z
+            rz = rz_new
+        return finish()
+
+    def _matrix_free_sor(self, omega, x, tol, max_iter, method="sor"):
+        monitor = self.monitor(method)
+        omega, rho = self.initial_omega(omega)
+        x = np.array(x, dtype=self.dtype)
+        x_new = np.empty_like(x)
+        updates = []
+        monitor.start()
+        for _ in range(max_iter):
+            self.A.sor_sweep(x, self.b, omega, out=x_new)
+            if monitor.check(x_new, x, tol, measure=rho is not None):
+                return monitor.result(x_new)
+            if rho is not None:
+                updates.append(monitor.update_norm)
+                omega, rho = self.adapt_omega(omega, rho, updates)
+            x, x_new = x_new, x
+        return monitor.result(x)
@@ -40,7 +40,7 @@ class ProblemController:
         try:
             ncells_x, ncells_y = self.view.get_mesh_dimensions()
             self.model.create_mesh(ncells_x, ncells_y)
-            self.model.create_matrix()
+            self.model.create_matrix(save=True)
             solution = self.model.solve()
             self.view.display_solution(solution)
             self.model.plot_solution(solution) 
@@ -3,9 +3,13 @@ from src.classes.Material import Material
 from src.classes.Mesh_constructor import Mesh_constructor
 from src.classes.Matrix_constructor import Matrix_constructor
 from src.classes.Solvers import Solvers
+from src.classes.Numbering import Numbering
+from src.classes.Adaptive_refinement import Adaptive_refinement
+from src.classes.Convergence_study import Convergence_study
 from src.classes.Reader import DocumentReader
 from src.classes.Plotter import Plotter
 import numpy as np
+import scipy.sparse as sp
 
 class ProblemModel:
     def __init__(self):
@@ -13,6 +17,11 @@ class ProblemModel:
         self.mesh = None
         self.matrix_constructor = None
         self.solver = None
+        self.solve_result = None
+        self.factorization = None
+        self.mesh_build_time = None
+        self.refinement_history = []
+        self.convergence_history = []
 
     def create_materials_from_file(self, file_path):
         reader = DocumentReader(file_path)
@@ -35,15 +44,57 @@ class ProblemModel:
             for data in materials_data
         ]
 
-    def create_mesh(self, ncells_x, ncells_y):
-        self.mesh = Mesh_constructor(ncells_x, ncells_y, self.materials)
+    def create_mesh(self, ncells_x, ncells_y, material_map=None, spacing="uniform", grading=4.0,
+                    face_coupling="local"):
+        start = time.perf_counter()
+        self.mesh = Mesh_constructor(ncells_x, ncells_y, self.materials, material_map=material_map,
+                                     spacing=spacing, grading=grading, face_coupling=face_coupling)
         self.mesh.compute_extrapolated_boundaries_y()
         self.mesh.compute_extrapolated_boundaries_x()
         self.mesh.compute_total_size()
         self.mesh.compute_cell_sizes()
         self.mesh.create_material_matrices()
+        # wall time of the whole mesh stage, in seconds
+        self.mesh_build_time = time.perf_counter() - start
 
-    def create_matrix(self):
+    def solve_adaptive(self, ncells_x, ncells_y, tol=1e-3, material_map=None, **options):
+        """
+        Solve on a coarse graded mesh and refine it where the estimated
+        error is largest until the estimate meets tol (see
+        Adaptive_refinement, which takes the other options). The final mesh
+        and matrix become the current ones and the cell count and error
+        estimate of every level are kept in self.refinement_history.
+        Returns:
+            ndarray: The solution on the final mesh.
+        """
+        refinement = Adaptive_refinement(self.materials, ncells_x, ncells_y, tol=tol,
+                                         material_map=material_map, **options)
+        self.mesh, self.matrix_constructor, x = refinement.run()
+        self.factorization = None
+        self.refinement_history = refinement.history
+        return x
+
+    def convergence_study(self, ncells_x, ncells_y, levels=5, ratio=2, tol=None, **options):
+        """
+        Solve on meshes refined by ratio from ncells_x x ncells_y, each level
+        starting from the previous solution, and extrapolate the quantities
+        of interest (see Convergence_study, which takes the other options).
+        The levels are kept in self.convergence_history and the model holds
+        the last one.
+        Returns:
+            ndarray: The solution of the last level.
+        """
+        study = Convergence_study(self, ncells_x, ncells_y, levels=levels, ratio=ratio, tol=tol,
+                                  **options)
+        x = study.run()
+        self.convergence_history = study.history
+        return x
+
+    def create_matrix(self, matrix_format="sparse", eliminate_vacuum=False, save=False):
+        """
+        Assemble the system on the current mesh. With save=True, A and b are
+        also written to output/data_computed with a timestamp.
+        """
         if not self.mesh:
             raise ValueError("Mesh must be created before constructing the matrix.")
         self.matrix_constructor = Matrix_constructor(
@@ -55,28 +106,202 @@ class ProblemModel:
             self.mesh.dx,
             self.mesh.dy,
             self.materials,
-            self.mesh.interfaces_x
+            self.mesh.interfaces_x,
+            matrix_format=matrix_format,
+            eliminate_vacuum=eliminate_vacuum,
+            bound_type=self.mesh.bound_type,
+            finite_volume=self.mesh.spacing != "uniform",
+            face_coupling=self.mesh.face_coupling
         )
-        np.savetxt(f"output/data_computed/matrix_A-timestamp_{int(time.time())}.txt", self.matrix_constructor.A)
+        self.factorization = None
+        if not save:
+            return
+        if sp.issparse(self.matrix_constructor.A):
+            sp.save_npz(f"output/data_computed/matrix_A-timestamp_{int(time.time())}.npz", self.matrix_constructor.A)
+        elif matrix_format == "dense":
+            np.savetxt(f"output/data_computed/matrix_A-timestamp_{int(time.time())}.txt", self.matrix_constructor.A)
         np.savetxt(f"output/data_computed/vector_b-timestamp_{int(time.time())}.txt", self.matrix_constructor.b)
 
 
-    def solve(self, method="sor", omega=1.25, max_iter=1000):
+    def solve(self, method="sor", omega=1.25, max_iter=1000, preconditioner="ichol", cycle="V",
+              ordering="row", x0=None, direction="x", smoother="red_black", acceleration=None,
+              depth=5, tol=None, criterion=None, check_interval=1, precision="double"):
+        """
+        Solve the current system with the given method. x0 is the initial
+        guess on every cell of the grid, like the returned solution, zero
+        when not given. The SOR methods take omega="auto" to pick the
+        relaxation factor from the Jacobi spectral radius; the factor used
+        is left in self.solver.omega. "line_sor" relaxes lines of cells along
+        direction ("x" or "y"), "adi" alternates both, and smoother picks
+        the multigrid smoother (see Multigrid). acceleration ("chebyshev"
+        or "anderson", with depth past iterates) wraps the stationary
+        methods, see Solvers.accelerated. criterion ("change", "residual" or
+        "absolute") is the stopping test against tol, done every
+        check_interval iterations; by default the relative change for the
+        stationary methods and the relative residual for CG, with the
+        tolerances of Solvers. precision="mixed" runs the iterations of
+        jacobi, gauss_seidel, sor, red_black_sor, multigrid or cg in float32
+        and refines the solution in float64 (see Solvers.mixed_precision).
+        Returns the Solve_result of the solver mapped back to the grid: the
+        solution, with how the solve went (iterations, residual, times,
+        converged and reason); it is also kept in self.solve_result.
+        """
         if not self.matrix_constructor:
             raise ValueError("Matrix must be created before solving.")
+        if precision not in ("double", "mixed"):
+            raise ValueError(f"Unknown precision: {precision}")
         A = self.matrix_constructor.A
         b = self.matrix_constructor.b
-        x0 = [0] * len(b)
-        self.solver = Solvers(A, b, x0=x0, max_iter=max_iter)
-        if method == "jacobi":
-            return self.solver.jacobi()
+        if x0 is None:
+            x0 = np.zeros(len(b))
+        else:
+            x0 = self.matrix_constructor.gather(x0)
+        if method in ("red_black_sor", "line_sor", "adi"):
+            # red-black and line orderings work on the grid stencil
+            A = self.matrix_constructor.get_operator()
+        elif method == "cg":
+            # CG needs the symmetric form of the system
+            A, b = self.matrix_constructor.symmetric_system()
+
+        # renumber the unknowns, the solution is mapped back to the row ordering
+        numbering = Numbering(self.matrix_constructor.unknowns_x, self.matrix_constructor.unknowns_y, ordering)
+        if not numbering.is_row and method != "cholesky":
+            if method in ("red_black_sor", "line_sor", "adi", "multigrid") or \
+                    (method == "cg" and preconditioner == "multigrid"):
+                raise ValueError(f"{method} works on the grid and does not take an ordering.")
+            A, b = numbering.permute_system(A, b)
+            x0 = numbering.permute(x0)
+
+        # the solvers' own tolerances unless one is given (sor has its own default)
+        tolerance = {} if tol is None else {"tol": tol}
+        self.solver = Solvers(A, b, x0=x0, max_iter=max_iter, criterion=criterion,
+                              check_interval=check_interval, **tolerance)
+        if acceleration is not None:
+            if method not in ("jacobi", "gauss_seidel", "sor", "red_black_sor", "line_sor", "adi"):
+                raise ValueError(f"Only the stationary methods can be accelerated, not {method}.")
+            if precision == "mixed":
+                raise ValueError("The accelerated methods have no mixed-precision solve.")
+            x = self.solver.accelerated(method, acceleration, omega=omega, direction=direction,
+                                        depth=depth)
+        elif precision == "mixed":
+            if method in ("jacobi", "gauss_seidel"):
+                options = {}
+            elif method in ("sor", "red_black_sor"):
+                options = {"omega": omega}
+            elif method == "multigrid":
+                options = {"multigrid": self.matrix_constructor.get_multigrid(cycle=cycle, smoother=smoother)}
+            elif method == "cg":
+                if preconditioner == "multigrid":
+                    preconditioner = self.matrix_constructor.get_multigrid(symmetric=True, cycle=cycle,
+                                                                           smoother=smoother)
+                options = {"preconditioner": preconditioner}
+            else:
+                raise ValueError(f"{method} has no mixed-precision solve.")
+            x = self.solver.mixed_precision(method, **options)
+        elif method == "jacobi":
+            x = self.solver.jacobi()
         elif method == "gauss_seidel":
-            return self.solver.gauss_seidel()
+            x = self.solver.gauss_seidel()
         elif method == "sor":
-            return self.solver.sor(omega=omega)
+            x = self.solver.sor(omega=omega, **tolerance)
+        elif method == "red_black_sor":
+            x = self.solver.red_black_sor(omega=omega)
+        elif method == "line_sor":
+            x = self.solver.line_sor(omega=omega, direction=direction)
+        elif method == "adi":
+            x = self.solver.adi(omega=omega)
+        elif method == "cholesky":
+            # the factorization renumbers internally
+            x = self.solver.cholesky(self.get_factorization(ordering))
+            self.solve_result = x.with_solution(self.matrix_constructor.scatter(x))
+            return self.solve_result
+        elif method == "multigrid":
+            x = self.solver.multigrid(self.matrix_constructor.get_multigrid(cycle=cycle, smoother=smoother))
+        elif method == "cg":
+            if preconditioner == "multigrid":
+                preconditioner = self.matrix_constructor.get_multigrid(symmetric=True, cycle=cycle,
+                                                                       smoother=smoother)
+            x = self.solver.cg(preconditioner=preconditioner)
         else:
             raise ValueError(f"Unknown method: {method}")
-    
+        # back on every cell of the grid
+        self.solve_result = x.with_solution(self.matrix_constructor.scatter(numbering.unpermute(x)))
+        return self.solve_result
+
+    def get_factorization(self, ordering="row"):
+        """
+        Banded Cholesky factor of the current matrix, computed on first use
+        and kept until a new matrix is created (or another ordering is asked).
+        """
+        if not self.matrix_constructor:
+            raise ValueError("Matrix must be created before solving.")
+        if self.factorization is None or self.factorization.numbering.ordering != ordering:
+            self.factorization = self.matrix_constructor.get_cholesky(ordering)
+        return self.factorization
+
+    def source_block(self, sources):
+        """
+        Right-hand sides of k source configurations as an (N, k) block.
+        sources holds k rows of material sources (in the order of the
+        materials, mapped on the mesh by Mesh_constructor.source_map) or k
+        source maps on the cells of the mesh, a (k, ncells_y, ncells_x) array.
+        """
+        if not self.matrix_constructor:
+            raise ValueError("Matrix must be created before solving.")
+        sources = np.asarray(sources, dtype=float)
+        if sources.ndim == 2:
+            sources = np.stack([self.mesh.source_map(s) for s in sources])
+        return self.matrix_constructor.source_term(sources)
+
+    def solve_sources(self, b=None, ordering="row", sources=None, method="cholesky", preconditioner="ichol",
+                      tol=None, max_iter=1000, cycle="V", smoother="red_black"):
+        """
+        Solve the current geometry for several right-hand sides at once. b is
+        one vector in the numbering of A, or an (N, k) array with one source
+        configuration per column; sources gives the configurations instead,
+        see source_block. method "cholesky" uses the cached factorization,
+        one back-substitution per column. "cg" runs conjugate gradients on
+        the symmetric system for every column together (see
+        Solvers.block_cg), with one block product with A per iteration.
+        Returns the Solve_result of the solves, also kept in
+        self.solve_result: the solutions on every cell of the grid, one
+        column per configuration, with the worst column's residual.
+        """
+        if not self.matrix_constructor:
+            raise ValueError("Matrix must be created before solving.")
+        if (b is None) == (sources is None):
+            raise ValueError("Give either b or sources.")
+        if sources is not None:
+            b = self.source_block(sources)
+        if method == "cholesky":
+            start = time.perf_counter()
+            factorization = self.get_factorization(ordering)
+            factor_time = time.perf_counter() - start
+            self.solver = Solvers(self.matrix_constructor.A, b)
+            X = self.solver.cholesky(factorization)
+            # a factorization made for this call is part of its setup
+            X.setup_time += factor_time
+            self.solve_result = X.with_solution(self.matrix_constructor.scatter(X.reshape(np.shape(b))))
+            return self.solve_result
+        if method != "cg":
+            raise ValueError(f"Unknown method for several sources: {method}")
+
+        A = self.matrix_constructor.symmetric_system()[0]
+        w = self.matrix_constructor.symmetrizing_weights()
+        c = w.reshape((-1,) + (1,) * (np.ndim(b) - 1)) * b
+        numbering = Numbering(self.matrix_constructor.unknowns_x, self.matrix_constructor.unknowns_y, ordering)
+        if preconditioner == "multigrid":
+            if not numbering.is_row:
+                raise ValueError("The multigrid preconditioner works on the grid and does not take an ordering.")
+            preconditioner = self.matrix_constructor.get_multigrid(symmetric=True, cycle=cycle, smoother=smoother)
+        if not numbering.is_row:
+            A, c = numbering.permute_system(A, c)
+        tolerance = {} if tol is None else {"tol": tol}
+        self.solver = Solvers(A, c, max_iter=max_iter, **tolerance)
+        X = self.solver.block_cg(preconditioner=preconditioner)
+        self.solve_result = X.with_solution(self.matrix_constructor.scatter(numbering.unpermute(X)))
+        return self.solve_result
+
     def plot_solution(self, solution):
         if not self.mesh:
             raise ValueError("Mesh must be created before plotting the solution.")
@@ -0,0 +1,22 @@
+import sys
+from src.model import ProblemModel
+
+
+def benchmark_mesh_build(ncells_x=2000, ncells_y=500, limit=5.0):
+    """
+    Times ProblemModel.create_mesh on a 10^6-cell mesh. This is a benchmark, not a test:
+    the bound depends on the machine, so it is kept out of the pytest suite.
+
+    Usage:
+        python -m src.test.benchmark_mesh
+    """
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/test_2.txt")
+    model.create_mesh(ncells_x, ncells_y)
+    elapsed = model.mesh_build_time
+    print(f"Mesh with {ncells_x * ncells_y} cells built in {elapsed:.3f} s (limit {limit:.1f} s)")
+    return elapsed < limit
+
+
+if __name__ == "__main__":
+    sys.exit(0 if benchmark_mesh_build() else 1)
@@ -0,0 +1,76 @@
+from src.classes.Mesh_constructor import Mesh_constructor
+from src.classes.Matrix_constructor import Matrix_constructor
+from src.classes.Reader import DocumentReader
+from src.model import ProblemModel
+
+# options of build/build_system that go to the mesh; face_coupling goes to both
+MESH_OPTIONS = ("material_map", "spacing", "grading", "face_coupling")
+
+
+def read_materials(file_path):
+    reader = DocumentReader(file_path)
+    reader.read_file()
+    reader.parse_materials()
+    return reader.get_materials()
+
+
+def build_mesh(materials, ncells_x, ncells_y, **mesh_options):
+    """
+    Mesh on a list of materials (or a MaterialTable), built in the same
+    steps as ProblemModel.create_mesh. mesh_options go to Mesh_constructor.
+    """
+    mesh = Mesh_constructor(ncells_x, ncells_y, materials, **mesh_options)
+    mesh.compute_extrapolated_boundaries_y()
+    mesh.compute_extrapolated_boundaries_x()
+    mesh.compute_total_size()
+    mesh.compute_cell_sizes()
+    mesh.create_material_matrices()
+    return mesh
+
+
+def build_matrix(mesh, materials, matrix_format="sparse", **matrix_options):
+    """
+    Matrix_constructor on a mesh, with the face coupling of the mesh unless
+    given. matrix_options go to Matrix_constructor (e.g. finite_volume,
+    eliminate_vacuum, vectorized, bound_type).
+    """
+    matrix_options.setdefault("face_coupling", mesh.face_coupling)
+    return Matrix_constructor(
+        mesh.ncells_x, mesh.ncells_y,
+        mesh.Dcells, mesh.Sigma_acells, mesh.source_cells,
+        mesh.dx, mesh.dy, materials, mesh.interfaces_x,
+        matrix_format=matrix_format, **matrix_options
+    )
+
+
+def build_system(materials, ncells_x, ncells_y, matrix_format="sparse", **options):
+    """
+    Mesh and Matrix_constructor for an input file or a list of materials.
+    Returns:
+        tuple: (Mesh_constructor, Matrix_constructor)
+    Usage:
+        mesh, mc = build_system("input_files_examples/test_2.txt", 30, 20, spacing="graded")
+    """
+    if isinstance(materials, str):
+        materials = read_materials(materials)
+    mesh_options = {key: options.pop(key) for key in MESH_OPTIONS if key in options}
+    mesh = build_mesh(materials, ncells_x, ncells_y, **mesh_options)
+    return mesh, build_matrix(mesh, materials, matrix_format, **options)
+
+
+def build(materials, ncells_x, ncells_y, matrix_format="sparse", **options):
+    """
+    Matrix_constructor for an input file or a list of materials, see build_system.
+    """
+    return build_system(materials, ncells_x, ncells_y, matrix_format, **options)[1]
+
+
+def build_model(file_path, ncells_x, ncells_y, matrix_format="sparse", **mesh_options):
+    """
+    ProblemModel with the materials of file_path, its mesh and its matrix.
+    """
+    model = ProblemModel()
+    model.create_materials_from_file(file_path)
+    model.create_mesh(ncells_x, ncells_y, **mesh_options)
+    model.create_matrix(matrix_format=matrix_format)
+    return model
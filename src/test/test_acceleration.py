@@ -0,0 +1,83 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Solvers import Solvers
+from src.model import ProblemModel
+from src.test.helpers import build
+
+
+def relative_error(x, x_exact):
+    return np.abs(x - x_exact).max() / np.abs(x_exact).max()
+
+
+def test_sweep_matches_plain_iterations():
+    mc = build("input_files_examples/terminal_i1.txt", 15, 11, "matrix_free")
+    A, b = mc.A, mc.b
+    x0 = np.random.default_rng(6).random(b.shape[0])
+    for method, plain in (("jacobi", lambda s: s.jacobi(max_iter=1)),
+                          ("gauss_seidel", lambda s: s.gauss_seidel(max_iter=1)),
+                          ("red_black_sor", lambda s: s.red_black_sor(omega=1.3, max_iter=1)),
+                          ("line_sor", lambda s: s.line_sor(omega=1.3, direction="y", max_iter=1))):
+        sweep = Solvers(A, b).sweep(method, omega=1.3, direction="y")
+        assert np.allclose(sweep(x0), plain(Solvers(A, b, x0=x0))), f"{method} sweep differs"
+
+    sparse = build("input_files_examples/terminal_i1.txt", 15, 11)
+    sweep = Solvers(sparse.A, sparse.b).sweep("sor", omega=1.3)
+    assert np.allclose(sweep(x0), Solvers(sparse.A, sparse.b, x0=x0).sor(omega=1.3, max_iter=1)), \
+        "SOR sweep differs"
+
+    print("The sweeps reproduce one plain iteration!")
+
+
+def test_acceleration_cuts_iterations():
+    mc = build("input_files_examples/terminal_i1.txt", 60, 60, "matrix_free")
+    A, b = mc.A, mc.b
+    x_exact = spsolve(A.tocsr().tocsc(), b)
+
+    # 1e-6 is out of reach in 400 plain sweeps, and reached in 100 accelerated ones
+    assert relative_error(Solvers(A, b, tol=1e-14, max_iter=400).jacobi(), x_exact) > 1e-3
+    assert relative_error(Solvers(A, b, tol=1e-14, max_iter=400).gauss_seidel(), x_exact) > 1e-6
+    for method, acceleration in (("jacobi", "chebyshev"), ("red_black_sor", "chebyshev"),
+                                 ("line_sor", "chebyshev"), ("gauss_seidel", "anderson"),
+                                 ("red_black_sor", "anderson")):
+        x = Solvers(A, b, tol=1e-14, max_iter=100).accelerated(method, acceleration, omega=1.0)
+        error = relative_error(x, x_exact)
+        assert error < 1e-6, f"{acceleration} {method}: error {error:.2e} after 100 iterations"
+
+    # Anderson with a short history is still a large gain over plain Jacobi
+    x = Solvers(A, b, tol=1e-14, max_iter=400).accelerated("jacobi", "anderson", depth=2)
+    assert relative_error(x, x_exact) < 1e-3, "Anderson mixing of depth 2 did not help"
+
+    print("Chebyshev and Anderson acceleration cut the iteration counts!")
+
+
+def test_accelerated_model_solve():
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/test_2.txt")
+    model.create_mesh(30, 20)
+    model.create_matrix()
+    x_exact = spsolve(model.matrix_constructor.A.tocsc(), model.matrix_constructor.b)
+    for options in ({"method": "jacobi", "acceleration": "chebyshev"},
+                    {"method": "sor", "acceleration": "anderson", "depth": 8},
+                    {"method": "red_black_sor", "omega": 1.0, "acceleration": "chebyshev"}):
+        x = model.solve(max_iter=2000, **options)
+        assert np.allclose(x, x_exact, rtol=1e-6), f"Accelerated solve with {options} differs"
+
+    for options in ({"method": "sor", "acceleration": "chebyshev"},
+                    {"method": "gauss_seidel", "acceleration": "chebyshev"},
+                    {"method": "cg", "acceleration": "anderson"},
+                    {"method": "jacobi", "acceleration": "richardson"},
+                    {"method": "jacobi", "acceleration": "anderson", "depth": 0}):
+        try:
+            model.solve(**options)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Expected ValueError for {options}")
+
+    print("ProblemModel.solve accelerates the stationary methods!")
+
+
+if __name__ == "__main__":
+    test_sweep_matches_plain_iterations()
+    test_acceleration_cuts_iterations()
+    test_accelerated_model_solve()
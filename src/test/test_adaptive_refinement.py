@@ -0,0 +1,93 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Adaptive_refinement import Adaptive_refinement
+from src.classes.Material import Material
+from src.classes.Mesh_constructor import Mesh_constructor
+from src.model import ProblemModel
+from src.test.test_graded_mesh import absorber_materials
+from src.test.helpers import read_materials
+
+
+def absorption_rate(mesh, matrix, x):
+    return np.sum(mesh.Sigma_acells * matrix.numbering.to_grid(x) * matrix.cell_volumes())
+
+
+def test_refine_splits_cells():
+    mesh = Mesh_constructor(12, 5, absorber_materials(), spacing="graded", face_coupling="harmonic")
+    mesh.compute_extrapolated_boundaries_y()
+    mesh.compute_extrapolated_boundaries_x()
+    mesh.create_material_matrices()
+
+    fine = mesh.refine(columns=[0, 3, 4], rows=[2])
+    assert (fine.ncells_x, fine.ncells_y) == (15, 6), "Wrong number of cells after refining"
+    assert np.allclose(fine.dx[:2], mesh.dx[0] / 2) and np.allclose(fine.dy[2:4], mesh.dy[2] / 2), \
+        "Split cells are not halved"
+    assert np.isclose(fine.dx.sum(), mesh.dx.sum()) and np.isclose(fine.dy.sum(), mesh.dy.sum()), \
+        "Refining changed the domain"
+    assert sum(fine.cells_per_material) == 15, "Cells per material not updated"
+    coarse_edges, fine_edges = mesh.cell_edges()[0], fine.cell_edges()[0]
+    assert np.isclose(coarse_edges[:, np.newaxis], fine_edges).any(axis=1).all(), "Edges were moved"
+    column_material = np.repeat(np.arange(4), fine.cells_per_material)
+    assert np.array_equal(fine.Sigma_acells[0], fine.table.sigma_a[column_material]), \
+        "Materials misplaced after refining"
+
+    try:
+        Mesh_constructor(12, 5, absorber_materials()).refine(columns=[0])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError when refining a uniform mesh")
+
+    print("Refining splits the flagged columns and rows!")
+
+
+def test_adaptive_refinement_meets_tolerance():
+    reference = absorption_rate(*Adaptive_refinement(absorber_materials(), 20, 4, tol=2e-5,
+                                                     max_levels=40).run())
+
+    refinement = Adaptive_refinement(absorber_materials(), 20, 4, tol=1e-3)
+    mesh, matrix, x = refinement.run()
+    history = refinement.history
+    assert history[-1]["error"] <= 1e-3, f"Tolerance not met: {history[-1]}"
+    assert len(history) > 3, "Expected several levels"
+    assert all(b["cells"] > a["cells"] for a, b in zip(history, history[1:])), "Cell count did not grow"
+    assert history[-1]["error"] < history[0]["error"] / 50, "Estimate did not decrease"
+    assert np.allclose(x, spsolve(matrix.A.tocsc(), matrix.b), atol=1e-8), "Last level not solved"
+
+    error = abs(absorption_rate(mesh, matrix, x) - reference) / reference
+    assert error < 2e-3, f"True error {error:.2e} is far from the estimate"
+
+    # a uniform refinement with 20 times more cells is still less accurate
+    uniform = Adaptive_refinement(absorber_materials(), 320, 64, tol=1.0)
+    uniform_error = abs(absorption_rate(*uniform.run()) - reference) / reference
+    assert uniform.history[0]["cells"] > 20 * history[-1]["cells"] and uniform_error > error, \
+        f"Adaptive ({history[-1]['cells']} cells, {error:.2e}) vs uniform " \
+        f"({uniform.history[0]['cells']} cells, {uniform_error:.2e})"
+
+    for level in history:
+        print(f"level {level['level']}: {level['cells']} cells, estimated error {level['error']:.2e}")
+
+
+def test_adaptive_model_and_smooth_flux():
+    # infinite medium: the flux is flat, the first mesh is already exact
+    bound_type = (False, False, False, False)
+    flat = [Material("Water", 0.21, 0.01, 0.0, 0.0, 1.0, (10.0, 10.0), bound_type)]
+    refinement = Adaptive_refinement(flat, 8, 8, tol=1e-6)
+    _, _, x = refinement.run()
+    assert len(refinement.history) == 1 and refinement.history[0]["error"] < 1e-6, \
+        "A flat flux should need no refinement"
+    assert np.allclose(x, 100.0), "Flat flux is wrong"
+
+    model = ProblemModel()
+    model.materials = read_materials("input_files_examples/test_2.txt")
+    x = model.solve_adaptive(12, 6, tol=5e-3)
+    assert model.refinement_history[-1]["error"] <= 5e-3, "Model did not reach the tolerance"
+    assert x.size == model.mesh.N == model.matrix_constructor.A.shape[0], "Model state not updated"
+
+    print("The model refines adaptively and leaves flat fluxes alone!")
+
+
+if __name__ == "__main__":
+    test_refine_splits_cells()
+    test_adaptive_refinement_meets_tolerance()
+    test_adaptive_model_and_smooth_flux()
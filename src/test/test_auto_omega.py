@@ -0,0 +1,72 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve, eigs
+from src.classes.Solvers import Solvers
+from src.test.helpers import build_model
+
+
+def test_auto_omega_needs_fewer_iterations():
+    mc = build_model("input_files_examples/terminal_i1.txt", 80, 80).matrix_constructor
+    A, b = mc.A, mc.b
+    x_exact = spsolve(A.tocsc(), b)
+
+    d = A.diagonal()
+    jacobi = sp.eye(A.shape[0]) - sp.diags(1.0 / d) @ A
+    rho = abs(eigs(jacobi, k=1, which="LM", return_eigenvectors=False)[0])
+    estimate = Solvers(A, b).jacobi_spectral_radius()
+    assert rho * 0.998 < estimate <= rho, f"Jacobi radius {estimate:.5f}, expected {rho:.5f}"
+    assert np.isclose(Solvers.optimal_omega(0.0), 1.0), "No coupling needs no relaxation"
+
+    def error(omega, iterations):
+        x = Solvers(A, b).sor(omega=omega, tol=1e-14, max_iter=iterations)
+        return np.abs(x - x_exact).max() / np.abs(x_exact).max()
+
+    assert error("auto", 80) < 1e-6, "Automatic omega did not converge in 80 iterations"
+    assert error(1.25, 300) > 1e-6, "omega=1.25 converged as fast as the automatic factor"
+
+    solver = Solvers(A, b)
+    solver.sor(omega="auto", tol=1e-10)
+    assert solver.omega == solver.omega_history[-1] and solver.omega > Solvers.optimal_omega(estimate), \
+        f"The factor was not adapted: {solver.omega_history}"
+    assert abs(solver.omega - Solvers.optimal_omega(rho)) < 0.05, \
+        f"Adapted factor {solver.omega:.4f} is far from the optimum {Solvers.optimal_omega(rho):.4f}"
+
+    print(f"Automatic omega {solver.omega:.4f} (optimum {Solvers.optimal_omega(rho):.4f})")
+
+
+def test_auto_omega_every_sweep():
+    model = build_model("input_files_examples/test_2.txt", 40, 20, matrix_format="matrix_free")
+    operator = model.matrix_constructor.A
+    x_exact = spsolve(operator.tocsr().tocsc(), model.matrix_constructor.b)
+
+    x = model.solve(method="sor", omega="auto")
+    assert np.allclose(x, x_exact, rtol=1e-4), "Matrix-free SOR with omega='auto' differs"
+    assert model.solver.omega > 1.7, f"Factor {model.solver.omega} not reported"
+    x = model.solve(method="red_black_sor", omega="auto", max_iter=5000)
+    assert np.allclose(x, x_exact, rtol=1e-6), "Red-black SOR with omega='auto' differs"
+    assert model.solver.omega > 1.7, "Red-black factor not reported"
+
+    # the sweeps of the accelerated solves report their factor too
+    x = model.solve(method="sor", omega="auto", acceleration="anderson")
+    assert np.allclose(x, x_exact, rtol=1e-4), "Anderson-accelerated SOR with omega='auto' differs"
+    assert model.solver.omega > 1.7, f"Accelerated factor {model.solver.omega} not reported"
+    solver = Solvers(operator, model.matrix_constructor.b)
+    for method in ("sor", "red_black_sor", "line_sor", "adi"):
+        solver.omega = None
+        solver.sweep(method, omega="auto")
+        assert solver.omega > 1.0 and solver.omega_history == [solver.omega], \
+            f"sweep({method!r}) did not keep its factor"
+
+    try:
+        model.solve(method="sor", omega="fast")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for an unknown omega")
+
+    print("omega='auto' works with every SOR sweep!")
+
+
+if __name__ == "__main__":
+    test_auto_omega_needs_fewer_iterations()
+    test_auto_omega_every_sweep()
@@ -0,0 +1,67 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Banded_cholesky import Banded_cholesky
+from src.classes.Solvers import Solvers
+from src.model import ProblemModel
+from src.test.helpers import build
+
+
+def test_cholesky_matches_direct_solve():
+    for file_path in ("input_files_examples/test_2.txt",
+                      "input_files_examples/terminal_i1.txt",
+                      "input_files_examples/terminal_i2.txt"):
+        x_exact = None
+        for matrix_format in ("sparse", "dense", "matrix_free"):
+            mc = build(file_path, 13, 8, matrix_format)
+            chol = mc.get_cholesky()
+            assert chol.bandwidth == 13, f"Bandwidth should be ncells_x, got {chol.bandwidth}"
+            if x_exact is None:
+                x_exact = spsolve(mc.A.tocsc(), mc.b)
+            assert np.allclose(chol.solve(mc.b), x_exact), \
+                f"Banded Cholesky ({matrix_format}) differs from the direct solve for {file_path}"
+
+    # on an already symmetric system no weights are needed
+    mc = build("input_files_examples/test_2.txt", 10, 7)
+    S, c = mc.symmetric_system()
+    assert np.allclose(Solvers(S, c).cholesky(), spsolve(mc.A.tocsc(), mc.b)), \
+        "Cholesky of the symmetric system differs from the direct solve"
+
+    print("Banded Cholesky matches the direct solve!")
+
+
+def test_non_positive_definite_raises():
+    mc = build("input_files_examples/test_2.txt", 6, 5)
+    try:
+        Banded_cholesky(-mc.symmetric_system()[0])
+    except np.linalg.LinAlgError:
+        pass
+    else:
+        raise AssertionError("Expected LinAlgError for a negative definite matrix")
+
+    print("Non positive definite matrices are rejected!")
+
+
+def test_model_reuses_factorization():
+    model = ProblemModel()
+    model.matrix_constructor = build("input_files_examples/terminal_i1.txt", 20, 15)
+    A = model.matrix_constructor.A
+
+    x = model.solve(method="cholesky")
+    factorization = model.factorization
+    assert factorization is not None, "Factorization was not cached"
+    assert np.allclose(A.dot(x), model.matrix_constructor.b), "Cholesky solution is wrong"
+
+    B = np.random.default_rng(3).random((A.shape[0], 4))
+    B[model.matrix_constructor.grid_index()[model.matrix_constructor.vacuum_mask()]] = 0.0
+    X = model.solve_sources(B)
+    assert model.factorization is factorization, "Factorization was recomputed"
+    assert np.allclose(A.dot(X), B), "Multiple right-hand sides were not solved"
+    assert np.allclose(model.solve_sources(B[:, 1]), X[:, 1]), "Single source differs from batch"
+
+    print("The model reuses its cached factorization!")
+
+
+if __name__ == "__main__":
+    test_cholesky_matches_direct_solve()
+    test_non_positive_definite_raises()
+    test_model_reuses_factorization()
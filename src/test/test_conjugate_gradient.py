@@ -0,0 +1,81 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Preconditioners import Incomplete_cholesky_preconditioner, SSOR_preconditioner
+from src.classes.Solvers import Solvers
+from src.test.helpers import build
+
+
+def test_symmetric_system():
+    # test_2 has three different D values, so A itself is not symmetric
+    mc = build("input_files_examples/test_2.txt", 14, 9, "sparse")
+    S, c = mc.symmetric_system()
+    assert abs(S - S.T).max() < 1e-14, "Scaled system is not symmetric"
+    assert np.allclose(spsolve(S.tocsc(), c), spsolve(mc.A.tocsc(), mc.b)), \
+        "Scaled system has a different solution"
+
+    print("Symmetric scaling test passed!")
+
+
+def test_cg_all_formats_and_preconditioners():
+    for file_path in ("input_files_examples/test_2.txt", "input_files_examples/terminal_i1.txt"):
+        reference = build(file_path, 14, 9, "dense")
+        x_exact = np.linalg.solve(reference.A, reference.b)
+
+        for matrix_format in ("dense", "sparse", "matrix_free"):
+            mc = build(file_path, 14, 9, matrix_format)
+            S, c = mc.symmetric_system()
+            for preconditioner in (None, "jacobi", "ssor", "ichol"):
+                x = Solvers(S, c, tol=1e-12, max_iter=2000).cg(preconditioner=preconditioner)
+                assert np.allclose(x, x_exact, atol=1e-8), \
+                    f"CG ({matrix_format}, {preconditioner}) did not converge for {file_path}"
+
+    print("CG converges for every format and preconditioner!")
+
+
+def test_grid_and_csr_preconditioners_agree():
+    mc = build("input_files_examples/test_2.txt", 11, 7, "sparse")
+    S, c = mc.symmetric_system()
+    free = build("input_files_examples/test_2.txt", 11, 7, "matrix_free")
+    S_free, _ = free.symmetric_system()
+
+    r = np.random.default_rng(1).random(S.shape[0])
+    for make in (Incomplete_cholesky_preconditioner, lambda A: SSOR_preconditioner(A, omega=1.3)):
+        M = make(S)
+        lower, upper = M.lower.copy(), M.upper.copy()
+        z_csr = M.apply(r)
+        z_grid = make(S_free).apply(r)
+        assert np.allclose(z_csr, z_grid), "Grid and CSR preconditioners differ"
+        assert (M.lower != lower).nnz == 0 and (M.upper != upper).nnz == 0, \
+            "Applying the preconditioner changed its stored factors"
+
+    print("Grid and CSR preconditioners agree!")
+
+
+def test_ichol_reduces_iterations():
+    mc = build("input_files_examples/terminal_i1.txt", 60, 60, "sparse")
+    S, c = mc.symmetric_system()
+
+    counts = {}
+    for preconditioner in (None, "ichol"):
+        solver = Solvers(S, c, tol=1e-10, max_iter=5000)
+        residuals = []
+        M = solver.get_preconditioner(preconditioner)
+
+        class Counting:
+            def apply(self, r):
+                residuals.append(np.linalg.norm(r))
+                return r if M is None else M.apply(r)
+
+        solver.cg(preconditioner=Counting())
+        counts[preconditioner] = len(residuals)
+
+    assert counts["ichol"] < counts[None], f"IC(0) did not reduce CG iterations: {counts}"
+
+    print("IC(0) reduces CG iterations!")
+
+
+if __name__ == "__main__":
+    test_symmetric_system()
+    test_cg_all_formats_and_preconditioners()
+    test_grid_and_csr_preconditioners_agree()
+    test_ichol_reduces_iterations()
@@ -0,0 +1,105 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Convergence_study import Convergence_study
+from src.classes.Numbering import Numbering
+from src.model import ProblemModel
+from src.test.helpers import build_model
+
+GRADED = {"spacing": "graded", "face_coupling": "harmonic"}
+
+
+def test_prolong_is_exact_for_linear_flux():
+    coarse = build_model("input_files_examples/terminal_i1.txt", 10, 6, **GRADED).mesh
+    fine = build_model("input_files_examples/terminal_i1.txt", 20, 12, **GRADED).mesh
+
+    def linear(mesh):
+        x, y = Convergence_study.cell_centres(mesh)
+        phi = 2.0 * x[np.newaxis, :] - 0.5 * y[:, np.newaxis] + 3.0
+        return phi, Numbering(mesh.ncells_x, mesh.ncells_y).to_vector(phi)
+
+    _, x_coarse = linear(coarse)
+    phi_fine, _ = linear(fine)
+    prolonged = Numbering(20, 12).to_grid(Convergence_study.prolong(x_coarse, coarse, fine))
+    # beyond the outer coarse centres the values are held constant
+    assert np.allclose(prolonged[1:-1, 1:-1], phi_fine[1:-1, 1:-1]), "Linear flux not reproduced"
+    assert np.allclose(Convergence_study.prolong(x_coarse, coarse, coarse), x_coarse), \
+        "Prolonging onto the same mesh changed the solution"
+
+    print("Bilinear prolongation reproduces a linear flux!")
+
+
+def test_richardson_extrapolation():
+    study = Convergence_study(ProblemModel(), 10, 10, ratio=2)
+    # Q(h) = 5 + 3 h^2 with h = 1, 1/2, 1/4
+    order, extrapolated, error = study.extrapolate([8.0, 5.75, 5.1875])
+    assert np.isclose(order, 2.0) and np.isclose(extrapolated, 5.0), \
+        f"Wrong extrapolation: order {order}, value {extrapolated}"
+    assert np.isclose(error, 0.1875 / 5.0), "Wrong error estimate"
+    assert np.isinf(study.extrapolate([8.0, 5.75])[2]), "Two levels cannot be extrapolated"
+    assert np.isinf(study.extrapolate([1.0, 2.0, 4.0])[2]), "Diverging values were extrapolated"
+    assert np.isinf(study.extrapolate([8.0, 5.0, 5.0])[2]), "A plateau was taken for convergence"
+    assert study.extrapolate([5.0, 5.0, 5.0])[1:] == (5.0, 0.0), "Constant values are converged"
+
+    for bad in ({"levels": 0}, {"ratio": 1}, {"ratio": 1.5}):
+        try:
+            Convergence_study(ProblemModel(), 10, 10, **bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Expected ValueError for {bad}")
+
+    print("Richardson extrapolation recovers the limit and the order!")
+
+
+def test_convergence_study_stops_at_tolerance():
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/terminal_i1.txt")
+    model.convergence_study(10, 10, levels=5, mesh_options=GRADED)
+    full = model.convergence_history
+    assert [level["ncells_x"] for level in full] == [10, 20, 40, 80, 160], "Wrong levels"
+    assert model.mesh.ncells_x == 160, "The model does not hold the last level"
+
+    orders = [level["order"]["absorption"] for level in full[2:]]
+    assert all(0.8 < p < 1.2 for p in orders), f"Expected first order, got {orders}"
+    errors = [level["error"]["absorption"] for level in full[2:]]
+    assert errors[0] > errors[1] > errors[2], f"Estimates do not decrease: {errors}"
+    # the extrapolation is closer to the finer extrapolation than the raw value
+    q, extrapolated = full[3]["values"]["absorption"], full[3]["extrapolated"]["absorption"]
+    limit = full[4]["extrapolated"]["absorption"]
+    assert abs(extrapolated - limit) < abs(q - limit) / 3, "Extrapolation does not help"
+    for level in full:
+        assert level["time"] >= level["solve_time"] > 0.0, "Wall time not recorded"
+
+    model.convergence_study(10, 10, levels=5, tol=1e-2, mesh_options=GRADED)
+    early = model.convergence_history
+    assert len(early) == 4 and max(early[-1]["error"].values()) <= 1e-2, \
+        f"Expected to stop at level 3, stopped at {early[-1]['level']}"
+
+    for level in full:
+        print(f"{level['cells']} cells: absorption {level['values']['absorption']:.5f}, "
+              f"extrapolated {level['extrapolated']['absorption']:.5f}, {level['time']:.3f} s")
+
+
+def test_nested_iteration_initial_guess():
+    coarse = build_model("input_files_examples/test_2.txt", 16, 8, **GRADED)
+    fine = build_model("input_files_examples/test_2.txt", 32, 16, **GRADED)
+    x_coarse = coarse.solve(method="cholesky")
+    mc = fine.matrix_constructor
+    x_exact = spsolve(mc.A.tocsc(), mc.b)
+
+    x0 = Convergence_study.prolong(x_coarse, coarse.mesh, fine.mesh)
+    nested = fine.solve(method="gauss_seidel", max_iter=5, x0=x0)
+    cold = fine.solve(method="gauss_seidel", max_iter=5)
+    assert np.abs(nested - x_exact).max() < np.abs(cold - x_exact).max() / 10, \
+        "The prolonged coarse solution is not a better start"
+    assert np.allclose(fine.solve(method="gauss_seidel", max_iter=1, x0=x_exact), x_exact), \
+        "The exact initial guess was not used"
+
+    print("Nested iteration starts close to the fine solution!")
+
+
+if __name__ == "__main__":
+    test_prolong_is_exact_for_linear_flux()
+    test_richardson_extrapolation()
+    test_convergence_study_stops_at_tolerance()
+    test_nested_iteration_initial_guess()
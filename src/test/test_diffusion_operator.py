@@ -0,0 +1,71 @@
+import numpy as np
+from src.classes.Diffusion_operator import Diffusion_operator
+from src.classes.Solvers import Solvers
+from src.test.helpers import build
+
+
+def test_operator_matches_sparse_matrix():
+    rng = np.random.default_rng(0)
+    for file_path in ("input_files_examples/test_2.txt",
+                      "input_files_examples/terminal_i1.txt",
+                      "input_files_examples/terminal_i2.txt"):
+        sparse = build(file_path, 13, 8, "sparse")
+        free = build(file_path, 13, 8, "matrix_free")
+
+        assert isinstance(free.A, Diffusion_operator), "Expected a matrix-free operator"
+        x = rng.random(free.A.shape[0])
+        assert np.allclose(free.A.dot(x), sparse.A.dot(x)), f"A·x differs for {file_path}"
+        assert np.allclose(free.A.diagonal(), sparse.A.diagonal()), f"Diagonal differs for {file_path}"
+        assert np.allclose(free.A.tocsr().toarray(), sparse.A.toarray()), f"tocsr differs for {file_path}"
+        assert np.array_equal(free.b, sparse.b), f"b differs for {file_path}"
+
+    print("Matrix-free operator matches the sparse matrix!")
+
+
+def test_matrix_free_solvers():
+    sparse = build("input_files_examples/terminal_i1.txt", 13, 8, "sparse")
+    free = build("input_files_examples/terminal_i1.txt", 13, 8, "matrix_free")
+
+    for method in ("jacobi", "gauss_seidel", "sor"):
+        x_sparse = getattr(Solvers(sparse.A, sparse.b), method)(tol=1e-12, max_iter=5)
+        x_free = getattr(Solvers(free.A, free.b), method)(tol=1e-12, max_iter=5)
+        assert np.allclose(x_free, x_sparse), f"{method}: matrix-free iterates differ from sparse"
+
+    x_exact = np.linalg.solve(sparse.A.toarray(), sparse.b)
+    x = Solvers(free.A, free.b, max_iter=5000).sor(tol=1e-12)
+    assert np.allclose(x, x_exact, atol=1e-8), "Matrix-free SOR did not converge to the direct solution"
+
+    print("Matrix-free solvers reproduce the sparse iterates!")
+
+
+def test_red_black_sor():
+    for file_path in ("input_files_examples/test_2.txt",
+                      "input_files_examples/terminal_i1.txt",
+                      "input_files_examples/terminal_i2.txt"):
+        for ncells_x, ncells_y in ((13, 8), (10, 7)):
+            sparse = build(file_path, ncells_x, ncells_y, "sparse")
+            x_exact = np.linalg.solve(sparse.A.toarray(), sparse.b)
+
+            operator = sparse.get_operator()
+            x = Solvers(operator, sparse.b, max_iter=5000).red_black_sor(omega=1.2, tol=1e-13)
+            assert np.allclose(x, x_exact, atol=1e-8), f"Red-black SOR did not converge for {file_path}"
+
+    # Checkerboard Gauss-Seidel equals lexicographic GS on the permuted system
+    sparse = build("input_files_examples/terminal_i1.txt", 6, 5, "sparse")
+    operator = sparse.get_operator()
+    grid = np.indices((5, 6)).sum(axis=0) % 2
+    colour = operator.to_vector(grid)
+    perm = np.argsort(colour, kind="stable")
+    A_perm = sparse.A[perm][:, perm]
+
+    x_perm = Solvers(A_perm, sparse.b[perm]).gauss_seidel(max_iter=3, tol=0)
+    x_rb = Solvers(operator, sparse.b).red_black_sor(omega=1.0, max_iter=3, tol=0)
+    assert np.allclose(x_rb[perm], x_perm), "Red-black sweep differs from GS in red-black ordering"
+
+    print("Red-black SOR converges and matches red-black ordered Gauss-Seidel!")
+
+
+if __name__ == "__main__":
+    test_operator_matches_sparse_matrix()
+    test_matrix_free_solvers()
+    test_red_black_sor()
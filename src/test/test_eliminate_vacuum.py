@@ -0,0 +1,77 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Solvers import Solvers
+from src.model import ProblemModel
+from src.test.helpers import build
+
+INPUT_FILES = [
+    "input_files_examples/test_2.txt",
+    "input_files_examples/terminal_i1.txt",
+    "input_files_examples/terminal_i2.txt",
+]
+
+
+def test_reduced_system_is_interior_block():
+    for file_path in INPUT_FILES:
+        full = build(file_path, 13, 8)
+        x_full = spsolve(full.A.tocsc(), full.b)
+        keep = ~full.vacuum_mask()
+        interior = full.grid_index()[keep]
+
+        for matrix_format in ("dense", "sparse", "matrix_free"):
+            reduced = build(file_path, 13, 8, matrix_format, eliminate_vacuum=True)
+            N = reduced.unknowns_x * reduced.unknowns_y
+            assert N == keep.sum(), f"Wrong number of unknowns for {file_path}"
+            assert reduced.A.shape == (N, N) and reduced.b.shape == (N,), "Reduced system has the wrong size"
+
+            # same rows/columns as the full system, in the same relative order
+            order = np.argsort(interior)
+            A = reduced.get_operator().tocsr().toarray()
+            assert np.allclose(A, full.A.toarray()[np.ix_(interior[order], interior[order])]), \
+                f"Reduced A ({matrix_format}) is not the interior block for {file_path}"
+
+            x = reduced.scatter(spsolve(reduced.get_operator().tocsr().tocsc(), reduced.b))
+            assert x.shape == x_full.shape, "Scattered solution is not on the full grid"
+            assert np.allclose(x, x_full), f"Reduced solution ({matrix_format}) differs for {file_path}"
+
+    print("Eliminating the vacuum cells keeps the interior block of the system!")
+
+
+def test_solvers_on_reduced_system():
+    full = build("input_files_examples/terminal_i1.txt", 20, 14)
+    x_full = spsolve(full.A.tocsc(), full.b)
+    reduced = build("input_files_examples/terminal_i1.txt", 20, 14, "matrix_free", eliminate_vacuum=True)
+
+    solver = Solvers(reduced.A, reduced.b, tol=1e-12, max_iter=20000)
+    S, c = reduced.symmetric_system()
+    solutions = {
+        "sor": solver.sor(omega=1.5, tol=1e-13),
+        "red_black_sor": solver.red_black_sor(omega=1.5, tol=1e-13),
+        "multigrid": solver.multigrid(reduced.get_multigrid()),
+        "cg": Solvers(S, c, tol=1e-12).cg(preconditioner=reduced.get_multigrid(symmetric=True)),
+        "cholesky": reduced.get_cholesky("auto").solve(reduced.b),
+    }
+    for method, x in solutions.items():
+        assert np.allclose(reduced.scatter(x), x_full, atol=1e-8), f"{method} on the reduced system differs"
+
+    print("Every solver works on the reduced system!")
+
+
+def test_model_scatters_solution():
+    model = ProblemModel()
+    model.matrix_constructor = build("input_files_examples/test_2.txt", 15, 9)
+    x_full = model.solve(method="cholesky")
+    model.matrix_constructor = build("input_files_examples/test_2.txt", 15, 9, "sparse", eliminate_vacuum=True)
+    model.factorization = None
+    for method in ("cholesky", "cg", "multigrid"):
+        x = model.solve(method=method, max_iter=20000, ordering="rcm" if method == "cg" else "row")
+        assert x.shape == x_full.shape and np.allclose(x, x_full, atol=1e-6), \
+            f"Model {method} on the reduced system differs"
+
+    print("The model scatters reduced solutions back to the grid!")
+
+
+if __name__ == "__main__":
+    test_reduced_system_is_interior_block()
+    test_solvers_on_reduced_system()
+    test_model_scatters_solution()
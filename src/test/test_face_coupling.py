@@ -0,0 +1,68 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Matrix_constructor import Matrix_constructor
+from src.classes.Solvers import Solvers
+from src.test.helpers import build_system
+
+
+def slab_flux(ncells_x, face_coupling):
+    # terminal_i2: water | fuel, reflective on every side, so φ depends on x only
+    _, mc = build_system("input_files_examples/terminal_i2.txt", ncells_x, 3,
+                         face_coupling=face_coupling, finite_volume=True)
+    return mc.numbering.to_grid(spsolve(mc.A.tocsc(), mc.b))[0]
+
+
+def test_harmonic_coupling_is_symmetric():
+    for file_path in ("input_files_examples/test_2.txt", "input_files_examples/terminal_i1.txt"):
+        for finite_volume in (False, True):
+            mesh, mc = build_system(file_path, 23, 9, face_coupling="harmonic",
+                                    finite_volume=finite_volume)
+            assert abs(mc.A - mc.A.T).max() < 1e-12, \
+                f"Harmonic A is not symmetric for {file_path} (finite_volume={finite_volume})"
+            assert np.all(mc.symmetrizing_weights() == 1.0), "Harmonic A needs no weights"
+            assert np.isin(mesh.Dcells, mesh.table.diffusion_coefficient()).all(), \
+                "Interface columns were averaged"
+
+            x_exact = spsolve(mc.A.tocsc(), mc.b)
+            S, c = mc.symmetric_system()
+            x = Solvers(S, c, tol=1e-12, max_iter=500).cg(preconditioner=mc.get_multigrid(symmetric=True))
+            assert np.allclose(x, x_exact, atol=1e-8), "Multigrid preconditioned CG did not converge"
+            assert np.allclose(mc.get_cholesky().solve(mc.b), x_exact), "Cholesky differs"
+
+    # one material: both couplings give the same matrix
+    _, local = build_system("input_files_examples/test_2.txt", 12, 5, face_coupling="local", finite_volume=False)
+    D = local.Dcell.copy()
+    D[:] = D[0, 0]
+    for finite_volume in (False, True):
+        a = Matrix_constructor(12, 5, D, local.Sigma_a_cell, local.source_cells, local.dx, local.dy,
+                               local.materials, [], "sparse", finite_volume=finite_volume)
+        h = Matrix_constructor(12, 5, D, local.Sigma_a_cell, local.source_cells, local.dx, local.dy,
+                               local.materials, [], "sparse", finite_volume=finite_volume,
+                               face_coupling="harmonic")
+        assert abs(a.A - h.A).max() < 1e-12, "Couplings differ for a uniform D"
+
+    print("Harmonic face coupling gives a symmetric system!")
+
+
+def test_harmonic_coupling_is_second_order():
+    reference = slab_flux(9 * 256, "harmonic")
+    errors = {"local": [], "harmonic": []}
+    for ncells_x in (18, 36, 72, 288):
+        cell_mean = reference.reshape(ncells_x, -1).mean(axis=1)
+        for face_coupling in errors:
+            error = np.abs(slab_flux(ncells_x, face_coupling) - cell_mean).max() / cell_mean.max()
+            errors[face_coupling].append(error)
+
+    harmonic, local = errors["harmonic"], errors["local"]
+    assert harmonic[1] < harmonic[0] / 3.5 and harmonic[2] < harmonic[1] / 3.5, \
+        f"Harmonic coupling is not second order: {harmonic}"
+    assert local[1] > local[0] / 2.5, f"Expected first order with the averaged column: {local}"
+    assert harmonic[1] < local[3], \
+        f"36 harmonic cells ({harmonic[1]:.2e}) should beat 288 averaged ones ({local[3]:.2e})"
+
+    print(f"Flux error with 36 cells: harmonic {harmonic[1]:.2e}, averaged column {local[1]:.2e}")
+
+
+if __name__ == "__main__":
+    test_harmonic_coupling_is_symmetric()
+    test_harmonic_coupling_is_second_order()
@@ -0,0 +1,167 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Material import Material
+from src.classes.Matrix_constructor import Matrix_constructor
+from src.classes.Solvers import Solvers
+from src.model import ProblemModel
+from src.test.helpers import build_system
+
+GRADED = {"spacing": "graded", "finite_volume": True}
+
+
+def absorber_materials():
+    # a thin strong absorber next to the fuel, vacuum left/right
+    bound_type = (True, True, False, False)
+    return [
+        Material("Water", 0.21, 0.01, 0.0, 0.0, 0.0, (10.0, 10.0), bound_type),
+        Material("Absorber", 0.3, 2.0, 0.0, 0.0, 0.0, (0.5, 10.0), bound_type),
+        Material("Fuel", 0.5, 0.02, 0.1, 0.0, 1.0, (8.0, 10.0), bound_type),
+        Material("Water", 0.21, 0.01, 0.0, 0.0, 0.0, (10.0, 10.0), bound_type),
+    ]
+
+
+def absorption_rate(mesh, matrix):
+    x = spsolve(matrix.A.tocsc(), matrix.b)
+    return np.sum(mesh.Sigma_acells * matrix.numbering.to_grid(x) * matrix.cell_volumes())
+
+
+def test_graded_mesh_follows_interfaces():
+    materials = absorber_materials()
+    mesh, _ = build_system(materials, 40, 6, **GRADED)
+
+    x_edges, y_edges = mesh.cell_edges()
+    assert np.isclose(x_edges[0], -mesh.extrapolated_distances_left), "Mesh does not start at the margin"
+    assert np.isclose(x_edges[-1], 28.5 + mesh.extrapolated_distances_right), "Mesh does not end at the margin"
+    for interface in (10.0, 10.5, 18.5):
+        assert np.isclose(x_edges, interface).any(), f"No cell edge on the interface at {interface}"
+    assert np.isclose(y_edges[-1] - y_edges[0], mesh.total_height), "Rows do not fill the height"
+    assert sum(mesh.cells_per_material) == 40 and min(mesh.cells_per_material) >= 1, \
+        f"Bad cell split {mesh.cells_per_material}"
+
+    # no averaged columns: every cell holds a single material
+    assert set(np.unique(mesh.Sigma_acells)) == {0.01, 2.0, 0.02}, "Interface cells were averaged"
+
+    # cells shrink towards the ends of every material
+    water = mesh.dx[:mesh.cells_per_material[0]]
+    assert water[0] < water[len(water) // 2] and water[-1] < water[len(water) // 2], \
+        "Cells are not graded towards the interfaces"
+    assert np.isclose(water.max() / water.min(), 4.0), "Wrong grading ratio"
+
+    # the ratio does not grow with the number of cells
+    fine, _ = build_system(materials, 400, 6, **GRADED)
+    water = fine.dx[:fine.cells_per_material[0]]
+    assert np.isclose(water.max() / water.min(), 4.0), "Grading grows with refinement"
+    assert np.all(water[1:len(water) // 2] / water[:len(water) // 2 - 1] < 1.02), "Cells grow too fast"
+
+    try:
+        build_system(materials, 3, 6, **GRADED)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError with fewer cells than materials")
+
+    print("The graded mesh follows the material interfaces!")
+
+
+def test_finite_volume_uniform_arrays_match_scalars():
+    materials = absorber_materials()
+    mesh, scalar = build_system(materials, 30, 5, spacing="uniform", finite_volume=True)
+    arrays = Matrix_constructor(
+        mesh.ncells_x, mesh.ncells_y,
+        mesh.Dcells, mesh.Sigma_acells, mesh.source_cells,
+        np.full(30, mesh.dx), np.full(5, mesh.dy), materials, mesh.interfaces_x,
+        matrix_format="sparse", finite_volume=True
+    )
+    assert abs(scalar.A - arrays.A).max() < 1e-12, "Constant arrays differ from scalar cell sizes"
+    assert np.allclose(scalar.b, arrays.b), "Source differs"
+
+    try:
+        Matrix_constructor(
+            mesh.ncells_x, mesh.ncells_y,
+            mesh.Dcells, mesh.Sigma_acells, mesh.source_cells,
+            np.full(30, mesh.dx), mesh.dy, materials, mesh.interfaces_x
+        )
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for per-column dx without finite_volume")
+
+    print("The finite-volume stencil accepts per-column and per-row sizes!")
+
+
+def test_graded_mesh_needs_fewer_cells():
+    materials = absorber_materials()
+    reference = absorption_rate(*build_system(materials, 4000, 3, grading=1.0, **GRADED))
+
+    graded = abs(absorption_rate(*build_system(materials, 64, 3, **GRADED)) - reference) / reference
+    uniform_mesh = build_system(materials, 640, 3, spacing="uniform", finite_volume=True)
+    uniform = abs(absorption_rate(*uniform_mesh) - reference) / reference
+    assert graded < 0.02, f"Graded mesh error {graded:.3e} too large"
+    assert graded < uniform, f"64 graded cells ({graded:.3e}) lose to 640 uniform ones ({uniform:.3e})"
+
+    # refinement converges
+    errors = [abs(absorption_rate(*build_system(materials, n, 3, **GRADED)) - reference) / reference
+              for n in (80, 320)]
+    assert errors[1] < errors[0] / 4, f"Graded mesh does not converge: {errors}"
+
+    print(f"64 graded cells: error {graded:.2e}, 640 uniform cells: error {uniform:.2e}")
+
+
+def test_reflective_edges_match():
+    # one slab, reflective on the left and vacuum on the right
+    bound_type = (False, True, False, False)
+    materials = [Material("Fuel", 0.5, 0.02, 0.1, 0.0, 1.0, (8.0, 10.0), bound_type)]
+
+    # both stencils lose the same current through every face, none through a reflective one
+    mesh, _ = build_system(materials, 20, 3)
+    D, S, volume = mesh.Dcells, mesh.Sigma_acells, mesh.dx * mesh.dy
+    boundary = (False, True, False, False)
+    uniform = Matrix_constructor.stencil_coefficients(D, S, mesh.dx, mesh.dy, boundary)
+    finite_volume = Matrix_constructor.finite_volume_stencil(D, S, mesh.dx, mesh.dy, boundary)
+    assert np.allclose(uniform[0] - S, finite_volume[0] - S * volume), "Boundary leakage differs"
+    assert all(np.allclose(a, b) for a, b in zip(uniform[1:], finite_volume[1:])), "Couplings differ"
+    diag, left, right, top, bottom = uniform
+    leakage = diag - S - (((left + right) + top) + bottom)
+    assert np.allclose(leakage[:, :-1], 0.0), "Current leaks through a reflective face"
+
+    # so a uniform and a graded mesh converge to the same answer
+    reference = absorption_rate(*build_system(materials, 4000, 3, spacing="uniform", finite_volume=True))
+    errors = [abs(absorption_rate(*build_system(materials, n, 3, **GRADED)) - reference) / reference
+              for n in (20, 40, 80, 160)]
+    assert errors[-1] < 5e-3 and all(b < a for a, b in zip(errors, errors[1:])), \
+        f"Graded mesh does not converge to the uniform answer: {errors}"
+
+    print("Uniform and graded meshes apply the same reflective condition!")
+
+
+def test_graded_mesh_solvers():
+    materials = absorber_materials()
+    mesh, mc = build_system(materials, 48, 20, **GRADED)
+    x_exact = spsolve(mc.A.tocsc(), mc.b)
+
+    x = Solvers(mc.A, mc.b, tol=1e-11, max_iter=100).multigrid(mc.get_multigrid())
+    assert np.allclose(x, x_exact, atol=1e-8), "Multigrid did not converge on the graded mesh"
+    assert np.allclose(mc.get_cholesky().solve(mc.b), x_exact), "Cholesky differs on the graded mesh"
+
+    model = ProblemModel()
+    model.materials = materials
+    model.create_mesh(48, 20, spacing="graded")
+    model.matrix_constructor = Matrix_constructor(
+        model.mesh.ncells_x, model.mesh.ncells_y,
+        model.mesh.Dcells, model.mesh.Sigma_acells, model.mesh.source_cells,
+        model.mesh.dx, model.mesh.dy, materials, model.mesh.interfaces_x,
+        matrix_format="sparse", bound_type=model.mesh.bound_type,
+        finite_volume=model.mesh.spacing != "uniform"
+    )
+    assert np.allclose(model.solve(method="cg", preconditioner="multigrid", max_iter=200),
+                       x_exact, atol=1e-6), "Model solve differs on the graded mesh"
+
+    print("Multigrid, Cholesky and CG work on the graded mesh!")
+
+
+if __name__ == "__main__":
+    test_graded_mesh_follows_interfaces()
+    test_finite_volume_uniform_arrays_match_scalars()
+    test_graded_mesh_needs_fewer_cells()
+    test_reflective_edges_match()
+    test_graded_mesh_solvers()
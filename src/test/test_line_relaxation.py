@@ -0,0 +1,101 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Diffusion_operator import Diffusion_operator
+from src.classes.Solvers import Solvers
+from src.model import ProblemModel
+from src.test.test_multigrid import Counting
+from src.test.helpers import build
+
+
+def test_batched_thomas():
+    rng = np.random.default_rng(4)
+    lower, upper = -rng.random((9, 6)), -rng.random((9, 6))
+    diag = 2.5 + rng.random((9, 6))
+    rhs = rng.random((9, 6))
+    x = Diffusion_operator.thomas(lower, diag, upper, rhs)
+    for k in range(6):
+        M = np.diag(diag[:, k]) + np.diag(lower[1:, k], -1) + np.diag(upper[:-1, k], 1)
+        assert np.allclose(M @ x[:, k], rhs[:, k]), f"System {k} not solved"
+
+    # a single row of cells is one x line: one sweep is a direct solve
+    mc = build("input_files_examples/test_2.txt", 40, 1, "matrix_free")
+    x = Solvers(mc.A, mc.b).line_sor(direction="x", max_iter=1)
+    assert np.allclose(x, spsolve(mc.A.tocsr().tocsc(), mc.b)), "One x-line sweep is not exact"
+
+    print("The batched Thomas algorithm solves every line!")
+
+
+def test_line_relaxation_on_stretched_cells():
+    # 200 x 10: dx about 5 times smaller than dy, strong coupling along x
+    for (ncells_x, ncells_y), strong in (((200, 10), "x"), ((10, 200), "y")):
+        mc = build("input_files_examples/test_2.txt", ncells_x, ncells_y, "matrix_free")
+        x_exact = spsolve(mc.A.tocsr().tocsc(), mc.b)
+
+        def error(x):
+            return np.abs(x - x_exact).max() / np.abs(x_exact).max()
+
+        weak = "y" if strong == "x" else "x"
+        point = error(Solvers(mc.A, mc.b).gauss_seidel(tol=1e-14, max_iter=100))
+        along = error(Solvers(mc.A, mc.b).line_sor(direction=strong, tol=1e-14, max_iter=100))
+        across = error(Solvers(mc.A, mc.b).line_sor(direction=weak, tol=1e-14, max_iter=100))
+        adi = error(Solvers(mc.A, mc.b).adi(tol=1e-14, max_iter=50))
+        assert along < 2e-3 and point > 0.5 and across > 0.5, \
+            f"{strong} lines: point {point:.2e}, along {along:.2e}, across {across:.2e}"
+        assert adi < 0.05, f"ADI did not converge on {ncells_x}x{ncells_y}: {adi:.2e}"
+
+    try:
+        Solvers(mc.A.tocsr(), mc.b).line_sor()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for line SOR without the grid stencil")
+
+    print("Line relaxation along the strong coupling converges where point sweeps stall!")
+
+
+def test_line_smoothers_in_multigrid():
+    mc = build("input_files_examples/test_2.txt", 10, 400, "matrix_free")
+    x_exact = spsolve(mc.A.tocsr().tocsc(), mc.b)
+    cycles = {}
+    for smoother in ("red_black", "line_x", "line_y", "adi"):
+        mg = Counting(mc.get_multigrid(smoother=smoother))
+        x = Solvers(mc.A, mc.b, tol=1e-10, max_iter=100).multigrid(mg)
+        assert np.allclose(x, x_exact, atol=1e-7), f"Multigrid with {smoother} did not converge"
+        cycles[smoother] = mg.calls
+    assert cycles["line_y"] < cycles["red_black"] / 3 and cycles["adi"] < cycles["red_black"] / 3, \
+        f"Line smoothers did not help: {cycles}"
+
+    # the adjoint post-smoothing keeps the cycle symmetric for CG
+    sym = build("input_files_examples/terminal_i1.txt", 40, 24)
+    S, c = sym.symmetric_system()
+    mg = sym.get_multigrid(symmetric=True, smoother="adi")
+    rng = np.random.default_rng(5)
+    r1, r2 = rng.random(S.shape[0]), rng.random(S.shape[0])
+    assert np.isclose(np.dot(mg.apply(r1), r2), np.dot(r1, mg.apply(r2)), rtol=1e-10), \
+        "ADI-smoothed V-cycle is not symmetric"
+
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/test_2.txt")
+    model.create_mesh(10, 60)
+    model.create_matrix()
+    x_exact = spsolve(model.matrix_constructor.A.tocsc(), model.matrix_constructor.b)
+    for options in ({"method": "adi", "omega": 1.0},
+                    {"method": "line_sor", "direction": "y", "omega": 1.0},
+                    {"method": "cg", "preconditioner": "multigrid", "smoother": "adi"}):
+        x = model.solve(**options)
+        assert np.allclose(x, x_exact, rtol=1e-5), f"Model solve with {options} differs"
+
+    try:
+        mc.get_multigrid(smoother="jacobi")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Expected ValueError for an unknown smoother")
+
+    print(f"Multigrid cycles per smoother: {cycles}")
+
+
+if __name__ == "__main__":
+    test_batched_thomas()
+    test_line_relaxation_on_stretched_cells()
+    test_line_smoothers_in_multigrid()
@@ -0,0 +1,147 @@
+import time
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Material import Material, MaterialTable
+from src.classes.Material_map import Material_map
+from src.classes.Matrix_constructor import Matrix_constructor
+from src.model import ProblemModel
+from src.test.helpers import build_mesh
+
+
+def pin_materials():
+    water = Material("Water", 0.21, 0.01, 0.0, 0.0, 0.0, (1.0, 1.0), (True, True, False, False))
+    fuel = Material("Fuel", 0.5, 0.08, 0.1, 0.05, 1.0, (1.0, 1.0), (True, True, False, False))
+    return [water, fuel]
+
+
+def lattice(pins, pitch, bound_type=(True, True, True, True)):
+    """
+    pins x pins square fuel pins of half the pitch, centred in water cells.
+    """
+    centres = (np.arange(pins) + 0.5) * pitch
+    cx, cy = (c.ravel() for c in np.meshgrid(centres, centres))
+    half = pitch / 4
+    regions = np.column_stack([cx - half, cx + half, cy - half, cy + half, np.ones(cx.size)])
+    return Material_map.from_regions(regions, pins * pitch, pins * pitch, bound_type)
+
+
+def test_uniform_map_matches_stacked_mesh():
+    material = Material("Water", 0.21, 0.01, 0.0, 0.0, 1.0, (10.0, 4.0), (True, False, True, False))
+    stacked = build_mesh([material], 17, 9)
+    layout = Material_map(np.zeros((3, 5), dtype=int), 10.0, 4.0, (True, False, True, False))
+    mapped = build_mesh([material], 17, 9, material_map=layout)
+
+    assert (stacked.dx, stacked.dy) == (mapped.dx, mapped.dy), "Cell sizes differ"
+    for name in ("Dcells", "Sigma_acells", "source_cells"):
+        assert np.allclose(getattr(stacked, name), getattr(mapped, name)), f"{name} differs"
+    assert mapped.bound_type == stacked.bound_type, "Boundary types differ"
+
+    print("A uniform material map reproduces the stacked mesh!")
+
+
+def test_volume_fractions_conserve_integrals():
+    materials = pin_materials()
+    # one off-centre pin, cut by the cell edges in both directions
+    layout = Material_map.from_regions([(0.33, 0.71, 0.12, 0.57, 1)], 1.0, 1.0,
+                                       (False, False, False, False))
+    mesh = build_mesh(materials, 13, 11, material_map=layout)
+
+    area = 0.38 * 0.45
+    expected = 0.08 * area + 0.01 * (1.0 - area)
+    total = mesh.Sigma_acells.sum() * mesh.dx * mesh.dy
+    assert np.isclose(total, expected), f"Absorption integral {total} differs from {expected}"
+    assert np.isclose(mesh.source_cells.sum() * mesh.dx * mesh.dy, area), "Source integral differs"
+    assert np.all((mesh.source_cells >= 0) & (mesh.source_cells <= 1)), "Fractions out of range"
+    cut = (mesh.source_cells > 0) & (mesh.source_cells < 1)
+    assert cut.any() and (mesh.source_cells == 1).any(), "Expected cut and covered cells"
+
+    # the pin sits in the bottom half, which is the bottom of the grid
+    assert mesh.source_cells[-3, 6] == 1.0 and mesh.source_cells[1, 6] == 0.0, \
+        "Pin was placed upside down"
+
+    print("Volume-fraction homogenisation conserves the reaction rates!")
+
+
+def test_cut_cell_takes_harmonic_diffusion_coefficient():
+    water = Material("Water", 0.21, 0.01, 0.0, 0.0, 0.0, (1.0, 1.0), (False, False, False, False))
+    absorber = Material("Absorber", 50.0, 5.0, 0.0, 0.0, 0.0, (1.0, 1.0), (False, False, False, False))
+    D = np.array([water.diffusion_coefficient(), absorber.diffusion_coefficient()])
+    # the middle of three cells is split half and half between the two materials
+    layout = Material_map([[0, 1]], 1.0, 1.0, (False, False, False, False))
+    mesh = build_mesh([water, absorber], 3, 1, material_map=layout)
+
+    harmonic = 1.0 / (0.5 / D[0] + 0.5 / D[1])
+    assert np.allclose(mesh.Dcells[0], [D[0], harmonic, D[1]]), f"Cell D {mesh.Dcells[0]}, expected {harmonic}"
+    assert mesh.Dcells[0, 1] < 2.0 * D[1] < D.mean(), "The cut cell took the arithmetic average of D"
+    assert np.isclose(mesh.Sigma_acells[0, 1], 0.5 * (0.01 + 5.0)), "Sigma_a should stay volume-averaged"
+
+    print("A cut cell takes the harmonic average of D!")
+
+
+def test_regions_match_pixel_grid():
+    materials = pin_materials()
+    pixels = np.zeros((8, 8), dtype=int)
+    pixels[1:3, 5:7] = 1            # top right in the grid layout
+    from_pixels = Material_map(pixels, 8.0, 8.0, (True, True, True, True))
+    from_regions = Material_map.from_regions([(5, 7, 5, 7, 1)], 8.0, 8.0, (True, True, True, True))
+
+    a = build_mesh(materials, 20, 12, material_map=from_pixels)
+    b = build_mesh(materials, 20, 12, material_map=from_regions)
+    for name in ("Dcells", "Sigma_acells", "source_cells"):
+        assert np.allclose(getattr(a, name), getattr(b, name)), f"{name} differs"
+
+    # later regions are drawn on top
+    layout = Material_map.from_regions([(0, 8, 0, 8, 1), (2, 4, 2, 4, 0)], 8.0, 8.0,
+                                       (True, True, True, True))
+    assert np.array_equal(layout.index, [[1, 1, 1], [1, 0, 1], [1, 1, 1]]), \
+        "Overlapping regions were not painted in order"
+
+    for bad in ([(3, 2, 0, 1, 1)], [(0, 9, 0, 1, 1)]):
+        try:
+            Material_map.from_regions(bad, 8.0, 8.0, (True, True, True, True))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Expected ValueError for region {bad}")
+
+    print("Region lists and pixel grids give the same mesh!")
+
+
+def test_lattice_solves():
+    materials = pin_materials()
+    table = MaterialTable.from_materials(materials)
+
+    start = time.perf_counter()
+    layout = lattice(100, 1.26)
+    mesh = build_mesh(table, 400, 400, material_map=layout)
+    elapsed = time.perf_counter() - start
+    assert elapsed < 2.0, f"Building a 10000-pin lattice took {elapsed:.2f} s"
+    assert layout.index.sum() == 10000, "Every pin should be in the map"
+
+    # small lattice through the model, vacuum on every side
+    model = ProblemModel()
+    model.materials = materials
+    model.create_mesh(40, 40, material_map=lattice(5, 1.26))
+    mc = Matrix_constructor(
+        model.mesh.ncells_x, model.mesh.ncells_y,
+        model.mesh.Dcells, model.mesh.Sigma_acells, model.mesh.source_cells,
+        model.mesh.dx, model.mesh.dy, materials, model.mesh.interfaces_x,
+        matrix_format="sparse", bound_type=model.mesh.bound_type
+    )
+    assert mc.vacuum_mask().sum() == 4 * 40 - 4, "The map boundary types were not used"
+    model.matrix_constructor = mc
+    x = model.solve(method="multigrid", max_iter=100)
+    assert np.allclose(x, spsolve(mc.A.tocsc(), mc.b), atol=1e-6), "Lattice solve differs"
+    phi = x.reshape(40, 40)
+    assert np.allclose(phi, phi[::-1, :]) and np.allclose(phi, phi[:, ::-1]), \
+        "Flux of a symmetric lattice is not symmetric"
+
+    print(f"A 10000-pin lattice is rasterised in {elapsed * 1e3:.1f} ms and solved!")
+
+
+if __name__ == "__main__":
+    test_uniform_map_matches_stacked_mesh()
+    test_volume_fractions_conserve_integrals()
+    test_cut_cell_takes_harmonic_diffusion_coefficient()
+    test_regions_match_pixel_grid()
+    test_lattice_solves()
@@ -0,0 +1,96 @@
+import numpy as np
+from src.classes.Material import Material, MaterialTable
+from src.classes.Mesh_constructor import Mesh_constructor
+from src.test.helpers import read_materials, build_system
+
+
+def test_table_matches_materials():
+    materials = read_materials("input_files_examples/terminal_i2.txt")
+    expected = [(m.get_name(), m.get_sigma_a(), m.get_s(), m.get_bounds(), m.get_bound_type(),
+                 m.diffusion_coefficient()) for m in materials]
+    table = MaterialTable.from_materials(materials)
+
+    assert len(table) == len(materials), "Table has the wrong number of materials"
+    assert np.allclose(table.diffusion_coefficient(), [e[5] for e in expected]), \
+        "Diffusion coefficients differ"
+    for k, material in enumerate(table):
+        name, sigma_a, s, bounds, bound_type, D = expected[k]
+        assert material.get_name() == name, f"Name differs for material {k}"
+        assert material.get_sigma_a() == sigma_a and material.get_s() == s, \
+            f"Cross sections differ for material {k}"
+        assert material.get_bounds() == bounds and material.get_bound_type() == bound_type, \
+            f"Geometry differs for material {k}"
+    assert MaterialTable.from_materials(table) is table, "A table should be used as is"
+
+    print("MaterialTable holds the same data as the materials!")
+
+
+def test_materials_are_views():
+    material = Material("fuel", 1.0, 0.1, 0.2, 0.0, 1.0, (2.0, 3.0), (True, False, False, False))
+    other = Material("water", 2.0, 0.05, 0.1, 0.0, 0.0, (1.0, 3.0), (False, True, False, False))
+    table = MaterialTable.from_materials([material, other])
+    first, last = table[0], table[-1]
+
+    first.set_sigma_a(0.3)
+    first.compute_sigma_tr()
+    assert table.sigma_a[0] == 0.3, "Setter did not write through to the table"
+    assert np.isclose(table.diffusion_coefficient()[0], first.diffusion_coefficient()), \
+        "Table and view disagree after an update"
+
+    table.s[1] = 5.0
+    assert last.get_s() == 5.0 and list(table)[1].get_s() == 5.0, "View does not read the table"
+
+    # the materials the table was built from keep their own data
+    assert material.get_sigma_a() == 0.1 and other.get_s() == 0.0, "Building the table changed its inputs"
+    material.set_s(2.0)
+    second = MaterialTable.from_materials([material, other])
+    assert table.s[0] == 1.0 and second.s[0] == 2.0, "Tables are tied to the input materials"
+
+    print("Materials are views on the table rows!")
+
+
+def test_mesh_from_table_matches_list():
+    for file_path in ("input_files_examples/test_2.txt", "input_files_examples/terminal_i2.txt"):
+        mesh_list, matrix_list = build_system(read_materials(file_path), 23, 11)
+        table = MaterialTable.from_materials(read_materials(file_path))
+        mesh_table, matrix_table = build_system(table, 23, 11)
+
+        for name in ("Dcells", "Sigma_acells", "source_cells"):
+            assert np.array_equal(getattr(mesh_list, name), getattr(mesh_table, name)), \
+                f"{name} differs when built from a table for {file_path}"
+        assert mesh_list.interfaces_x == mesh_table.interfaces_x, "Interfaces differ"
+        assert (mesh_list.dx, mesh_list.dy) == (mesh_table.dx, mesh_table.dy), "Cell sizes differ"
+        assert (matrix_list.A != matrix_table.A).nnz == 0, f"Matrices differ for {file_path}"
+
+    print("A mesh built from a MaterialTable matches one built from a list!")
+
+
+def test_many_materials():
+    rng = np.random.default_rng(4)
+    K = 500
+    bound_type = np.zeros((K, 4), dtype=bool)
+    bound_type[0, 0] = bound_type[-1, 1] = True
+    table = MaterialTable([f"m{k}" for k in range(K)], rng.uniform(0.5, 2.0, K),
+                          rng.uniform(0.01, 0.2, K), rng.uniform(0.0, 0.3, K), np.zeros(K),
+                          rng.uniform(0.0, 1.0, K), np.column_stack([rng.uniform(0.5, 1.5, K),
+                                                                     np.full(K, 10.0)]),
+                          bound_type)
+    mesh = Mesh_constructor(2000, 40, table)
+    mesh.compute_extrapolated_boundaries_y()
+    mesh.compute_extrapolated_boundaries_x()
+    mesh.create_material_matrices()
+
+    assert sum(mesh.cells_per_material) == 2000, "Cells per material do not fill the mesh"
+    j = mesh.cells_per_material[0] // 2
+    assert mesh.Dcells[0, j] == table.diffusion_coefficient()[0], "First material misplaced"
+    assert np.isclose(mesh.extrapolated_distances_left, 0.7104 / table.sigma_tr[0]), \
+        "Left extrapolated distance is wrong"
+
+    print("Meshes with hundreds of materials are built from the table!")
+
+
+if __name__ == "__main__":
+    test_table_matches_materials()
+    test_materials_are_views()
+    test_mesh_from_table_matches_list()
+    test_many_materials()
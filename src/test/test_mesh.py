@@ -1,6 +1,30 @@
 import numpy as np
 from src.classes.Mesh_constructor import Mesh_constructor
 from src.classes.Material import Material
+from src.model import ProblemModel
+from src.test.helpers import read_materials, build_mesh
+
+
+def loop_material_matrices(mesh):
+    """
+    Reference cell-by-cell fill and interface averaging.
+    """
+    m, n = mesh.ncells_y, mesh.ncells_x
+    fields = [np.zeros((m, n)) for _ in range(3)]
+    current_x = 0
+    for k, material in enumerate(mesh.materials):
+        end_x = current_x + mesh.cells_per_material[k]
+        values = (material.diffusion_coefficient(), material.get_sigma_a(), material.get_s())
+        for i in range(m):
+            for j in range(current_x, end_x):
+                for field, value in zip(fields, values):
+                    field[i, j] = value
+        current_x = end_x
+    for j_if in mesh.interfaces_x:
+        for i in range(m):
+            for field in fields:
+                field[i, j_if] = 0.5 * (field[i, j_if - 1] + field[i, j_if])
+    return fields
 
 def test_mesh_constructor_with_test_1():
     # Create materials based on test_1.txt
@@ -133,6 +157,46 @@ def test_mesh_constructor_with_reflecting_boundaries():
     print("Test for Mesh_constructor with reflecting boundaries passed!")
 
 
+def test_vectorized_rasterisation_matches_loop():
+    cases = []
+    for file_path in ("input_files_examples/test_1.txt", "input_files_examples/test_2.txt",
+                      "input_files_examples/terminal_i3.txt"):
+        cases.append((file_path, read_materials(file_path), 37))
+
+    # the middle material gets a single column: two adjacent interfaces
+    thin = [
+        Material("Water", 0.21, 0.01, 0.0, 0.0, 1.0, (10.0, 10.0), (1, 0, 0, 1)),
+        Material("Steel", 0.8, 0.3, 0.0, 0.0, 0.0, (0.5, 10.0), (1, 0, 0, 1)),
+        Material("Fuel", 0.5, 0.02, 0.1, 0.05, 2.0, (10.0, 10.0), (1, 0, 0, 1)),
+    ]
+    cases.append(("thin material", thin, 21))
+
+    for label, materials, ncells_x in cases:
+        mesh = build_mesh(materials, ncells_x, 9)
+        expected = loop_material_matrices(mesh)
+        for name, field, reference in zip(("D", "Sigma_a", "source"),
+                                          (mesh.Dcells, mesh.Sigma_acells, mesh.source_cells),
+                                          expected):
+            assert np.array_equal(field, reference), f"{name} differs from the loop fill for {label}"
+    assert mesh.interfaces_x == [10, 11], f"Expected adjacent interfaces, got {mesh.interfaces_x}"
+
+    print("Vectorized rasterisation matches the loop fill!")
+
+
+def test_mesh_build_time_is_exposed():
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/test_2.txt")
+    assert model.mesh_build_time is None, "Build time set before any mesh was built"
+    model.create_mesh(40, 20)
+    assert model.mesh.Dcells.shape == (20, 40), "Wrong mesh size"
+    assert model.mesh_build_time is not None and model.mesh_build_time > 0.0, \
+        f"Mesh build time is {model.mesh_build_time}"
+
+    print("The mesh build time is exposed!")
+
+
 if __name__ == "__main__":
     test_mesh_constructor_with_test_1()
-    test_mesh_constructor_with_reflecting_boundaries()
\ No newline at end of file
+    test_mesh_constructor_with_reflecting_boundaries()
+    test_vectorized_rasterisation_matches_loop()
+    test_mesh_build_time_is_exposed()
\ No newline at end of file
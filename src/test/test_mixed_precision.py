@@ -0,0 +1,97 @@
+import numpy as np
+from src.classes.Solvers import Solvers
+from src.model import ProblemModel
+from src.test.helpers import build
+
+
+def test_single_precision_copies():
+    mc = build("input_files_examples/terminal_i1.txt", 20, 16, "matrix_free")
+    A, b = mc.A, mc.b
+    single = A.astype(np.float32)
+    x = np.random.default_rng(9).random(b.shape[0])
+    assert single.dtype == np.float32 and A.dtype == np.float64, "astype changed the operator"
+    assert single.dot(x.astype(np.float32)).dtype == np.float32, "float32 operator computes in float64"
+    assert np.allclose(single.dot(x), A.dot(x), rtol=1e-5), "float32 operator differs"
+
+    multigrid = mc.get_multigrid()
+    coarse = multigrid.astype(np.float32)
+    assert coarse.dtype == np.float32 and multigrid.dtype == np.float64, "astype changed the multigrid"
+    assert coarse.apply(b).dtype == np.float32, "float32 V-cycle computes in float64"
+
+    solver = Solvers(A, b, tol=1e-5, dtype=np.float32)
+    assert solver.b.dtype == np.float32 and solver.A.dtype == np.float32, "Solvers did not cast the system"
+    x = solver.red_black_sor(omega=1.5)
+    assert x.converged and x.dtype == np.float32, "float32 red-black SOR did not converge"
+    # the line solves factor and solve the tridiagonal lines in float32 too
+    assert all(f.dtype == np.float32 for f in single.line_factors("x", 0)), "float32 line factors in float64"
+    for method in ("line_sor", "adi"):
+        x = getattr(Solvers(A, b, tol=1e-5, dtype=np.float32), method)()
+        assert x.converged and x.dtype == np.float32, f"float32 {method} did not converge"
+    # on its own a float32 solve stalls at its round-off
+    x = Solvers(A, b, tol=1e-10, max_iter=1000, dtype=np.float32).red_black_sor(omega=1.5)
+    assert not x.converged and x.residual() > 1e-8, f"float32 reached a residual of {x.residual():.2e}"
+
+    print("The operator, the multigrid and the solvers have float32 copies!")
+
+
+def test_refinement_reaches_double_precision():
+    mc = build("input_files_examples/terminal_i1.txt", 60, 60, "matrix_free")
+    A, b = mc.A, mc.b
+    sparse = build("input_files_examples/terminal_i1.txt", 60, 60)
+    S, c = sparse.symmetric_system()
+    for name, system, method, options in (
+            ("sor", (sparse.A, sparse.b), "sor", {"omega": 1.8}),
+            ("red_black_sor", (A, b), "red_black_sor", {"omega": 1.8}),
+            ("multigrid", (A, b), "multigrid", {"multigrid": mc.get_multigrid()}),
+            ("cg", (S, c), "cg", {"preconditioner": "ichol"})):
+        solver = Solvers(*system, tol=1e-12, max_iter=100000)
+        x = solver.mixed_precision(method, inner_tol=1e-5, **options)
+        M, v = system
+        true = np.linalg.norm(v - M @ x) / np.linalg.norm(v)
+        assert x.converged and x.method == f"mixed_{method}" and true < 1e-12, \
+            f"{name}: stopped on {x.reason} at a residual of {true:.2e}"
+        assert x.dtype == np.float64 and x.iterations == len(solver.inner_results) < 10, \
+            f"{name}: {x.iterations} refinements"
+        assert all(d.dtype == np.float32 for d in solver.inner_results), f"{name}: inner solve in float64"
+    multigrid = mc.get_multigrid()
+    Solvers(A, b).mixed_precision("multigrid", multigrid=multigrid)
+    assert multigrid.dtype == np.float64, "The given multigrid was cast"
+
+    # below the float64 round-off the refinement no longer gains anything
+    solver = Solvers(A, b, tol=1e-20)
+    x = solver.mixed_precision("multigrid", inner_tol=1e-5, multigrid=multigrid)
+    assert not x.converged and x.reason == "stagnated" and x.iterations < 30 and x.residual() < 1e-13, \
+        f"Refinement stopped on {x.reason} after {x.iterations} at {x.residual():.2e}"
+
+    print("Float32 iterations with float64 refinement reach double precision!")
+
+
+def test_mixed_precision_model_solve():
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/test_2.txt")
+    model.create_mesh(30, 20)
+    model.create_matrix()
+    double = model.solve(method="cholesky")
+    for options in ({"method": "sor", "omega": 1.7}, {"method": "red_black_sor", "omega": 1.7},
+                    {"method": "multigrid"}, {"method": "cg", "preconditioner": "multigrid"}):
+        x = model.solve(precision="mixed", tol=1e-11, **options)
+        error = np.abs(x - double).max() / np.abs(double).max()
+        assert x.converged and error < 1e-9, f"Mixed {options}: error {error:.2e}"
+
+    for options in ({"method": "sor", "precision": "half"},
+                    {"method": "adi", "precision": "mixed"},
+                    {"method": "jacobi", "acceleration": "chebyshev", "precision": "mixed"}):
+        try:
+            model.solve(**options)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Expected ValueError for {options}")
+
+    print("ProblemModel.solve runs mixed-precision solves!")
+
+
+if __name__ == "__main__":
+    test_single_precision_copies()
+    test_refinement_reaches_double_precision()
+    test_mixed_precision_model_solve()
@@ -0,0 +1,86 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Solvers import Solvers
+from src.test.helpers import build
+
+
+class Counting:
+    def __init__(self, M):
+        self.M = M
+        self.calls = 0
+
+    def apply(self, r):
+        self.calls += 1
+        return self.M.apply(r)
+
+
+def test_multigrid_cycles_converge():
+    # test_2: anisotropic cells, vacuum left/right and reflective top/bottom
+    for file_path in ("input_files_examples/test_2.txt",
+                      "input_files_examples/terminal_i1.txt",
+                      "input_files_examples/terminal_i2.txt"):
+        for ncells_x, ncells_y in ((30, 21), (17, 24)):
+            mc = build(file_path, ncells_x, ncells_y)
+            x_exact = spsolve(mc.A.tocsc(), mc.b)
+            for cycle in ("V", "W", "F"):
+                mg = mc.get_multigrid(cycle=cycle, coarsest_size=4)
+                assert len(mg.operators) > 2, "Expected a multilevel hierarchy"
+                x = Solvers(mc.A, mc.b, tol=1e-12, max_iter=100).multigrid(mg)
+                assert np.allclose(x, x_exact, atol=1e-9), \
+                    f"{cycle}-cycle did not converge for {file_path} ({ncells_x}x{ncells_y})"
+
+    print("Multigrid V, W and F cycles converge!")
+
+
+def test_multigrid_rate_independent_of_mesh():
+    for file_path in ("input_files_examples/test_2.txt", "input_files_examples/terminal_i2.txt"):
+        counts = []
+        for ncells in (32, 128):
+            mc = build(file_path, ncells, ncells, "matrix_free")
+            mg = Counting(mc.get_multigrid())
+            Solvers(mc.A, mc.b, tol=1e-10, max_iter=100).multigrid(mg)
+            counts.append(mg.calls)
+        assert counts[1] <= counts[0] + 3 and counts[1] < 30, \
+            f"Multigrid iterations grow with the mesh for {file_path}: {counts}"
+
+    print("Multigrid convergence does not degrade with refinement!")
+
+
+def test_multigrid_preconditioned_cg():
+    mc = build("input_files_examples/test_2.txt", 60, 60)
+    S, c = mc.symmetric_system()
+    mg = mc.get_multigrid(symmetric=True)
+
+    # a symmetric cycle keeps the preconditioned system symmetric
+    rng = np.random.default_rng(2)
+    r1, r2 = rng.random(S.shape[0]), rng.random(S.shape[0])
+    assert np.isclose(np.dot(mg.apply(r1), r2), np.dot(r1, mg.apply(r2)), rtol=1e-10), \
+        "V-cycle preconditioner is not symmetric"
+
+    x_exact = spsolve(S.tocsc(), c)
+    counts = {}
+    for name, M in (("multigrid", mg), ("ichol", Solvers(S, c).get_preconditioner("ichol"))):
+        counting = Counting(M)
+        x = Solvers(S, c, tol=1e-10, max_iter=2000).cg(preconditioner=counting)
+        assert np.allclose(x, x_exact, atol=1e-8), f"CG with {name} did not converge"
+        counts[name] = counting.calls
+    assert counts["multigrid"] < counts["ichol"], f"Multigrid did not beat IC(0): {counts}"
+
+    print("Multigrid preconditioned CG converges in fewer iterations than IC(0)!")
+
+
+def test_single_level_is_direct_solve():
+    mc = build("input_files_examples/terminal_i1.txt", 6, 5)
+    mg = mc.get_multigrid()
+    assert len(mg.operators) == 1, "Small grids should not be coarsened"
+    assert np.allclose(mg.apply(mc.b), spsolve(mc.A.tocsc(), mc.b)), \
+        "Single-level multigrid is not a direct solve"
+
+    print("Single-level multigrid solves directly!")
+
+
+if __name__ == "__main__":
+    test_multigrid_cycles_converge()
+    test_multigrid_rate_independent_of_mesh()
+    test_multigrid_preconditioned_cg()
+    test_single_level_is_direct_solve()
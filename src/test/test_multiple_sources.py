@@ -0,0 +1,112 @@
+import numpy as np
+from src.classes.Solvers import Solvers
+from src.classes.Preconditioners import Jacobi_preconditioner, Incomplete_cholesky_preconditioner
+from src.model import ProblemModel
+from src.test.helpers import build
+
+
+def source_model(ncells_x=30, ncells_y=20):
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/test_2.txt")
+    model.create_mesh(ncells_x, ncells_y)
+    model.create_matrix()
+    return model
+
+
+def test_block_kernels():
+    mc = build("input_files_examples/terminal_i1.txt", 14, 11, "matrix_free")
+    A = mc.A
+    S, _ = mc.symmetric_system()
+    X = np.random.default_rng(10).random((A.shape[0], 5))
+    out = np.empty_like(X)
+    columns = np.column_stack([A.dot(x) for x in X.T])
+    assert A.dot(X, out=out) is out and np.allclose(out, columns), "Block product differs"
+    assert np.allclose(A.dot(X), columns), "Allocating block product differs"
+
+    csr = A.tocsr()
+    for M in (csr, csr.toarray()):
+        assert np.allclose(Solvers(M, X).product()(X, out), columns), f"{type(M).__name__} block product differs"
+
+    for M in (Jacobi_preconditioner(S), Incomplete_cholesky_preconditioner(S),
+              Incomplete_cholesky_preconditioner(S.tocsr()), mc.get_multigrid(symmetric=True)):
+        Z = M.apply(X)
+        assert Z.shape == X.shape and np.allclose(Z, np.column_stack([M.apply(x) for x in X.T])), \
+            f"{type(M).__name__} differs on a block"
+
+    print("The products and preconditioners work on blocks of vectors!")
+
+
+def test_block_cg_matches_single_solves():
+    for matrix_format, preconditioner in (("sparse", "ichol"), ("matrix_free", "jacobi"),
+                                          ("matrix_free", "multigrid")):
+        mc = build("input_files_examples/terminal_i1.txt", 40, 30, matrix_format)
+        S, c = mc.symmetric_system()
+        C = c[:, np.newaxis] * np.random.default_rng(11).random((c.shape[0], 6))
+        # an empty source has the zero solution, and must not spoil the others
+        C[:, 2] = 0.0
+        M = mc.get_multigrid(symmetric=True) if preconditioner == "multigrid" else preconditioner
+        X = Solvers(S, C, tol=1e-10, max_iter=2000).block_cg(preconditioner=M)
+        assert X.converged and X.shape == C.shape and X.method.startswith("block_cg"), \
+            f"{matrix_format} {preconditioner}: stopped on {X.reason}"
+        assert np.all(X[:, 2] == 0.0), "The empty source got a flux"
+        for j in (0, 1, 3, 4, 5):
+            x = Solvers(S, C[:, j], tol=1e-10, max_iter=2000).cg(preconditioner=M)
+            residual = np.linalg.norm(C[:, j] - S @ X[:, j]) / np.linalg.norm(C[:, j])
+            assert residual < 1e-9 and np.allclose(X[:, j], x, rtol=1e-7), \
+                f"{matrix_format} {preconditioner}: column {j} at a residual of {residual:.2e}"
+            # the block runs until its worst column is done
+            assert X.iterations >= x.iterations, f"Column {j} needed more iterations alone"
+
+    print("Block CG solves every column like its own CG!")
+
+
+def test_model_solves_many_sources():
+    model = source_model()
+    mesh = model.mesh
+    assert np.array_equal(mesh.source_map(mesh.table.s), mesh.source_cells), "Source map differs"
+
+    count = len(model.materials)
+    sources = np.random.default_rng(12).random((5, count))
+    sources[0] = mesh.table.s
+    B = model.source_block(sources)
+    assert B.shape == (model.matrix_constructor.b.shape[0], 5), f"Block of shape {B.shape}"
+    assert np.allclose(B[:, 0], model.matrix_constructor.b), "First configuration is not the model's source"
+
+    direct = model.solve_sources(sources=sources)
+    assert direct is model.solve_result and direct.method == "cholesky" and direct.converged, \
+        "The factorization solve has no result record"
+    assert direct.iterations == 0 and direct.residual() < 1e-10 and direct.setup_time >= 0, \
+        f"Factorization record: {direct.info()}"
+    x = model.solve(method="cholesky")
+    assert direct.shape == B.shape and np.allclose(direct[:, 0], x), "Batched solve differs from solve"
+    # the problem is linear in the source
+    single = model.solve_sources(sources=[sources[3]])
+    assert np.allclose(single[:, 0], direct[:, 3]), "Single configuration differs from the batch"
+
+    for options in ({"preconditioner": "ichol"}, {"preconditioner": "multigrid"},
+                    {"preconditioner": "jacobi", "ordering": "nested_dissection"}):
+        X = model.solve_sources(sources=sources, method="cg", tol=1e-11, max_iter=5000, **options)
+        assert X is model.solve_result and X.converged, f"{options}: stopped on {X.reason}"
+        error = np.abs(X - direct).max() / np.abs(direct).max()
+        assert error < 1e-8, f"Block CG with {options}: error {error:.2e}"
+
+    # maps on the cells give the same block
+    maps = np.stack([mesh.source_map(s) for s in sources])
+    assert np.allclose(model.source_block(maps), B), "Source maps give another block"
+
+    for options in ({}, {"b": B, "sources": sources}, {"sources": sources, "method": "sor"},
+                    {"sources": sources[:, :-1]}, {"sources": maps[:, :-1]}):
+        try:
+            model.solve_sources(**options)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Expected ValueError for {list(options)}")
+
+    print("ProblemModel solves many source configurations at once!")
+
+
+if __name__ == "__main__":
+    test_block_kernels()
+    test_block_cg_matches_single_solves()
+    test_model_solves_many_sources()
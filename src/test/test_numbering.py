@@ -0,0 +1,102 @@
+import numpy as np
+from scipy.sparse.linalg import splu, spsolve
+from src.classes.Numbering import Numbering
+from src.classes.Plotter import Plotter
+from src.classes.Solvers import Solvers
+from src.model import ProblemModel
+from src.test.helpers import build
+
+
+def test_row_numbering_is_legacy_index():
+    m, n = 5, 7
+    numbering = Numbering(n, m)
+    for i in range(m):
+        for j in range(n):
+            assert numbering.global_index(i, j) == n * (m - (i + 1)) + j, f"Wrong index for ({i}, {j})"
+
+    vector = np.arange(m * n, dtype=float)
+    expected = np.array([vector[i * n:(i + 1) * n] for i in range(m)])
+    assert np.array_equal(Plotter().vector_to_matrix(vector, m, n), expected), \
+        "vector_to_matrix changed for the row ordering"
+
+    print("Row numbering reproduces the legacy global index!")
+
+
+def test_orderings_are_permutations():
+    m, n = 9, 23
+    x = np.random.default_rng(4).random(m * n)
+    for ordering in Numbering.ORDERINGS:
+        numbering = Numbering(n, m, ordering)
+        assert np.array_equal(np.sort(numbering.perm), np.arange(m * n)), f"{ordering} is not a permutation"
+        assert np.array_equal(numbering.unpermute(numbering.permute(x)), x), f"{ordering} round trip failed"
+        # grid view is independent of the ordering
+        assert np.array_equal(numbering.to_grid(numbering.permute(x)), Numbering(n, m).to_grid(x)), \
+            f"{ordering} maps cells to the wrong grid position"
+        assert np.array_equal(numbering.to_vector(numbering.to_grid(x)), x), f"{ordering} to_vector failed"
+
+    print("Every ordering is a consistent permutation!")
+
+
+def test_permuted_solves_match():
+    mc = build("input_files_examples/terminal_i1.txt", 30, 8)
+    x_exact = spsolve(mc.A.tocsc(), mc.b)
+    S, c = mc.symmetric_system()
+    for ordering in Numbering.ORDERINGS:
+        numbering = Numbering(30, 8, ordering)
+        A_p, b_p = numbering.permute_system(mc.A, mc.b)
+        x = Solvers(A_p, b_p, tol=1e-13, max_iter=5000).sor(omega=1.5, tol=1e-13)
+        assert np.allclose(numbering.unpermute(x), x_exact, atol=1e-8), f"SOR with {ordering} ordering differs"
+
+        S_p, c_p = numbering.permute_system(S, c)
+        x = Solvers(S_p, c_p, tol=1e-12).cg(preconditioner="ichol")
+        assert np.allclose(numbering.unpermute(x), x_exact, atol=1e-8), f"CG with {ordering} ordering differs"
+
+    print("Solves in every ordering map back to the same solution!")
+
+
+def test_orderings_shrink_band_and_fill():
+    # wide and short: the row ordering has bandwidth ncells_x
+    mc = build("input_files_examples/terminal_i1.txt", 80, 12)
+    S, _ = mc.symmetric_system()
+
+    assert Numbering(80, 12).bandwidth() == 80, "Row bandwidth should be ncells_x"
+    assert Numbering(80, 12, "auto").bandwidth() == 12, "auto should pick the shorter axis"
+    assert Numbering(80, 12, "rcm").bandwidth() <= 13, "RCM should give a narrow band"
+    for ordering in ("auto", "rcm"):
+        chol = mc.get_cholesky(ordering)
+        assert chol.bandwidth == Numbering(80, 12, ordering).bandwidth(), "Factor bandwidth mismatch"
+        assert np.allclose(chol.solve(mc.b), spsolve(mc.A.tocsc(), mc.b)), f"Cholesky with {ordering} differs"
+
+    fill = {}
+    for ordering in ("row", "nested_dissection"):
+        S_p = Numbering(80, 12, ordering).permute_matrix(S).tocsc()
+        lu = splu(S_p, permc_spec="NATURAL")
+        fill[ordering] = lu.L.nnz + lu.U.nnz
+    assert fill["nested_dissection"] < fill["row"], f"Nested dissection did not reduce fill: {fill}"
+    chol = mc.get_cholesky("nested_dissection")
+    assert np.allclose(chol.solve(mc.b), spsolve(mc.A.tocsc(), mc.b)), "Cholesky with nested_dissection differs"
+    assert chol.lu.L.nnz < mc.get_cholesky("auto").factor.size, "Sparse factor is not smaller than the band"
+
+    print("Alternative orderings shrink the band and the fill!")
+
+
+def test_model_solves_with_ordering():
+    model = ProblemModel()
+    model.matrix_constructor = build("input_files_examples/test_2.txt", 24, 9)
+    x_row = model.solve(method="cg", preconditioner="ssor")
+    for ordering in ("column", "rcm", "nested_dissection"):
+        x = model.solve(method="cg", preconditioner="ssor", ordering=ordering)
+        assert np.allclose(x, x_row, atol=1e-8), f"Model CG with {ordering} differs"
+        x = model.solve(method="cholesky", ordering=ordering)
+        assert model.factorization.numbering.ordering == ordering, "Factorization ordering not updated"
+        assert np.allclose(x, x_row, atol=1e-8), f"Model Cholesky with {ordering} differs"
+
+    print("The model solves in any ordering!")
+
+
+if __name__ == "__main__":
+    test_row_numbering_is_legacy_index()
+    test_orderings_are_permutations()
+    test_permuted_solves_match()
+    test_orderings_shrink_band_and_fill()
+    test_model_solves_with_ordering()
@@ -0,0 +1,101 @@
+import numpy as np
+from scipy.sparse.linalg import spsolve
+from src.classes.Solvers import Solvers
+from src.classes.Solve_result import Solve_result
+from src.model import ProblemModel
+from src.test.helpers import build
+
+
+def test_result_of_every_solver():
+    mc = build("input_files_examples/terminal_i1.txt", 20, 16, "matrix_free")
+    A, b = mc.A, mc.b
+    sparse = build("input_files_examples/terminal_i1.txt", 20, 16)
+    S, c = sparse.symmetric_system()
+    for name, solve in (("jacobi", lambda: Solvers(A, b, tol=1e-8, max_iter=5000).jacobi()),
+                        ("gauss_seidel", lambda: Solvers(A, b, tol=1e-8).gauss_seidel()),
+                        ("sor", lambda: Solvers(sparse.A, sparse.b, tol=1e-8).sor(omega="auto")),
+                        ("red_black_sor", lambda: Solvers(A, b, tol=1e-8).red_black_sor()),
+                        ("line_sor", lambda: Solvers(A, b, tol=1e-8).line_sor()),
+                        ("adi", lambda: Solvers(A, b, tol=1e-8).adi()),
+                        ("anderson_jacobi", lambda: Solvers(A, b, tol=1e-8).accelerated("jacobi", "anderson")),
+                        ("multigrid", lambda: Solvers(A, b, tol=1e-8).multigrid(mc.get_multigrid())),
+                        ("cg_ichol", lambda: Solvers(S, c, tol=1e-8).cg(preconditioner="ichol")),
+                        ("cholesky", lambda: Solvers(S, c).cholesky())):
+        x = solve()
+        assert isinstance(x, Solve_result) and x.method == name, f"{name}: no result record"
+        assert x.converged and x.reason == ("direct" if name == "cholesky" else "tolerance"), \
+            f"{name} stopped on {x.reason}"
+        assert x.residual() < 1e-5, f"{name}: final residual {x.residual():.2e}"
+        assert x.setup_time >= 0 and x.iteration_time >= 0, f"{name}: negative times"
+        if name not in ("cg_ichol", "cholesky"):
+            assert len(x.changes) == x.iterations and x.changes[-1] < 1e-6, \
+                f"{name}: {len(x.changes)} changes for {x.iterations} iterations"
+
+    print("Every solver returns its Solve_result!")
+
+
+def test_history_and_stopping_reason():
+    mc = build("input_files_examples/terminal_i1.txt", 30, 30)
+    A, b = mc.A, mc.b
+    x = Solvers(A, b, tol=1e-14, max_iter=45, residual_interval=10).jacobi()
+    assert not x.converged and x.reason == "max_iter" and x.iterations == 45, \
+        f"Expected max_iter after 45 iterations, got {x.reason} after {x.iterations}"
+    # Jacobi gets the residual of its input from the sweep, one iterate behind
+    assert [k for k, _ in x.residuals] == [9, 19, 29, 39, 45], f"Residual cadence {x.residuals}"
+    residuals = [r for _, r in x.residuals]
+    assert all(r1 < r0 for r0, r1 in zip(residuals, residuals[1:])), "Jacobi residuals do not decrease"
+    assert np.isclose(x.residual(), np.linalg.norm(b - A.dot(x)) / np.linalg.norm(b)), \
+        "Recorded residual is not the one of the solution"
+
+    # residual_interval=0 keeps only the final residual
+    x = Solvers(A, b, tol=1e-14, max_iter=45, residual_interval=0).jacobi()
+    assert len(x.residuals) == 1 and x.residuals[0][0] == 45, f"Residuals {x.residuals}"
+
+    # CG records its recursive residual every iteration, for free
+    S, c = mc.symmetric_system()
+    x = Solvers(S, c, tol=1e-8).cg(preconditioner="jacobi")
+    assert len(x.changes) == x.iterations and x.residuals[0][0] == 1 and x.residuals[-1][1] < 1e-8, \
+        f"CG history: {x.iterations} iterations, {len(x.residuals)} residuals"
+
+    # a divergent iteration stops at the first non-finite iterate
+    with np.errstate(over="ignore", invalid="ignore"):
+        x = Solvers(-A, b, tol=1e-10, max_iter=100000).sor(omega=2.5)
+    assert x.reason == "diverged" and not x.converged and x.iterations < 100000, \
+        f"Divergent SOR stopped on {x.reason} after {x.iterations}"
+
+    print("The result records why and when the solve stopped!")
+
+
+def test_model_surfaces_the_result():
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/test_2.txt")
+    model.create_mesh(30, 20)
+    model.create_matrix()
+    x_exact = spsolve(model.matrix_constructor.A.tocsc(), model.matrix_constructor.b)
+    x_exact = model.matrix_constructor.scatter(x_exact)
+    for options in ({"method": "sor"}, {"method": "cg", "preconditioner": "multigrid"},
+                    {"method": "red_black_sor", "omega": 1.0, "acceleration": "chebyshev"},
+                    {"method": "gauss_seidel", "ordering": "column", "max_iter": 5000},
+                    {"method": "cholesky"}):
+        x = model.solve(**options)
+        assert x is model.solve_result and x.converged, f"{options}: result not surfaced"
+        error = np.abs(x - x_exact).max() / np.abs(x_exact).max()
+        assert x.shape == x_exact.shape and error < 1e-4, \
+            f"{options}: solution on the grid differs"
+
+    # still an ndarray for the callers
+    info = model.solve_result.info()
+    assert info["method"] == "cholesky" and isinstance(np.asarray(x) * 2, np.ndarray)
+    assert Solve_result(x).method is None and x.with_solution(x[:3]).method == "cholesky"
+    # arrays derived from the solution do not pass for it
+    for derived in (x[:5], 2 * x, x - x_exact, x.reshape(-1, 1)):
+        assert all(value is None for value in derived.info().values()), \
+            f"A derived array carries the record {derived.info()}"
+
+    print("ProblemModel.solve surfaces the Solve_result!")
+
+
+if __name__ == "__main__":
+    test_result_of_every_solver()
+    test_history_and_stopping_reason()
+    test_model_surfaces_the_result()
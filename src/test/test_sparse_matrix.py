@@ -0,0 +1,46 @@
+import numpy as np
+import scipy.sparse as sp
+from src.classes.Solvers import Solvers
+from src.test.helpers import read_materials, build_mesh, build_matrix
+
+
+def test_sparse_matches_dense():
+    for file_path in ("input_files_examples/test_1.txt",
+                      "input_files_examples/test_2.txt",
+                      "input_files_examples/terminal_i1.txt"):
+        materials = read_materials(file_path)
+        mesh = build_mesh(materials, 12, 9)
+        dense = build_matrix(mesh, materials, "dense")
+        sparse = build_matrix(mesh, materials, "sparse")
+
+        assert sp.issparse(sparse.A), "Expected a scipy.sparse matrix"
+        assert sparse.A.nnz <= 5 * mesh.N, f"Expected at most 5 entries per row, got {sparse.A.nnz}"
+        assert np.allclose(sparse.A.toarray(), dense.A), f"Sparse and dense A differ for {file_path}"
+        assert np.allclose(sparse.b, dense.b), f"Sparse and dense b differ for {file_path}"
+
+    print("Sparse assembly matches dense assembly!")
+
+
+def test_sparse_solvers_match_dense():
+    materials = read_materials("input_files_examples/terminal_i1.txt")
+    mesh = build_mesh(materials, 12, 9)
+    dense = build_matrix(mesh, materials, "dense")
+    sparse = build_matrix(mesh, materials, "sparse")
+
+    x_exact = np.linalg.solve(dense.A, dense.b)
+
+    for method in ("jacobi", "gauss_seidel", "sor"):
+        s_dense = Solvers(dense.A, dense.b, tol=1e-12, max_iter=5000)
+        s_sparse = Solvers(sparse.A, sparse.b, tol=1e-12, max_iter=5000)
+        x_dense = getattr(s_dense, method)(tol=1e-12)
+        x_sparse = getattr(s_sparse, method)(tol=1e-12)
+
+        assert np.allclose(x_sparse, x_dense), f"{method}: sparse and dense iterates differ"
+        assert np.allclose(x_sparse, x_exact, atol=1e-8), f"{method}: sparse solution not converged"
+
+    print("Sparse solvers match dense solvers!")
+
+
+if __name__ == "__main__":
+    test_sparse_matches_dense()
+    test_sparse_solvers_match_dense()
@@ -0,0 +1,90 @@
+import numpy as np
+from src.classes.Solvers import Solvers
+from src.model import ProblemModel
+from src.test.helpers import build
+
+
+def count_products(operator):
+    """
+    Count the products with the operator, calls[0] after a solve.
+    """
+    calls = [0]
+    dot = operator.dot
+
+    def counting(x, out=None):
+        calls[0] += 1
+        return dot(x, out=out)
+    operator.dot = counting
+    return calls
+
+
+def test_residual_criterion_is_accurate():
+    mc = build("input_files_examples/terminal_i1.txt", 80, 80)
+    A, b = mc.A, mc.b
+    for method in ("jacobi", "gauss_seidel"):
+        change = getattr(Solvers(A, b, tol=1e-6, max_iter=10000), method)()
+        residual = getattr(Solvers(A, b, tol=1e-6, max_iter=10000, criterion="residual"), method)()
+        # a small change only says the iteration is slow, not that x is accurate
+        assert change.converged and change.residual() > 3e-6, \
+            f"{method}: the change criterion gave a residual of {change.residual():.2e}"
+        assert residual.converged and residual.residual() < 1e-6 and residual.iterations > change.iterations, \
+            f"{method}: residual criterion reached {residual.residual():.2e} in {residual.iterations}"
+        true = np.linalg.norm(b - A @ residual) / np.linalg.norm(b)
+        assert np.isclose(true, residual.residual()), f"{method}: recorded residual is not the true one"
+
+    x = Solvers(A, b, tol=1e-4, criterion="absolute").sor(tol=1e-4)
+    assert np.linalg.norm(b - A @ x) < 1e-4 and x.criterion == "absolute", "Absolute residual not met"
+
+    S, c = mc.symmetric_system()
+    for criterion in ("residual", "absolute", "change"):
+        x = Solvers(S, c, tol=1e-8, criterion=criterion).cg(preconditioner="ichol")
+        assert x.converged and x.criterion == criterion, f"CG with {criterion} did not converge"
+
+    print("The residual criteria guarantee the accuracy!")
+
+
+def test_check_interval_and_free_residuals():
+    mc = build("input_files_examples/terminal_i1.txt", 40, 40, "matrix_free")
+    A, b = mc.A, mc.b
+
+    # Jacobi and multigrid get the residual from the sweep: no product with A at all
+    calls = count_products(A)
+    x = Solvers(A, b, tol=1e-6, max_iter=10000, criterion="residual").jacobi()
+    assert x.residual() < 1e-6 and calls[0] == 0, f"Jacobi residual test used {calls[0]} products"
+    assert np.isclose(np.linalg.norm(b - A.tocsr() @ x) / np.linalg.norm(b), x.residual()), \
+        "Jacobi returned another iterate than the one tested"
+    x = Solvers(A, b, tol=1e-8, criterion="residual").multigrid(mc.get_multigrid())
+    assert x.residual() < 1e-8, "Multigrid residual criterion not met"
+
+    # the other sweeps pay one product per test, done every check_interval iterations
+    calls[0] = 0
+    x = Solvers(A, b, tol=1e-6, max_iter=10000, criterion="residual", check_interval=5,
+                residual_interval=0).gauss_seidel()
+    assert x.iterations % 5 == 0 and calls[0] == x.iterations // 5, \
+        f"{calls[0]} products for {x.iterations} iterations"
+    x = Solvers(A, b, tol=1e-8, check_interval=4).red_black_sor(omega=1.5)
+    assert x.converged and x.iterations % 4 == 0 and len(x.changes) == x.iterations // 4, \
+        f"{len(x.changes)} changes tested in {x.iterations} iterations"
+
+    for options in ({"criterion": "energy"}, {"check_interval": 0}):
+        try:
+            Solvers(A, b, **options)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"Expected ValueError for {options}")
+
+    model = ProblemModel()
+    model.create_materials_from_file("input_files_examples/test_2.txt")
+    model.create_mesh(30, 20)
+    model.create_matrix()
+    x = model.solve(method="sor", criterion="residual", tol=1e-9, check_interval=3)
+    assert x.converged and x.residual() < 1e-9 and x.iterations % 3 == 0, \
+        f"Model solve stopped at a residual of {x.residual():.2e}"
+
+    print("The stopping test runs every check_interval iterations, with free residuals!")
+
+
+if __name__ == "__main__":
+    test_residual_criterion_is_accurate()
+    test_check_interval_and_free_residuals()
@@ -0,0 +1,50 @@
+import numpy as np
+from src.classes.Material import Material
+from src.test.helpers import read_materials, build_mesh, build_matrix
+
+INPUT_FILES = [
+    "input_files_examples/test_1.txt",
+    "input_files_examples/test_2.txt",
+    "input_files_examples/terminal_i1.txt",
+    "input_files_examples/terminal_i2.txt",
+    "input_files_examples/terminal_i3.txt",
+]
+
+
+def check_identical(mesh, materials, label):
+    loop = build_matrix(mesh, materials, "dense", vectorized=False)
+    vec = build_matrix(mesh, materials, "dense", vectorized=True)
+    vec_sparse = build_matrix(mesh, materials, "sparse", vectorized=True)
+
+    assert np.array_equal(vec.A, loop.A), f"Vectorized A differs from loop A for {label}"
+    assert np.array_equal(vec.b, loop.b), f"Vectorized b differs from loop b for {label}"
+    assert np.array_equal(vec_sparse.A.toarray(), loop.A), f"Vectorized sparse A differs for {label}"
+    assert np.array_equal(vec_sparse.b, loop.b), f"Vectorized sparse b differs for {label}"
+
+
+def test_vectorized_matches_loop_on_examples():
+    for file_path in INPUT_FILES:
+        materials = read_materials(file_path)
+
+        for ncells_x, ncells_y in ((7, 5), (16, 11)):
+            mesh = build_mesh(materials, ncells_x, ncells_y)
+            check_identical(mesh, materials, f"{file_path} ({ncells_x}x{ncells_y})")
+
+    print("Vectorized assembly matches the loop assembly on all examples!")
+
+
+def test_vectorized_matches_loop_mixed_boundaries():
+    # Vacuum on the left and top, reflective on the right and bottom
+    material1 = Material("Water", 0.21, 0.01, 0.0, 0.0, 1.0, (10.0, 10.0), (1, 0, 0, 1))
+    material2 = Material("Fuel", 0.5, 0.02, 0.1, 0.05, 0.0, (20.0, 10.0), (1, 0, 0, 1))
+    materials = [material1, material2]
+
+    mesh = build_mesh(materials, 9, 6)
+    check_identical(mesh, materials, "mixed boundaries")
+
+    print("Vectorized assembly matches the loop assembly with mixed boundaries!")
+
+
+if __name__ == "__main__":
+    test_vectorized_matches_loop_on_examples()
+    test_vectorized_matches_loop_mixed_boundaries()
@@ -0,0 +1,130 @@
+import tracemalloc
+import numpy as np
+from src.classes.Solvers import Solvers
+from src.classes.Solve_result import Solve_monitor
+from src.test.helpers import build
+
+# numpy may use its fixed-size ufunc scratch buffers on strided slices,
+# anything above is an allocation that grows with the grid
+SCRATCH = 300_000
+
+
+def transient_bytes(f):
+    """
+    Peak memory allocated, and not kept, by a call of f after a first call
+    that sets up the workspaces.
+    """
+    f()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    f()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - start
+
+
+def iteration_bytes(solve):
+    """
+    Largest memory allocated, and not kept, by one iteration of a solve,
+    measured between the monitor's calls (after the first iterations,
+    which set up the buffers).
+    """
+    peaks = []
+    check, record = Solve_monitor.check, Solve_monitor.record
+
+    def traced(method):
+        def call(monitor, *args, **kwargs):
+            stop = method(monitor, *args, **kwargs)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+            tracemalloc.reset_peak()
+            return stop
+        return call
+
+    Solve_monitor.check, Solve_monitor.record = traced(check), traced(record)
+    tracemalloc.start()
+    try:
+        solve()
+    finally:
+        tracemalloc.stop()
+        Solve_monitor.check, Solve_monitor.record = check, record
+    return max(peaks[3:])
+
+
+def test_in_place_kernels():
+    mc = build("input_files_examples/terminal_i1.txt", 23, 17, "matrix_free")
+    A, b = mc.A, mc.b
+    x = np.random.default_rng(7).random(b.shape[0])
+    out = np.empty_like(x)
+    assert A.dot(x, out=out) is out and np.allclose(out, A.dot(x)), "dot with out differs"
+    assert A.off_diagonal_dot(x, out=out) is out and np.allclose(out, A.off_diagonal_dot(x)), \
+        "off_diagonal_dot with out differs"
+    y = x.copy()
+    assert A.sor_sweep(y, b, 1.3, out=y) is y and np.allclose(y, A.sor_sweep(x, b, 1.3)), \
+        "In-place SOR sweep differs"
+
+    dense = A.tocsr().toarray()
+    for M in (A, A.tocsr(), dense):
+        product = Solvers(M, b).product()
+        assert product(x, out) is out and np.allclose(out, dense @ x), f"{type(M).__name__} product differs"
+
+    # every format gives the same Jacobi iterates
+    x_mf = Solvers(A, b, max_iter=40).jacobi()
+    for M in (A.tocsr(), dense):
+        assert np.allclose(Solvers(M, b, max_iter=40).jacobi(), x_mf), f"{type(M).__name__} Jacobi differs"
+
+    print("The kernels write to the given buffers!")
+
+
+def test_steady_state_allocates_nothing():
+    mc = build("input_files_examples/terminal_i1.txt", 300, 300, "matrix_free")
+    A, b = mc.A, mc.b
+    vector = b.nbytes
+    assert vector > 2 * SCRATCH
+    x = np.random.default_rng(8).random(b.shape[0])
+    out = np.empty_like(x)
+    P = A.padded_grid(x)
+    rhs = A.to_grid(b)
+    monitor = Solve_monitor("test", Solvers(A, b).product(), b)
+    for name, kernel in (("dot", lambda: A.dot(x, out=out)),
+                         ("off_diagonal_dot", lambda: A.off_diagonal_dot(x, out=out)),
+                         ("sor_sweep", lambda: A.sor_sweep(x, b, 1.5, out=out)),
+                         ("red_black_sweep", lambda: A.red_black_sweep(P, rhs, 1.5)),
+                         ("monitor", lambda: (monitor.check(out, x, 0.0), monitor.relative_residual(x)))):
+        used = transient_bytes(kernel)
+        assert used < SCRATCH, f"{name} allocated {used} bytes, a vector is {vector}"
+
+    # whole iterations on the stencil
+    options = {"tol": 0.0, "max_iter": 12, "residual_interval": 0}
+    for name, solve in (("jacobi", lambda: Solvers(A, b, **options).jacobi()),
+                        ("gauss_seidel", lambda: Solvers(A, b, **options).gauss_seidel()),
+                        ("red_black_sor", lambda: Solvers(A, b, **options).red_black_sor())):
+        used = iteration_bytes(solve)
+        assert used < SCRATCH, f"An iteration of {name} allocated {used} bytes, a vector is {vector}"
+
+    # on CSR, M.dot returns one new vector per product and nothing else grows
+    csr = build("input_files_examples/terminal_i1.txt", 300, 300)
+    S, c = csr.symmetric_system()
+    for name, solve in (("sor", lambda: Solvers(csr.A, csr.b, residual_interval=0).sor(
+                            omega=1.5, tol=0.0, max_iter=12)),
+                        ("gauss_seidel", lambda: Solvers(csr.A, csr.b, **options).gauss_seidel()),
+                        ("jacobi", lambda: Solvers(csr.A, csr.b, **options).jacobi()),
+                        ("cg", lambda: Solvers(S, c, **options).cg())):
+        used = iteration_bytes(solve)
+        assert used < vector + SCRATCH, f"An iteration of CSR {name} allocated {used} bytes, a vector is {vector}"
+
+    # Jacobi on a dense matrix no longer copies it into D and R = A - D
+    small = build("input_files_examples/terminal_i1.txt", 30, 30)
+    dense = small.A.toarray()
+    tracemalloc.start()
+    Solvers(dense, small.b, max_iter=3).jacobi()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < dense.nbytes / 10, f"Dense Jacobi allocated {peak} bytes for a {dense.nbytes} bytes matrix"
+
+    print("The iteration kernels allocate nothing that grows with the grid!")
+
+
+if __name__ == "__main__":
+    test_in_place_kernels()
+    test_steady_state_allocates_nothing()